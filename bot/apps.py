@@ -5,3 +5,6 @@ class BotConfig(AppConfig):
 
     name = 'bot'
     verbose_name = 'Bot'
+
+    def ready(self):
+        from . import signals  # noqa: F401
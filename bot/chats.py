@@ -0,0 +1,49 @@
+"""Status of the bot in the chats.
+
+Telegram sends a my_chat_member update whenever the bot is promoted,
+demoted or removed from a chat, so the status is kept from them instead
+of being requested on every command.
+"""
+
+import threading
+
+from telegram import (
+    Bot,
+    ChatMember,
+)
+
+
+class ChatAdminCache:
+    """Whether the bot is an administrator of every known chat.
+    """
+
+    def __init__(self) -> None:
+        self._admin: dict[int, bool] = {}
+        self._lock = threading.Lock()
+
+    def is_admin(self, bot: Bot, chat_id: int) -> bool:
+        """Checks if the bot is an administrator of a chat.
+
+        Only the chats without a known status are requested to Telegram.
+        """
+        admin = self._admin.get(chat_id)
+
+        if admin is None:
+            admin = self.update(chat_id, bot.get_chat_member(chat_id, bot.id).status)
+
+        return admin
+
+    def update(self, chat_id: int, status: str) -> bool:
+        admin = status == ChatMember.ADMINISTRATOR
+
+        with self._lock:
+            self._admin[chat_id] = admin
+
+        return admin
+
+    def forget(self, chat_id: int) -> None:
+        with self._lock:
+            self._admin.pop(chat_id, None)
+
+
+chat_admins = ChatAdminCache()
@@ -5,6 +5,8 @@ from telegram.ext import (
     JobQueue,
 )
 
+from .users import user_cache
+
 
 class BotCLI(Cmd):
 
@@ -16,6 +18,21 @@ class BotCLI(Cmd):
         self.persistence = persistence
         self.job_queue = job_queue
 
+    def do_cache(self, arg):
+        'Shows the user cache statistics. Use "cache clear" to empty it.'
+
+        if arg == 'clear':
+            user_cache.invalidate()
+            print('User cache cleared!')
+            return
+
+        stats = user_cache.stats()
+        total = stats['hits'] + stats['misses']
+
+        print('User cache: {} users, {} hits, {} misses ({:.1%} hit rate)'.format(
+            stats['size'], stats['hits'], stats['misses'], stats['hits'] / total if total else 0
+        ))
+
     def do_data(self, arg):
         'Shows the content of the bot persistent data dictionary.'
 
@@ -35,7 +52,7 @@ class BotCLI(Cmd):
         'Flush the bot persistent data dictionary.'
 
         self.persistence.flush()
-        print('Bot persistent data flushed to disk!')
+        print('Bot persistent data saved!')
 
     def do_jobs(self, arg):
         'Print the scheduled jobs.'
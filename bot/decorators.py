@@ -1,8 +1,11 @@
 from typing import (
+    Any,
     Callable,
     cast,
 )
 
+from django.db import close_old_connections
+
 from telegram import (
     CallbackQuery,
     ParseMode,
@@ -12,6 +15,9 @@ from telegram.ext import CallbackContext
 
 from users.models import User
 
+from .chats import chat_admins
+from .users import user_cache
+
 
 BOT_ADMIN_REQUIRED = (
     'El bot debe ser administrador para realizar esta acción ⚠️'
@@ -56,11 +62,9 @@ def auth_required(
             assert update.effective_user is not None
             assert update.effective_message is not None
 
-            user_id = update.effective_user.id
+            user = user_cache.get(update.effective_user.id)
 
-            try:
-                user = User.objects.filter(telegram_id=user_id).get()
-            except User.DoesNotExist:
+            if user is None:
                 if not silent:
                     update.effective_message.reply_text(
                         auth_error_msg or USER_REQUIRED_ERROR,
@@ -87,7 +91,8 @@ def bot_admin_required(silent: bool = False):
     """Bot admin required decorator factory.
 
     Ensures that the bot has administrator permissions in the (group)
-    chat that the handler is receiving.
+    chat that the handler is receiving. The status is cached and kept
+    up to date from the my_chat_member updates.
 
     On error, if not silent, answers with the allowed chat types.
     """
@@ -96,9 +101,7 @@ def bot_admin_required(silent: bool = False):
             assert update.effective_chat is not None
             assert update.effective_message is not None
 
-            bot_id = context.bot.get_me().id
-
-            if update.effective_chat.get_member(bot_id).status != 'administrator':
+            if not chat_admins.is_admin(context.bot, update.effective_chat.id):
                 if not silent:
                     update.effective_message.reply_text(
                         BOT_ADMIN_REQUIRED,
@@ -140,6 +143,24 @@ def limit_chat_type(chat_type: str, silent: bool = False):
     return decorator
 
 
+def close_connections(func: Callable[..., Any]):
+    """Close database connections decorator.
+
+    Handlers and jobs do not go through the Django request cycle, so the
+    expired or broken connections of their thread are closed before and
+    after running them, as Django does around every request.
+    """
+    def decorated_func(*args: Any, **kwargs: Any) -> Any:
+        close_old_connections()
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return decorated_func
+
+
 def auto_answer_query(func: Callable[[Update, CallbackContext], None]):
     """Automatically answer query decorator.
 
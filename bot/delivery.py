@@ -0,0 +1,146 @@
+"""Broadcast delivery.
+
+Sends a message to many chats from a pool of workers, sharing a rate
+limiter that keeps the bot below the Telegram limits.
+"""
+
+import logging
+import time
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    as_completed,
+)
+from typing import (
+    Callable,
+    Iterable,
+)
+
+from telegram import (
+    Bot,
+    ParseMode,
+)
+from telegram.error import (
+    ChatMigrated,
+    RetryAfter,
+    TelegramError,
+)
+
+from clubs.models import Club
+from heart.models import (
+    Group,
+    Year,
+)
+
+from .ratelimit import (
+    TokenBucket,
+    telegram_bucket,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+WORKERS = 8
+MAX_ATTEMPTS = 3
+
+# Seconds between progress reports, as editing a message counts towards
+# the limits too
+PROGRESS_INTERVAL = 2.0
+
+
+def update_chat_id(old_id: str, new_id: str) -> None:
+    """Updates the chat of the groups, years and clubs linked to a chat
+    that has been migrated to a supergroup.
+    """
+    for model in (Group, Year, Club):
+        model.objects.filter(telegram_group=old_id).update(telegram_group=new_id)
+
+
+class BroadcastDelivery:
+    """Sends a message to a set of chats.
+
+    Every chat is sent from a worker of the pool, waiting for the rate
+    limiter, and retried when Telegram asks to wait or the chat has been
+    migrated to a supergroup.
+
+    Only the global rate of the bot is limited, as every chat gets a single
+    message: chats listed more than once, like a group linked to a club,
+    are only sent once. Sending several messages to a chat would also need
+    the limit of one message per second to the same chat.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        text: str,
+        chats: Iterable[tuple[str, str]],
+        workers: int = WORKERS,
+        bucket: TokenBucket = telegram_bucket,
+    ) -> None:
+        self.bot = bot
+        self.text = text
+        self.chats = list({chat_id: (title, chat_id) for title, chat_id in chats}.values())
+        self.workers = workers
+        self.bucket = bucket
+
+        self.sent: list[str] = []
+        self.errors: list[str] = []
+        self.migrated: dict[str, str] = {}
+
+    def send(self, chat_id: str) -> bool:
+        """Sends the message to a chat, returning whether it was sent.
+        """
+        for _ in range(MAX_ATTEMPTS):
+            self.bucket.acquire()
+
+            try:
+                self.bot.send_message(chat_id, self.text, parse_mode=ParseMode.MARKDOWN)
+                return True
+            except RetryAfter as e:
+                # Flood control affects every chat, so all the workers wait
+                self.bucket.pause(e.retry_after)
+            except ChatMigrated as e:
+                new_id = str(e.new_chat_id)
+
+                self.migrated[chat_id] = new_id
+                chat_id = new_id
+            except TelegramError as e:
+                logger.warning('Broadcast to %s failed: %s', chat_id, e)
+                return False
+
+        return False
+
+    def run(self, on_progress: 'Callable[[int, int], None] | None' = None) -> None:
+        """Sends the message to every chat.
+
+        Calls on_progress with the number of chats done and the total,
+        at most every PROGRESS_INTERVAL seconds. The migrated chats are
+        updated in the linked groups, years and clubs.
+        """
+        total = len(self.chats)
+        last_report = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(self.send, chat_id): title
+                for title, chat_id in self.chats
+            }
+
+            for done, future in enumerate(as_completed(futures), 1):
+                title = futures[future]
+
+                try:
+                    sent = future.result()
+                except Exception:
+                    logger.exception('Broadcast to %s failed', title)
+                    sent = False
+
+                (self.sent if sent else self.errors).append(title)
+
+                if on_progress and done < total and time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    on_progress(done, total)
+
+        # Saved from this thread, so the workers do not open connections
+        for old_id, new_id in self.migrated.items():
+            update_chat_id(old_id, new_id)
@@ -1,19 +1,28 @@
-from datetime import time
-
-import pytz
 from telegram.ext import (
     CallbackQueryHandler,
+    ChatMemberHandler,
     CommandHandler,
     Dispatcher,
     JobQueue,
 )
 
+from ..decorators import close_connections
+from ..presence import SWEEP_INTERVAL
+
 
 def load_all(dispatcher: Dispatcher, job_queue: JobQueue) -> None:
+    """Registers the handlers and jobs of the bot.
+
+    Handlers that query the database or Telegram run in the worker pool,
+    so they do not hold the updates of other users. Those that change the
+    shared bot data stay in the dispatcher thread, keeping their updates
+    in order.
+    """
     from .basic import (
         callback_generic,
         cmd_getid,
         cmd_start,
+        status_my_chat_member,
     )
     from .broadcast import (
         callback_broadcast,
@@ -30,24 +39,24 @@ def load_all(dispatcher: Dispatcher, job_queue: JobQueue) -> None:
     )
     from .users import load_all as load_users_handlers
 
-    tzinfo = pytz.timezone('Europe/Madrid')
-
     # Basic
     dispatcher.add_handler(CallbackQueryHandler(callback_generic, pattern='main'))
-    dispatcher.add_handler(CommandHandler('getid', cmd_getid))
-    dispatcher.add_handler(CommandHandler('start', cmd_start))
+    dispatcher.add_handler(CommandHandler('getid', close_connections(cmd_getid)))
+    dispatcher.add_handler(CommandHandler('start', close_connections(cmd_start), run_async=True))
+    dispatcher.add_handler(ChatMemberHandler(status_my_chat_member, ChatMemberHandler.MY_CHAT_MEMBER))
 
-    # Broadcast
-    dispatcher.add_handler(CallbackQueryHandler(callback_broadcast, pattern='broadcast'))
-    dispatcher.add_handler(CommandHandler('broadcast', cmd_broadcast))
+    # Broadcast, keeping the pending broadcasts of the bot data in order
+    # while the delivery itself runs in the worker pool
+    dispatcher.add_handler(CallbackQueryHandler(close_connections(callback_broadcast), pattern='broadcast'))
+    dispatcher.add_handler(CommandHandler('broadcast', close_connections(cmd_broadcast)))
 
     # Conversation
-    dispatcher.add_handler(CommandHandler('mencionar', cmd_mention))
+    dispatcher.add_handler(CommandHandler('mencionar', close_connections(cmd_mention), run_async=True))
 
     # Rooms
-    dispatcher.add_handler(CallbackQueryHandler(callback_dafi, pattern='dafi'))
-    dispatcher.add_handler(CommandHandler('dafi', cmd_dafi))
-    job_queue.run_daily(job_dafi, time(hour=21, minute=10, tzinfo=tzinfo))
+    dispatcher.add_handler(CallbackQueryHandler(close_connections(callback_dafi), pattern='dafi'))
+    dispatcher.add_handler(CommandHandler('dafi', close_connections(cmd_dafi)))
+    job_queue.run_repeating(close_connections(job_dafi), SWEEP_INTERVAL)
 
     load_elections_handlers(dispatcher)
     load_groups_handlers(dispatcher)
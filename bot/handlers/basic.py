@@ -1,4 +1,5 @@
 from telegram import (
+    ChatMember,
     TelegramError,
     Update,
 )
@@ -6,6 +7,7 @@ from telegram.ext import CallbackContext
 
 from users.models import User
 
+from ..chats import chat_admins
 from ..decorators import (
     auth_required,
     limit_chat_type,
@@ -14,6 +16,7 @@ from ..utils import (
     create_reply_markup,
     prepare_callback,
 )
+from ..users import user_cache
 
 
 @limit_chat_type('private', silent=True)
@@ -25,6 +28,10 @@ def cmd_start(update: Update, context: CallbackContext) -> None:
         f'Hola {update.effective_user.first_name}, soy el DAFI Bot. ¿En qué puedo ayudarte?'
     )
 
+    # Nothing to offer if the Telegram account is already linked
+    if user_cache.get(update.effective_user.id) is not None:
+        return None
+
     user = User.objects.filter(telegram_user=update.effective_user.username).first()
 
     if user is None:
@@ -59,6 +66,18 @@ def callback_generic(update: Update, context: CallbackContext) -> None:
     query.answer()
 
 
+def status_my_chat_member(update: Update, context: CallbackContext) -> None:
+    assert update.my_chat_member is not None
+
+    member = update.my_chat_member
+
+    # The chats the bot has left are not kept, they would only grow the cache
+    if member.new_chat_member.status in (ChatMember.LEFT, ChatMember.KICKED):
+        chat_admins.forget(member.chat.id)
+    else:
+        chat_admins.update(member.chat.id, member.new_chat_member.status)
+
+
 @auth_required(only_superuser=True, silent=True)
 def cmd_getid(update: Update, context: CallbackContext, *args) -> None:
     assert update.effective_chat is not None
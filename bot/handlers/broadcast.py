@@ -1,10 +1,11 @@
 from enum import Enum
+from typing import Iterable
 
 from django.db.models import Q
 
 from telegram import (
+    CallbackQuery,
     Message,
-    ParseMode,
     TelegramError,
     Update,
 )
@@ -20,7 +21,9 @@ from heart.models import Group
 from ..decorators import (
     auth_required,
     auto_answer_query,
+    close_connections,
 )
+from ..delivery import BroadcastDelivery
 
 
 class BroadcastTargets(str, Enum):
@@ -35,16 +38,33 @@ class BroadcastTargets(str, Enum):
 
 class BroadcastMessage():
     """Broadcast helper.
+
+    Pending broadcasts are kept in the bot data, so they are stored as
+    plain dictionaries.
     """
 
-    def __init__(self, text: str):
+    def __init__(self, text: str, chats: Iterable[Iterable[str]] = (), preview: 'list[int] | None' = None):
         self.text = text
-        self.msg: 'Message | None' = None
-        self.chats: set[tuple[str, str]] = set()
+        self.preview = preview
+        self.chats: set[tuple[str, str]] = {tuple(chat) for chat in chats}
 
     def add_chat(self, title: str, id: str) -> None:
         self.chats.add((title, id))
 
+    def set_preview(self, msg: Message) -> None:
+        self.preview = [msg.chat_id, msg.message_id]
+
+    def to_dict(self) -> dict:
+        return {
+            'text': self.text,
+            'chats': sorted(self.chats),
+            'preview': self.preview,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BroadcastMessage':
+        return cls(data['text'], data['chats'], data['preview'])
+
 
 USAGE_MSG = (
     '*Ayuda de Broadcast*\n'
@@ -137,8 +157,6 @@ def cmd_broadcast(update: Update, context: CallbackContext[dict, dict, dict], *_
         )
         return
 
-    context.bot_data['broadcast' + str(update.effective_message.message_id)] = bcast_obj
-
     reply_markup = create_reply_markup([
         ('Enviar ✅', 'broadcast:send:' + str(update.effective_message.message_id)),
         ('Cancelar ❌', 'broadcast:cancel:' + str(update.effective_message.message_id)),
@@ -147,7 +165,9 @@ def cmd_broadcast(update: Update, context: CallbackContext[dict, dict, dict], *_
     sent_msg = update.effective_message.reply_markdown(bcast_obj.text)
     sent_msg.reply_markdown(info_msg, reply_markup=reply_markup)
 
-    bcast_obj.msg = sent_msg
+    bcast_obj.set_preview(sent_msg)
+
+    context.bot_data['broadcast' + str(update.effective_message.message_id)] = bcast_obj.to_dict()
 
 
 @auto_answer_query
@@ -159,7 +179,7 @@ def callback_broadcast(update: Update, context: CallbackContext[dict, dict, dict
         return
 
     try:
-        bcast_obj: BroadcastMessage = context.bot_data.pop('broadcast' + args[0])
+        bcast_obj = BroadcastMessage.from_dict(context.bot_data.pop('broadcast' + args[0]))
     except KeyError:
         query.edit_message_text(
             'La información del envío no se ha encontrado ⚠️'
@@ -167,34 +187,46 @@ def callback_broadcast(update: Update, context: CallbackContext[dict, dict, dict
         return
 
     if action == 'cancel':
-        if bcast_obj.msg:
-            bcast_obj.msg.delete()
+        if bcast_obj.preview:
+            try:
+                context.bot.delete_message(*bcast_obj.preview)
+            except TelegramError:
+                pass
 
         query.edit_message_text(
             '¡Operación cancelada!'
         )
         return
 
-    errors: list[str] = []
+    query.edit_message_text(
+        'Enviando el mensaje a {} chats... ⏳'.format(len(bcast_obj.chats))
+    )
 
-    for chat_title, chat_id in bcast_obj.chats:
-        try:
-            context.bot.send_message(
-                chat_id,
-                bcast_obj.text,
-                parse_mode=ParseMode.MARKDOWN
-            )
-        except TelegramError:
-            errors.append(chat_title)
+    delivery = BroadcastDelivery(context.bot, bcast_obj.text, bcast_obj.chats)
 
-    msg = 'Mensaje enviado con éxito a {} chats ✅\n'.format(
-        len(bcast_obj.chats) - len(errors)
-    )
+    # The delivery may take a while, so it does not block the dispatcher
+    context.dispatcher.run_async(close_connections(_deliver), query, delivery)
+
+
+def _edit_status(query: CallbackQuery, text: str) -> None:
+    try:
+        query.edit_message_text(text)
+    except TelegramError:
+        # Only a status message, the delivery goes on
+        pass
+
+
+def _deliver(query: CallbackQuery, delivery: BroadcastDelivery) -> None:
+    delivery.run(on_progress=lambda done, total: _edit_status(
+        query, 'Enviando el mensaje... {}/{} chats ⏳'.format(done, total)
+    ))
+
+    msg = 'Mensaje enviado con éxito a {} chats ✅\n'.format(len(delivery.sent))
 
-    if errors:
+    if delivery.errors:
         msg += '\n\nErrores:\n'
 
-        for error in errors:
+        for error in delivery.errors:
             msg += ' - {}\n'.format(error)
 
-    query.edit_message_text(msg)
+    _edit_status(query, msg)
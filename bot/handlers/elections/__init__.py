@@ -4,6 +4,8 @@ from telegram.ext import (
     Dispatcher,
 )
 
+from ...decorators import close_connections
+
 
 def load_all(dispatcher: Dispatcher) -> None:
     from .delegates import (
@@ -16,10 +18,11 @@ def load_all(dispatcher: Dispatcher) -> None:
         cmd_toggle_elections,
     )
 
-    dispatcher.add_handler(CommandHandler('soydelegado', cmd_im_delegate))
-    dispatcher.add_handler(CommandHandler('soysubdelegado', cmd_im_subdelegate))
+    dispatcher.add_handler(CommandHandler('soydelegado', close_connections(cmd_im_delegate), run_async=True))
+    dispatcher.add_handler(CommandHandler('soysubdelegado', close_connections(cmd_im_subdelegate), run_async=True))
 
-    dispatcher.add_handler(CommandHandler('elecciones', cmd_toggle_elections))
+    # The elections flag is changed in the dispatcher thread
+    dispatcher.add_handler(CommandHandler('elecciones', close_connections(cmd_toggle_elections)))
 
-    dispatcher.add_handler(CallbackQueryHandler(callback_delegate_request, pattern='elections_request'))
-    dispatcher.add_handler(CallbackQueryHandler(callback_toggle_elections, pattern='elections_toggle'))
+    dispatcher.add_handler(CallbackQueryHandler(close_connections(callback_delegate_request), pattern='elections_request', run_async=True))
+    dispatcher.add_handler(CallbackQueryHandler(close_connections(callback_toggle_elections), pattern='elections_toggle'))
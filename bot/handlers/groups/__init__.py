@@ -3,6 +3,8 @@ from telegram.ext import (
     Dispatcher,
 )
 
+from ...decorators import close_connections
+
 
 def load_all(dispatcher: Dispatcher) -> None:
     from .link import (
@@ -13,10 +15,10 @@ def load_all(dispatcher: Dispatcher) -> None:
     )
     from .list import cmd_listgroups
 
-    dispatcher.add_handler(CommandHandler('grupos', cmd_listgroups))
+    dispatcher.add_handler(CommandHandler('grupos', close_connections(cmd_listgroups), run_async=True))
 
-    dispatcher.add_handler(CommandHandler('vinculargrupo', cmd_linkgroup))
-    dispatcher.add_handler(CommandHandler('desvinculargrupo', cmd_unlinkgroup))
+    dispatcher.add_handler(CommandHandler('vinculargrupo', close_connections(cmd_linkgroup), run_async=True))
+    dispatcher.add_handler(CommandHandler('desvinculargrupo', close_connections(cmd_unlinkgroup), run_async=True))
 
-    dispatcher.add_handler(CommandHandler('vincularanyo', cmd_linkyear))
-    dispatcher.add_handler(CommandHandler('desvincularanyo', cmd_unlinkyear))
+    dispatcher.add_handler(CommandHandler('vincularanyo', close_connections(cmd_linkyear), run_async=True))
+    dispatcher.add_handler(CommandHandler('desvincularanyo', close_connections(cmd_unlinkyear), run_async=True))
@@ -1,75 +1,70 @@
-from itertools import groupby
+from typing import Any
+
+from django.core.cache import cache
 
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from heart.models import (
-    Degree,
-    Group,
-    Year,
-)
-from main.models import Config
-
+from heart import directory
 
-def cmd_listgroups(update: Update, context: CallbackContext) -> None:
-    assert update.effective_message is not None
 
-    years = {degree: list(years) for degree, years in groupby(
-        Year
-        .objects
-        .all()
-        .prefetch_related('degree')
-        .order_by('degree', 'year'),
+def render_groups(data: dict[str, Any]) -> str:
+    """Renders the Telegram groups of the directory as a message.
+    """
+    msg = '💬💬 *Grupos de Telegram{}* 💬💬\n\n'.format(
+        (' ' + data['school_year']) if data['school_year'] else ''
+    )
 
-        key=lambda y: y.degree.id
-    )}
+    for degree in data['degrees']:
+        linked = [
+            [group for group in year['groups'] if group['telegram_group_link']]
+            for year in degree['years']
+        ]
 
-    groups = {degree: list(groups) for degree, groups in groupby(
-        Group
-        .objects
-        .exclude(telegram_group_link=None)
-        .prefetch_related('year__degree')
-        .order_by('year__degree', 'year', 'number'),
+        if not any(linked):
+            continue
 
-        key=lambda g: g.degree().id
-    )}
+        msg += f'📚 {degree["name"]} 📚\n'
 
-    current_school_year = Config.get('current_school_year')
+        if degree['is_master']:
+            for groups in linked:
+                for group in groups:
+                    msg += '    🔗 [{}]({})\n'.format(
+                        group['name'], group['telegram_group_link']
+                    )
 
-    msg = '💬💬 *Grupos de Telegram{}* 💬💬\n\n'.format(
-        (' ' + current_school_year) if current_school_year else ''
-    )
+            continue
 
-    for degree in Degree.objects.filter(id__in=groups.keys()):
-        msg += f'📚 {degree.name} 📚\n'
+        for year, groups in zip(degree['years'], linked):
+            if year['telegram_group_link']:
+                msg += '    🔗 [{}º General]({})\n'.format(
+                    year['year'], year['telegram_group_link']
+                )
 
-        if degree.is_master:
-            for group in groups[degree.id]:
-                msg += '    🔗 [{}]({})\n'.format(
-                    group.name, group.telegram_group_link
+            for group in groups:
+                msg += '    🔗 [{}º {}]({})\n'.format(
+                    year['year'], group['name'], group['telegram_group_link']
                 )
 
-            continue
+            msg += '\n'
 
-        year_groups = {
-            year: list(groups) for year, groups in
-            groupby(groups[degree.id], lambda g: g.year.year)
-        }
+    return msg
 
-        for year in years[degree.id]:
-            if year.telegram_group_link:
-                msg += '    🔗 [{}º General]({})\n'.format(
-                    year.year, year.telegram_group_link
-                )
 
-            if year.year in year_groups:
-                for group in year_groups[year.year]:
-                    msg += '    🔗 [{}º {}]({})\n'.format(
-                        group.year.year, group.name, group.telegram_group_link
-                    )
+def get_groups_message() -> str:
+    """Gets the groups message, rendered once for every version of the
+    directory.
+    """
+    return cache.get_or_set(
+        directory.get_cache_key('groups_message'),
+        lambda: render_groups(directory.get_directory()),
+        directory.DIRECTORY_TTL,
+    )
 
-            msg += '\n'
+
+def cmd_listgroups(update: Update, context: CallbackContext) -> None:
+    assert update.effective_message is not None
 
     update.effective_message.reply_markdown(
-        msg, disable_web_page_preview=True
+        get_groups_message(), disable_web_page_preview=True
     )
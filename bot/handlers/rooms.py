@@ -12,11 +12,13 @@ from bot.decorators import auto_answer_query
 from main.models import Config
 from users.models import User
 
+from ..presence import RoomPresence
 from ..utils import (
     create_reply_markup,
     create_users_list,
     prepare_callback,
 )
+from ..users import user_cache
 
 
 class RoomActions(str, Enum):
@@ -25,6 +27,12 @@ class RoomActions(str, Enum):
     OFF = 'off'
 
 
+def _get_members(presence: RoomPresence) -> list[User]:
+    members = (user_cache.get(member_id) for member_id in presence.get_members())
+
+    return [user for user in members if user is not None]
+
+
 def _cmd_no_options(update: Update, members: list[User]) -> None:
     assert update.effective_chat is not None
     assert update.effective_message is not None
@@ -71,23 +79,15 @@ def cmd_dafi(update: Update, context: CallbackContext[dict, dict, dict]) -> None
     assert update.effective_message is not None
     assert update.effective_user is not None
 
-    members_ids: list[str] = []
-
-    try:
-        members_ids = context.bot_data['room_members']
-    except KeyError:
-        context.bot_data['room_members'] = members_ids
-
-    members = list(User.objects.filter(telegram_id__in=members_ids))
+    presence = RoomPresence(context.bot_data)
 
     if not context.args:
-        _cmd_no_options(update, members)
+        _cmd_no_options(update, _get_members(presence))
         return
 
-    try:
-        user = User.objects.filter(telegram_id=update.effective_user.id).get()
-        assert user.has_perm('bot.can_change_room_state')
-    except (User.DoesNotExist, AssertionError):
+    user = user_cache.get(update.effective_user.id)
+
+    if user is None or not user.has_perm('bot.can_change_room_state'):
         update.effective_message.reply_text(
             'No tienes permiso para ejecutar esta acción ❌'
         )
@@ -101,34 +101,22 @@ def cmd_dafi(update: Update, context: CallbackContext[dict, dict, dict]) -> None
         )
         return
 
-    queue: list[str] = []
-
-    try:
-        queue = context.bot_data['room_queue']
-    except KeyError:
-        context.bot_data['room_queue'] = queue
-
     if action == RoomActions.ON:
-        if user.telegram_id in members:
+        if not presence.join(update.effective_user.id):
             update.effective_message.reply_text(
                 'Ya tenía constancia de que estás en DAFI ⚠️'
             )
             return
 
-        members_ids.append(update.effective_user.id)
-
         msg = f'@{user.telegram_user} acaba de llegar a DAFI 🔔'
 
-        if len(queue):
-            for user_id in queue:
-                try:
-                    context.bot.send_message(user_id, msg)
-                except TelegramError:
-                    # So many errors can occur here but it's a simple
-                    # notification, so we'll just ignore a failed one
-                    pass
-
-            queue.clear()
+        for user_id in presence.pop_queue():
+            try:
+                context.bot.send_message(user_id, msg)
+            except TelegramError:
+                # So many errors can occur here but it's a simple
+                # notification, so we'll just ignore a failed one
+                pass
 
         update.effective_message.reply_text(
             'He anotado que estás en DAFI ✅',
@@ -138,14 +126,12 @@ def cmd_dafi(update: Update, context: CallbackContext[dict, dict, dict]) -> None
             ]),
         )
     elif action == RoomActions.OFF:
-        if user not in members:
+        if not presence.leave(update.effective_user.id):
             update.effective_message.reply_text(
                 'No sabía que estabas en DAFI ⚠️'
             )
             return
 
-        members_ids.remove(update.effective_user.id)
-
         update.effective_message.reply_text(
             'He anotado que has salido de DAFI ✅'
         )
@@ -156,22 +142,14 @@ def callback_dafi(update: Update, context: CallbackContext[dict, dict, dict]) ->
     assert update.effective_message is not None
     assert update.effective_user is not None
 
-    queue: list[str] = []
-
-    try:
-        queue = context.bot_data['room_queue']
-    except KeyError:
-        context.bot_data['room_queue'] = queue
+    presence = RoomPresence(context.bot_data)
 
     query, action, _ = prepare_callback(update)
 
     if action == 'notify':
-        user_id = update.effective_user.id
-
         query.edit_message_reply_markup() # To remove the button
 
-        if user_id not in queue:
-            queue.append(user_id)
+        presence.wait(update.effective_user.id)
 
         update.effective_message.reply_text(
             'Hecho, te avisaré 😉'
@@ -185,17 +163,8 @@ def callback_dafi(update: Update, context: CallbackContext[dict, dict, dict]) ->
         )
         return
 
-    members_ids: list[str] = []
-
-    try:
-        members_ids = context.bot_data['room_members']
-    except KeyError:
-        context.bot_data['room_members'] = members_ids
-
-    members = list(User.objects.filter(telegram_id__in=members_ids))
-
     if action == 'omw':
-        if not members:
+        if not presence:
             query.edit_message_text(
                 'Ahora mismo no hay nadie en DAFI 😓'
             )
@@ -223,46 +192,45 @@ def callback_dafi(update: Update, context: CallbackContext[dict, dict, dict]) ->
         )
         return
 
-    try:
-        user = User.objects.filter(telegram_id=update.effective_user.id).get()
-        assert user.has_perm('bot.can_change_room_state')
-    except (User.DoesNotExist, AssertionError):
+    user = user_cache.get(update.effective_user.id)
+
+    if user is None or not user.has_perm('bot.can_change_room_state'):
         query.edit_message_text(
             'No tienes permiso para ejecutar esta acción ❌'
         )
         return
 
     if action == 'off':
-        if user not in members:
+        if not presence.leave(update.effective_user.id):
             query.edit_message_text(
                 'No sabía que estabas en DAFI ⚠️'
             )
             return
 
-        members_ids.remove(update.effective_user.id)
-
         query.edit_message_text(
             'He anotado que has salido de DAFI ✅'
         )
 
 
 def job_dafi(context: CallbackContext[dict, dict, dict]) -> None:
-    members_ids: list[str] = context.bot_data.get('room_members', [])
-
+    """Removes the members whose stay has expired.
+    """
     msg = (
-        '¡Oye! Parece que te has dejado activado el `/dafi` y la '
-        'facultad ya ha cerrado. Quizás deberías ejecutar `/dafi off` '
-        '(o pulsar este botón).'
+        '¡Oye! Parece que te has dejado activado el `/dafi`, pero la '
+        'facultad ya ha cerrado o llevas muchas horas en DAFI, así que '
+        'he anotado que has salido. '
+        'Si sigues allí, vuelve a ejecutar `/dafi on`.'
     )
 
-    reply_markup = create_reply_markup([
-        ('Salir de DAFI 💤', 'dafi:off'),
-    ])
+    expired = RoomPresence(context.bot_data).expire()
 
-    for member_id in members_ids:
-        context.bot.send_message(
-            member_id,
-            msg,
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN,
-        )
+    # Jobs do not save the bot data like the handled updates, and the web
+    # reads the members from the saved data
+    if expired:
+        context.dispatcher.update_persistence()
+
+    for member_id in expired:
+        try:
+            context.bot.send_message(member_id, msg, parse_mode=ParseMode.MARKDOWN)
+        except TelegramError:
+            pass
@@ -4,6 +4,8 @@ from telegram.ext import (
     Dispatcher,
 )
 
+from ...decorators import close_connections
+
 
 def load_all(dispatcher: Dispatcher) -> None:
     from .access import cmd_access
@@ -14,9 +16,9 @@ def load_all(dispatcher: Dispatcher) -> None:
         cmd_unlink,
     )
 
-    dispatcher.add_handler(CommandHandler('acceso', cmd_access))
+    dispatcher.add_handler(CommandHandler('acceso', close_connections(cmd_access), run_async=True))
 
-    dispatcher.add_handler(CallbackQueryHandler(callback_link, pattern='users:link'))
-    dispatcher.add_handler(CallbackQueryHandler(callback_unlink, pattern='users:unlink'))
-    dispatcher.add_handler(CommandHandler('vincular', cmd_link))
-    dispatcher.add_handler(CommandHandler('desvincular', cmd_unlink))
+    dispatcher.add_handler(CallbackQueryHandler(close_connections(callback_link), pattern='users:link', run_async=True))
+    dispatcher.add_handler(CallbackQueryHandler(close_connections(callback_unlink), pattern='users:unlink', run_async=True))
+    dispatcher.add_handler(CommandHandler('vincular', close_connections(cmd_link), run_async=True))
+    dispatcher.add_handler(CommandHandler('desvincular', close_connections(cmd_unlink), run_async=True))
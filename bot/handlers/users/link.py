@@ -14,6 +14,7 @@ from ...decorators import (
     auto_answer_query,
     limit_chat_type,
 )
+from ...users import user_cache
 from ...utils import create_reply_markup
 
 
@@ -23,7 +24,10 @@ def cmd_link(update: Update, context: CallbackContext) -> None:
     assert update.effective_user is not None
 
     telegram_user = update.effective_user
-    user = User.objects.filter(telegram_user__iexact=telegram_user.username).first()
+    user = user_cache.get(telegram_user.id)
+
+    if user is None:
+        user = User.objects.filter(telegram_user__iexact=telegram_user.username).first()
 
     msg: str
     reply_markup: 'ReplyMarkup | None' = None
@@ -76,6 +80,9 @@ def callback_link(update: Update, context: CallbackContext) -> None:
         .update(telegram_id=update.effective_user.id)
     )
 
+    # Bulk updates do not send the signals that invalidate the cache
+    user_cache.invalidate()
+
     if not updated:
         update.effective_message.edit_text(
             'Parece que ha ocurrido un error...'
@@ -118,6 +125,8 @@ def callback_unlink(update: Update, context: CallbackContext) -> None:
         .update(telegram_id=None)
     )
 
+    user_cache.invalidate()
+
     if not updated:
         update.effective_message.edit_text(
             '¡Este usuario no está vinculado a ninguna cuenta! ❌'
@@ -0,0 +1,49 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from telegram import Bot
+
+from ...outbox import (
+    OutboxDispatcher,
+    purge_sent,
+)
+
+
+class Command(BaseCommand):
+
+    help = 'Sends the pending Telegram notifications of the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send a single batch and exit')
+        parser.add_argument('--batch-size', type=int, default=50, help='Notifications sent per batch')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between checks for new notifications')
+        parser.add_argument('--keep-days', type=int, default=7, help='Days to keep the sent notifications')
+
+    def handle(self, *args, **options):
+        logging.basicConfig(
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            level=logging.INFO
+        )
+
+        logger = logging.getLogger(__name__)
+
+        dispatcher = OutboxDispatcher(Bot(settings.BOT_TOKEN), batch_size=options['batch_size'])
+
+        purged = purge_sent(timedelta(days=options['keep_days']))
+        logger.info('Purged %s old notifications', purged)
+
+        if options['once']:
+            logger.info('Sent %s notifications', dispatcher.run_once())
+            return
+
+        logger.info('Dispatching notifications...')
+
+        try:
+            dispatcher.run(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        logger.info('Bye!')
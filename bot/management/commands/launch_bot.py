@@ -1,21 +1,33 @@
 import logging
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
-
-from telegram.ext import (
-    PicklePersistence,
-    Updater,
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
 )
 
+from telegram.ext import Updater
+
 from ...cli import BotCLI
+from ...persistence import (
+    DjangoPersistence,
+    import_pickle,
+)
 
 
 class Command(BaseCommand):
 
     help = 'Launches the Telegram bot.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--webhook', action='store_true', help='Receive the updates through a webhook instead of polling')
+        parser.add_argument('--workers', type=int, default=settings.BOT_WORKERS, help='Threads running the handlers')
+        parser.add_argument('--daemon', action='store_true', help='Run without the interactive console until stopped by a signal')
+
     def handle(self, *args, **options):
+        if options['webhook'] and not settings.BOT_WEBHOOK_URL:
+            raise CommandError('BOT_WEBHOOK_URL must be set to use the webhook')
+
         logging.basicConfig(
             format='%(asctime)s - %(levelname)s - %(message)s',
             level=logging.INFO
@@ -26,25 +38,60 @@ class Command(BaseCommand):
         logger = logging.getLogger(__name__)
         logger.info('Launching bot...')
 
-        persistence = PicklePersistence('bot_persistence')
+        persistence = DjangoPersistence()
+
+        # Data left by the previous pickle persistence
+        imported = import_pickle(persistence, 'bot_persistence')
+
+        if imported:
+            logger.info('Imported bot data: %s', ', '.join(imported))
 
         updater = Updater(
             token=settings.BOT_TOKEN,
             use_context=True,
             persistence=persistence,
+            workers=options['workers'],
         )
 
+        # The bot user is kept by the bot after the first request, so the
+        # handlers can use its id without asking Telegram again
+        logger.info('Logged in as @%s', updater.bot.get_me().username)
+
         logger.info('Registering handlers...')
         from ...handlers import load_all
 
         load_all(updater.dispatcher, updater.job_queue)
 
-        logger.info('Starting polling...')
-        updater.start_polling()
+        if options['webhook']:
+            self.start_webhook(updater)
+            logger.info('Listening on %s:%s...', settings.BOT_WEBHOOK_LISTEN, settings.BOT_WEBHOOK_PORT)
+        else:
+            logger.info('Starting polling...')
+            updater.start_polling()
 
-        BotCLI(persistence, updater.job_queue).cmdloop()
+        if options['daemon']:
+            # Stops the updater and saves the data on SIGINT or SIGTERM
+            updater.idle()
+        else:
+            BotCLI(persistence, updater.job_queue).cmdloop()
 
-        logger.info('Stopping updater...')
-        updater.stop()
+            logger.info('Stopping updater...')
+            updater.stop()
 
         logger.info('Bye!')
+
+    def start_webhook(self, updater: Updater) -> None:
+        """Starts the webhook listener and registers it in Telegram.
+
+        The listener serves plain HTTP, the TLS is left to the web server in
+        front of it. The token is used as the path, so only Telegram knows
+        the full URL.
+        """
+        url_path = settings.BOT_TOKEN
+
+        updater.start_webhook(
+            listen=settings.BOT_WEBHOOK_LISTEN,
+            port=settings.BOT_WEBHOOK_PORT,
+            url_path=url_path,
+            webhook_url='{}/{}'.format(settings.BOT_WEBHOOK_URL.rstrip('/'), url_path),
+        )
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0003_bot_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.BigIntegerField(verbose_name='ID del chat')),
+                ('text', models.TextField(verbose_name='mensaje')),
+                ('url', models.URLField(blank=True, max_length=512, verbose_name='enlace')),
+                ('url_button', models.CharField(blank=True, max_length=64, verbose_name='texto del enlace')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='creada')),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now, verbose_name='siguiente intento')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='intentos')),
+                ('sent', models.DateTimeField(blank=True, null=True, verbose_name='enviada')),
+                ('failed', models.BooleanField(default=False, verbose_name='fallida')),
+                ('error', models.TextField(blank=True, verbose_name='último error')),
+            ],
+            options={
+                'verbose_name': 'notificación',
+                'verbose_name_plural': 'notificaciones',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['sent', 'failed', 'next_attempt'], name='bot_notific_sent_f6688a_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0004_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BotData',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('bot', 'Bot'), ('chat', 'Chat'), ('user', 'Usuario'), ('conversation', 'Conversación')], max_length=16, verbose_name='ámbito')),
+                ('key', models.CharField(max_length=128, verbose_name='clave')),
+                ('value', models.JSONField(null=True, verbose_name='valor')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='actualizado')),
+            ],
+            options={
+                'verbose_name': 'dato del bot',
+                'verbose_name_plural': 'datos del bot',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='botdata',
+            constraint=models.UniqueConstraint(fields=('scope', 'key'), name='bot_data_unique'),
+        ),
+    ]
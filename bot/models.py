@@ -1,4 +1,7 @@
+from datetime import datetime
+
 from django.db import models
+from django.utils import timezone
 
 
 class BotPermissions(models.Model):
@@ -13,3 +16,100 @@ class BotPermissions(models.Model):
             ('can_manage_elections', 'Puede gestionar operaciones del periodo de elecciones'),
             ('can_manage_permissions', 'Puede gestionar permisos de usuarios'),
         )
+
+
+class Notification(models.Model):
+    """Telegram notification waiting in the outbox.
+
+    Notifications are sent by the outbox dispatcher, so web requests do
+    not have to wait for Telegram.
+    """
+
+    id: 'models.AutoField[int, int]'
+
+    chat_id: 'models.BigIntegerField[int, int]' = models.BigIntegerField('ID del chat')
+
+    text: 'models.TextField[str, str]' = models.TextField('mensaje')
+
+    url: 'models.URLField[str, str]' = models.URLField('enlace', max_length=512, blank=True)
+
+    url_button: 'models.CharField[str, str]' = models.CharField('texto del enlace', max_length=64, blank=True)
+
+    created: 'models.DateTimeField[datetime, datetime]' = models.DateTimeField('creada', auto_now_add=True)
+
+    next_attempt: 'models.DateTimeField[datetime, datetime]' = models.DateTimeField(
+        'siguiente intento', default=timezone.now
+    )
+
+    attempts: 'models.PositiveSmallIntegerField[int, int]' = models.PositiveSmallIntegerField(
+        'intentos', default=0
+    )
+
+    sent: 'models.DateTimeField[datetime | None, datetime | None]' = models.DateTimeField(
+        'enviada', blank=True, null=True
+    )
+
+    failed: 'models.BooleanField[bool, bool]' = models.BooleanField('fallida', default=False)
+
+    error: 'models.TextField[str, str]' = models.TextField('último error', blank=True)
+
+    class Meta:
+        verbose_name = 'notificación'
+        verbose_name_plural = 'notificaciones'
+
+        indexes = [
+            models.Index(fields=['sent', 'failed', 'next_attempt']),
+        ]
+
+    def __str__(self):
+        return f'Notificación {self.id} para {self.chat_id}'
+
+
+class BotData(models.Model):
+    """Persistent data of the bot.
+
+    Every key of the bot, chat and user data is stored in its own row,
+    so only the changed keys are written.
+    """
+
+    id: 'models.AutoField[int, int]'
+
+    BOT = 'bot'
+    CHAT = 'chat'
+    USER = 'user'
+    CONVERSATION = 'conversation'
+
+    SCOPES = [
+        (BOT, 'Bot'),
+        (CHAT, 'Chat'),
+        (USER, 'Usuario'),
+        (CONVERSATION, 'Conversación'),
+    ]
+
+    scope: 'models.CharField[str, str]' = models.CharField('ámbito', max_length=16, choices=SCOPES)
+
+    key: 'models.CharField[str, str]' = models.CharField('clave', max_length=128)
+
+    value: 'models.JSONField' = models.JSONField('valor', null=True)
+
+    updated: 'models.DateTimeField[datetime, datetime]' = models.DateTimeField('actualizado', auto_now=True)
+
+    class Meta:
+        verbose_name = 'dato del bot'
+        verbose_name_plural = 'datos del bot'
+
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='bot_data_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_scope_display()}: {self.key}'
+
+    @classmethod
+    def get_value(cls, key: str, default=None):
+        """Gets a value of the bot data, so the web app can read the state
+        of the bot.
+        """
+        row = cls.objects.filter(scope=cls.BOT, key=key).values_list('value', flat=True).first()
+
+        return default if row is None else row
@@ -1,32 +1,24 @@
-import os
-
-from telegram import (
-    Bot,
-    InlineKeyboardButton,
-    InlineKeyboardMarkup,
-)
+from django.conf import settings
 
 from main.utils import get_domain
 from users.models import User
 
-
-_bot: 'Bot | None' = None
-
-if 'BOT_TOKEN' in os.environ:
-    _bot = Bot(os.environ['BOT_TOKEN'])
+from .outbox import enqueue
 
 
 def telegram_notify(user: User, message: str, url: str = None, url_button: str = None) -> bool:
-    if not _bot or not user.telegram_id:
-        return False
-
-    reply_markup = None
+    """Queues a notification for a user in the outbox.
 
-    if url and url_button:
-        reply_markup = InlineKeyboardMarkup([[
-            InlineKeyboardButton(url_button, url=get_domain() + str(url)),
-        ]])
+    Returns immediately, the message is sent by the outbox dispatcher.
+    """
+    if not settings.BOT_TOKEN or not user.telegram_id:
+        return False
 
-    _bot.send_message(user.telegram_id, message, reply_markup=reply_markup)
+    enqueue(
+        user.telegram_id,
+        message,
+        url=get_domain() + str(url) if url and url_button else '',
+        url_button=url_button or '',
+    )
 
     return True
@@ -0,0 +1,231 @@
+"""Telegram notifications outbox.
+
+Web requests only store the notifications, and a dispatcher process
+sends them in batches, keeping below the Telegram rate limits and
+retrying the failed ones with exponential backoff.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from telegram import (
+    Bot,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+)
+from telegram.error import (
+    BadRequest,
+    ChatMigrated,
+    RetryAfter,
+    TelegramError,
+    Unauthorized,
+)
+
+from .models import Notification
+from .ratelimit import (
+    TokenBucket,
+    telegram_bucket,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+# Telegram allows about one message per second to the same chat
+CHAT_INTERVAL = 1.0
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+
+# Time a dispatcher keeps the notifications it claimed, after which they
+# are sent again if it died before marking them
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def enqueue(chat_id: int, text: str, url: str = '', url_button: str = '') -> Notification:
+    """Stores a notification to be sent by the dispatcher.
+    """
+    return Notification.objects.create(
+        chat_id=chat_id,
+        text=text,
+        url=url if url_button else '',
+        url_button=url_button if url else '',
+    )
+
+
+def get_backoff(attempts: int) -> timedelta:
+    """Gets the delay before retrying a notification that failed the
+    given number of times.
+    """
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+class OutboxDispatcher:
+    """Sends the pending notifications of the outbox.
+    """
+
+    def __init__(self, bot: Bot, batch_size: int = 50, bucket: 'TokenBucket | None' = None) -> None:
+        self.bot = bot
+        self.batch_size = batch_size
+        self.bucket = bucket or telegram_bucket
+
+        self._last_sent: dict[int, float] = {}
+        self._stop = threading.Event()
+
+    def get_pending(self) -> 'QuerySet[Notification]':
+        return (
+            Notification.objects
+            .filter(sent=None, failed=False, next_attempt__lte=timezone.now())
+            .order_by('next_attempt', 'id')
+        )
+
+    def claim_pending(self) -> list[Notification]:
+        """Claims a batch of pending notifications, so other dispatchers do
+        not send them too.
+
+        The notifications are claimed by moving their next attempt past
+        CLAIM_TIMEOUT. Rows locked by another dispatcher are skipped when the
+        database allows it, otherwise every row is only claimed if nobody
+        changed it since it was read.
+        """
+        claimed_until = timezone.now() + CLAIM_TIMEOUT
+
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                notifications = list(self.get_pending().select_for_update(skip_locked=True)[:self.batch_size])
+
+                Notification.objects.filter(pk__in=[n.id for n in notifications]).update(next_attempt=claimed_until)
+        else:
+            notifications = [
+                notification for notification in self.get_pending()[:self.batch_size]
+                if Notification.objects
+                .filter(pk=notification.id, sent=None, next_attempt=notification.next_attempt)
+                .update(next_attempt=claimed_until)
+            ]
+
+        for notification in notifications:
+            notification.next_attempt = claimed_until
+
+        return notifications
+
+    def send(self, notification: Notification) -> None:
+        reply_markup = None
+
+        if notification.url:
+            reply_markup = InlineKeyboardMarkup([[
+                InlineKeyboardButton(notification.url_button, url=notification.url),
+            ]])
+
+        self.bot.send_message(notification.chat_id, notification.text, reply_markup=reply_markup)
+
+    def run_once(self) -> int:
+        """Sends a batch of pending notifications.
+
+        Returns the number of notifications sent.
+        """
+        sent: list[int] = []
+
+        notifications = self.claim_pending()
+        done: set[int] = set()
+
+        try:
+            for notification in notifications:
+                done.add(notification.id)
+
+                self._wait_chat(notification.chat_id)
+                self.bucket.acquire()
+
+                try:
+                    self.send(notification)
+                except RetryAfter as e:
+                    # Flood control affects every chat, so the rest of
+                    # the batch is left for later
+                    self.bucket.pause(e.retry_after)
+                    self._postpone(notification, timedelta(seconds=e.retry_after), str(e))
+                    break
+                except ChatMigrated as e:
+                    notification.chat_id = e.new_chat_id
+                    notification.next_attempt = timezone.now()
+                    notification.save(update_fields=('chat_id', 'next_attempt'))
+                except (BadRequest, Unauthorized) as e:
+                    # The user blocked the bot or the chat is gone
+                    self._fail(notification, str(e), permanent=True)
+                except TelegramError as e:
+                    self._fail(notification, str(e))
+                else:
+                    sent.append(notification.id)
+                finally:
+                    self._last_sent[notification.chat_id] = time.monotonic()
+        finally:
+            if sent:
+                Notification.objects.filter(pk__in=sent).update(sent=timezone.now(), error='')
+
+            # The rest of the batch is left for the next run
+            left = [n.id for n in notifications if n.id not in done]
+
+            if left:
+                Notification.objects.filter(pk__in=left, sent=None).update(next_attempt=timezone.now())
+
+        return len(sent)
+
+    def run(self, interval: float = 2.0) -> None:
+        """Sends the pending notifications until stopped.
+        """
+        while not self._stop.is_set():
+            count = self.run_once()
+
+            if count:
+                logger.info('Sent %s notifications', count)
+
+            # Keep going without waiting while there is a backlog
+            if count < self.batch_size:
+                self._stop.wait(interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _wait_chat(self, chat_id: int) -> None:
+        last = self._last_sent.get(chat_id)
+
+        if last is not None:
+            wait = last + CHAT_INTERVAL - time.monotonic()
+
+            if wait > 0:
+                time.sleep(wait)
+
+        if len(self._last_sent) > 10 * self.batch_size:
+            limit = time.monotonic() - CHAT_INTERVAL
+            self._last_sent = {k: v for k, v in self._last_sent.items() if v > limit}
+
+    def _postpone(self, notification: Notification, delay: timedelta, error: str) -> None:
+        notification.next_attempt = timezone.now() + delay
+        notification.error = error
+        notification.save(update_fields=('next_attempt', 'error'))
+
+    def _fail(self, notification: Notification, error: str, permanent: bool = False) -> None:
+        notification.attempts += 1
+        notification.error = error
+        notification.failed = permanent or notification.attempts >= MAX_ATTEMPTS
+        notification.next_attempt = timezone.now() + get_backoff(notification.attempts)
+
+        notification.save(update_fields=('attempts', 'error', 'failed', 'next_attempt'))
+
+        logger.warning('Notification %s failed (attempt %s): %s', notification.id, notification.attempts, error)
+
+
+def purge_sent(older_than: timedelta) -> int:
+    """Deletes the notifications sent before the given time.
+    """
+    deleted, _ = Notification.objects.filter(sent__lt=timezone.now() - older_than).delete()
+
+    return deleted
@@ -0,0 +1,212 @@
+"""Database persistence of the bot data.
+
+Every key is stored as JSON in its own row, and the last saved value of
+each key is remembered, so updates only write the keys that changed.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import (
+    Any,
+    DefaultDict,
+    Optional,
+)
+
+from django.db import transaction
+
+from telegram.ext import (
+    BasePersistence,
+    PicklePersistence,
+)
+from telegram.ext.utils.types import ConversationDict
+
+from .models import BotData
+
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, sort_keys=True)
+
+
+class DjangoPersistence(BasePersistence[dict, dict, dict]):
+    """Bot persistence backed by the BotData model.
+
+    Values must be serializable as JSON.
+    """
+
+    def __init__(
+            self,
+            store_user_data: bool = True,
+            store_chat_data: bool = True,
+            store_bot_data: bool = True) -> None:
+        super().__init__(
+            store_user_data=store_user_data,
+            store_chat_data=store_chat_data,
+            store_bot_data=store_bot_data,
+        )
+
+        self.bot_data: Optional[dict] = None
+        self.user_data: Optional[DefaultDict[int, dict]] = None
+        self.chat_data: Optional[DefaultDict[int, dict]] = None
+        self.conversations: dict[str, ConversationDict] = {}
+
+        # Last saved value of every key, by scope
+        self._saved: dict[str, dict[str, str]] = defaultdict(dict)
+
+        # Async handlers save their data from the worker threads
+        self._lock = threading.RLock()
+
+    def _load(self, scope: str) -> dict[str, Any]:
+        data = dict(BotData.objects.filter(scope=scope).values_list('key', 'value'))
+
+        self._saved[scope] = {key: _dumps(value) for key, value in data.items()}
+
+        return data
+
+    def _save(self, scope: str, data: dict[str, Any]) -> int:
+        """Writes the keys of a scope that changed since the last save.
+
+        Returns the number of keys written or deleted.
+        """
+        with self._lock:
+            saved = self._saved[scope]
+
+            changed = {}
+
+            # The handlers may change the data meanwhile
+            items = list(data.items())
+
+            for key, value in items:
+                dumped = _dumps(value)
+
+                if saved.get(key) != dumped:
+                    changed[key] = (value, dumped)
+
+            keys = {key for key, _ in items}
+            removed = [key for key in saved if key not in keys]
+
+            if not changed and not removed:
+                return 0
+
+            with transaction.atomic():
+                for key, (value, _) in changed.items():
+                    BotData.objects.update_or_create(scope=scope, key=key, defaults={'value': value})
+
+                if removed:
+                    BotData.objects.filter(scope=scope, key__in=removed).delete()
+
+            for key, (_, dumped) in changed.items():
+                saved[key] = dumped
+
+            for key in removed:
+                del saved[key]
+
+            return len(changed) + len(removed)
+
+    def get_bot_data(self) -> dict:
+        if self.bot_data is None:
+            self.bot_data = self._load(BotData.BOT)
+
+        return self.bot_data
+
+    def update_bot_data(self, data: dict) -> None:
+        self.bot_data = data
+        self._save(BotData.BOT, data)
+
+    def get_user_data(self) -> DefaultDict[int, dict]:
+        if self.user_data is None:
+            self.user_data = defaultdict(dict, {
+                int(key): value for key, value in self._load(BotData.USER).items()
+            })
+
+        return self.user_data
+
+    def update_user_data(self, user_id: int, data: dict) -> None:
+        self._update_item(BotData.USER, self.get_user_data(), user_id, data)
+
+    def get_chat_data(self) -> DefaultDict[int, dict]:
+        if self.chat_data is None:
+            self.chat_data = defaultdict(dict, {
+                int(key): value for key, value in self._load(BotData.CHAT).items()
+            })
+
+        return self.chat_data
+
+    def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._update_item(BotData.CHAT, self.get_chat_data(), chat_id, data)
+
+    def _update_item(self, scope: str, items: DefaultDict[int, dict], item_id: int, data: dict) -> None:
+        items[item_id] = data
+
+        key = str(item_id)
+
+        with self._lock:
+            dumped = _dumps(data)
+
+            if self._saved[scope].get(key) != dumped:
+                BotData.objects.update_or_create(scope=scope, key=key, defaults={'value': data})
+                self._saved[scope][key] = dumped
+
+    def get_conversations(self, name: str) -> ConversationDict:
+        if name not in self.conversations:
+            row = BotData.objects.filter(scope=BotData.CONVERSATION, key=name).values_list('value', flat=True).first()
+
+            self.conversations[name] = {
+                tuple(key): state for key, state in (row or [])
+            }
+
+        return self.conversations[name]
+
+    def update_conversation(self, name: str, key: tuple[int, ...], new_state: Optional[object]) -> None:
+        with self._lock:
+            conversations = self.get_conversations(name)
+
+            if conversations.get(key) == new_state:
+                return
+
+            if new_state is None:
+                conversations.pop(key, None)
+            else:
+                conversations[key] = new_state
+
+            BotData.objects.update_or_create(
+                scope=BotData.CONVERSATION, key=name,
+                defaults={'value': [[list(k), state] for k, state in conversations.items()]},
+            )
+
+    def flush(self) -> None:
+        # Changes are saved after every update, this only writes the
+        # ones made since the last of them
+        if self.bot_data is not None:
+            self._save(BotData.BOT, self.bot_data)
+
+
+def import_pickle(persistence: DjangoPersistence, filename: str) -> list[str]:
+    """Imports the bot data of a PicklePersistence file, if the database
+    has no bot data yet.
+
+    Values that cannot be serialized as JSON are skipped. Returns the keys
+    imported.
+    """
+    if not os.path.exists(filename) or BotData.objects.filter(scope=BotData.BOT).exists():
+        return []
+
+    data = {}
+
+    for key, value in PicklePersistence(filename).get_bot_data().items():
+        try:
+            _dumps(value)
+        except TypeError:
+            logger.warning('Skipped bot data key %s, it cannot be saved as JSON', key)
+            continue
+
+        data[key] = value
+
+    persistence.update_bot_data(data)
+
+    return sorted(data)
@@ -0,0 +1,199 @@
+"""Presence of the users in the DAFI room.
+
+The members and the users waiting for someone to arrive are kept in the
+bot data, so they are saved by the persistence and the web app can read
+them. Members are stored by Telegram id with the time they arrived, and
+leave on their own when the faculty closes or after a long stay.
+"""
+
+import time
+from datetime import (
+    datetime,
+    timedelta,
+)
+from typing import (
+    Any,
+    Callable,
+)
+
+from django.core.cache import cache
+
+import pytz
+
+from main.utils import (
+    bump_cache_version,
+    get_cache_version,
+)
+from users.models import User
+
+from .models import BotData
+
+
+MEMBERS_KEY = 'room_members'
+QUEUE_KEY = 'room_queue'
+
+TIMEZONE = pytz.timezone('Europe/Madrid')
+
+# Time at which the faculty closes
+CLOSING_HOUR = 21
+CLOSING_MINUTE = 10
+
+MAX_STAY = timedelta(hours=8)
+
+# Seconds between checks for expired members
+SWEEP_INTERVAL = 10 * 60
+
+ROOM_VERSION_KEY = 'bot_room_version'
+
+# Bounds the life of the statuses left by old versions, and of those
+# still showing members whose stay has expired
+STATUS_TTL = 60
+
+
+def get_expiration(joined: float) -> float:
+    """Gets the time at which a member that arrived at the given time
+    leaves, either when the faculty closes or after MAX_STAY.
+    """
+    arrival = datetime.fromtimestamp(joined, TIMEZONE)
+
+    closing = TIMEZONE.localize(arrival.replace(
+        tzinfo=None, hour=CLOSING_HOUR, minute=CLOSING_MINUTE, second=0, microsecond=0,
+    ))
+
+    if closing <= arrival:
+        closing = TIMEZONE.localize(closing.replace(tzinfo=None) + timedelta(days=1))
+
+    return min(closing.timestamp(), joined + MAX_STAY.total_seconds())
+
+
+class RoomPresence:
+    """Room members and notification queue on top of the bot data.
+
+    The members are a mapping of Telegram ids, as strings, to the time they
+    arrived, and the queue a list of Telegram ids without duplicates, so
+    everything can be stored as JSON.
+    """
+
+    def __init__(self, bot_data: dict, clock: Callable[[], float] = time.time) -> None:
+        self.clock = clock
+
+        members = bot_data.get(MEMBERS_KEY)
+
+        # Previously stored as a list of ids
+        if not isinstance(members, dict):
+            now = clock()
+            members = {str(member_id): now for member_id in members or []}
+
+        bot_data[MEMBERS_KEY] = members
+
+        self.members: dict[str, float] = members
+        self.queue: list[int] = bot_data.setdefault(QUEUE_KEY, [])
+
+    def __contains__(self, telegram_id: int) -> bool:
+        return str(telegram_id) in self.members
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def get_members(self) -> list[int]:
+        """Gets the members, by arrival.
+        """
+        return [int(member_id) for member_id, _ in sorted(self.members.items(), key=lambda item: item[1])]
+
+    def join(self, telegram_id: int) -> bool:
+        """Adds a member, returning False if it was already in the room.
+        """
+        if telegram_id in self:
+            return False
+
+        self.members[str(telegram_id)] = self.clock()
+
+        return True
+
+    def leave(self, telegram_id: int) -> bool:
+        """Removes a member, returning False if it was not in the room.
+        """
+        return self.members.pop(str(telegram_id), None) is not None
+
+    def expire(self) -> list[int]:
+        """Removes the members whose stay has expired and returns them.
+        """
+        now = self.clock()
+
+        # The sweeping job runs in its own thread, while the handlers may
+        # change the members
+        expired = [
+            member_id for member_id, joined in list(self.members.items())
+            if get_expiration(joined) <= now
+        ]
+
+        for member_id in expired:
+            self.members.pop(member_id, None)
+
+        return [int(member_id) for member_id in expired]
+
+    def wait(self, telegram_id: int) -> None:
+        """Adds a user to the queue notified when someone arrives.
+        """
+        if telegram_id not in self.queue:
+            self.queue.append(telegram_id)
+
+    def pop_queue(self) -> list[int]:
+        """Empties the queue, returning the users in it.
+        """
+        queue = list(self.queue)
+        self.queue.clear()
+
+        return queue
+
+
+def build_status() -> dict[str, Any]:
+    """Builds the status of the room from the saved bot data.
+
+    The members whose stay has expired are left out, as the bot only
+    removes them every SWEEP_INTERVAL seconds.
+    """
+    members = BotData.get_value(MEMBERS_KEY) or {}
+    now = time.time()
+
+    # Previously stored as a list of ids
+    if not isinstance(members, dict):
+        members = dict.fromkeys(map(str, members))
+
+    users = {
+        str(user.telegram_id): user
+        for user in User.objects.filter(telegram_id__in=members.keys())
+    }
+
+    status = []
+
+    for telegram_id, joined in sorted(members.items(), key=lambda item: item[1] or 0):
+        if telegram_id not in users or joined and get_expiration(joined) <= now:
+            continue
+
+        user = users[telegram_id]
+
+        status.append({
+            'name': user.get_full_name() or user.username,
+            'since': datetime.fromtimestamp(joined, TIMEZONE).isoformat() if joined else None,
+        })
+
+    return {
+        'count': len(status),
+        'members': status,
+    }
+
+
+def get_status() -> dict[str, Any]:
+    """Gets the status of the room, built once for every change of the
+    members.
+    """
+    key = f'bot_room_status:{get_cache_version(ROOM_VERSION_KEY)}'
+
+    return cache.get_or_set(key, build_status, STATUS_TTL)
+
+
+def invalidate() -> None:
+    """Discards the cached status of the room of every process.
+    """
+    bump_cache_version(ROOM_VERSION_KEY)
@@ -0,0 +1,76 @@
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter.
+
+    Tokens are refilled continuously at `rate` tokens per second, up to
+    `capacity` tokens, so short bursts are allowed while the long-term
+    rate stays below the limit.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: 'float | None' = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Takes tokens from the bucket if there are enough of them.
+
+        Returns zero when the tokens were taken, or the seconds to wait
+        until there are enough tokens otherwise.
+        """
+        with self._lock:
+            self._refill()
+
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+
+            return (tokens - self._tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Empties the bucket so no tokens are available for the given
+        seconds, as when Telegram asks to wait.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+    def _refill(self) -> None:
+        now = self._clock()
+
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Takes tokens from the bucket, waiting until there are enough.
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+
+            if not wait:
+                return
+
+            self._sleep(wait)
+
+
+# Telegram allows about 30 messages per second to different chats
+GLOBAL_RATE = 25
+
+# Shared by the outbox and the broadcasts of the process, as the Telegram
+# limits apply to the whole bot
+telegram_bucket = TokenBucket(GLOBAL_RATE)
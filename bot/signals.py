@@ -0,0 +1,33 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+
+from users.models import User
+
+from . import presence
+from .models import BotData
+from .users import user_cache
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def user_changed(sender, action: 'str | None' = None, update_fields=None, **kwargs) -> None:
+    # Logins only update the last login, which the bot does not use
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+
+    # m2m_changed is sent both before and after the change
+    if action is None or action.startswith('post_'):
+        user_cache.invalidate()
+
+
+@receiver([post_save, post_delete], sender=BotData)
+def bot_data_changed(sender, instance: BotData, **kwargs) -> None:
+    if instance.scope == BotData.BOT and instance.key == presence.MEMBERS_KEY:
+        presence.invalidate()
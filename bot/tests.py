@@ -1,12 +1,68 @@
-from django.test import TestCase
+import time
+from datetime import datetime
+from unittest import mock
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
 
 from telegram import (
+    ChatMember,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
+    User as TelegramUser,
+)
+from telegram.error import (
+    BadRequest,
+    ChatMigrated,
+    NetworkError,
+    RetryAfter,
+    Unauthorized,
 )
 
+from clubs.models import Club
+from heart.models import (
+    Degree,
+    Group,
+    Year,
+)
+from main.models import (
+    CacheVersion,
+    Config,
+)
+from main.utils import VERSIONS_TTL
 from users.models import User
 
+from .chats import ChatAdminCache
+from .decorators import close_connections
+from .delivery import BroadcastDelivery
+from .handlers.groups.list import get_groups_message
+from .handlers import load_all
+from .handlers.basic import status_my_chat_member
+from .handlers.broadcast import BroadcastMessage
+from .handlers.rooms import job_dafi
+from .models import (
+    BotData,
+    Notification,
+)
+from .notifications import telegram_notify
+from .outbox import OutboxDispatcher
+from .persistence import DjangoPersistence
+from .presence import (
+    MAX_STAY,
+    TIMEZONE,
+    RoomPresence,
+)
+from .ratelimit import TokenBucket
+from .users import (
+    USERS_VERSION_KEY,
+    UserCache,
+)
 from .utils import (
     create_reply_markup,
     create_users_list,
@@ -77,3 +133,516 @@ class BotUtilitiesTests(TestCase):
         l2 = create_users_list(users)
 
         self.assertEqual(l1, l2, 'multiple users generated string not working')
+
+
+    def test_close_connections(self):
+        """close_connections closes the connections even if the handler fails"""
+
+        def handler(fail):
+            if fail:
+                raise ValueError
+
+            return 'done'
+
+        with mock.patch('bot.decorators.close_old_connections') as close:
+            self.assertEqual(close_connections(handler)(False), 'done')
+            self.assertEqual(close.call_count, 2)
+
+            with self.assertRaises(ValueError):
+                close_connections(handler)(True)
+
+            self.assertEqual(close.call_count, 4)
+
+
+class FakeBot:
+    def __init__(self, errors=None):
+        self.sent = []
+        self.errors = errors or {}
+
+    def send_message(self, chat_id, text, reply_markup=None):
+        if chat_id in self.errors:
+            raise self.errors[chat_id]
+
+        self.sent.append((chat_id, text, reply_markup))
+
+
+class BotOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='u1', telegram_id=1111)
+
+    @override_settings(BOT_TOKEN='')
+    def test_notify_without_token(self):
+        """telegram_notify does nothing without a bot token"""
+
+        self.assertFalse(telegram_notify(self.user, 'Hi'))
+        self.assertFalse(Notification.objects.exists(), 'notification queued without bot token')
+
+    @override_settings(BOT_TOKEN='token')
+    def test_notify_enqueues(self):
+        """telegram_notify queues the notification without sending it"""
+
+        self.assertTrue(telegram_notify(self.user, 'Hi', url='/offer/1/', url_button='Ver'))
+        self.assertFalse(telegram_notify(User.objects.create(username='u2'), 'Hi'), 'user without telegram notified')
+
+        notification = Notification.objects.get()
+
+        self.assertEqual(notification.chat_id, 1111)
+        self.assertTrue(notification.url.endswith('/offer/1/'))
+        self.assertIsNone(notification.sent)
+
+    def test_dispatcher(self):
+        """OutboxDispatcher sends pending notifications and retries failures"""
+
+        Notification.objects.create(chat_id=1, text='ok')
+        Notification.objects.create(chat_id=2, text='network')
+        Notification.objects.create(chat_id=3, text='blocked')
+
+        bot = FakeBot({2: NetworkError('timeout'), 3: Unauthorized('blocked')})
+        dispatcher = OutboxDispatcher(bot, bucket=TokenBucket(1000))
+
+        self.assertEqual(dispatcher.run_once(), 1)
+        self.assertEqual([chat_id for chat_id, *_ in bot.sent], [1])
+
+        retry = Notification.objects.get(chat_id=2)
+        self.assertIsNone(retry.sent)
+        self.assertEqual(retry.attempts, 1)
+        self.assertFalse(retry.failed, 'network error is not retried')
+        self.assertGreater(retry.next_attempt, retry.created)
+
+        self.assertTrue(Notification.objects.get(chat_id=3).failed, 'blocked chat is retried')
+
+        # Retried notifications wait for their backoff
+        self.assertEqual(dispatcher.run_once(), 0)
+
+    def test_dispatcher_flood_control(self):
+        """OutboxDispatcher stops the batch when Telegram asks to wait"""
+
+        Notification.objects.create(chat_id=1, text='flood')
+        Notification.objects.create(chat_id=2, text='next')
+
+        dispatcher = OutboxDispatcher(FakeBot({1: RetryAfter(10)}), bucket=TokenBucket(1000))
+
+        self.assertEqual(dispatcher.run_once(), 0)
+        self.assertEqual(Notification.objects.get(chat_id=1).attempts, 0, 'flood control counted as a failure')
+        self.assertIsNone(Notification.objects.get(chat_id=2).sent, 'batch not stopped after flood control')
+        self.assertEqual(list(dispatcher.get_pending()), [Notification.objects.get(chat_id=2)], 'rest of the batch not released')
+
+    def test_dispatcher_claim(self):
+        """OutboxDispatcher does not send the notifications claimed by another dispatcher"""
+
+        notification = Notification.objects.create(chat_id=1, text='once')
+
+        first = OutboxDispatcher(FakeBot(), bucket=TokenBucket(1000))
+        second = OutboxDispatcher(FakeBot(), bucket=TokenBucket(1000))
+
+        self.assertEqual(first.claim_pending(), [notification])
+        self.assertEqual(second.claim_pending(), [], 'claimed notification claimed again')
+        self.assertEqual(second.run_once(), 0)
+
+        # Claimed by a dispatcher that died before sending it
+        Notification.objects.filter(pk=notification.id).update(next_attempt=timezone.now())
+
+        self.assertEqual(second.run_once(), 1, 'notification of a dead dispatcher not sent')
+
+    def test_token_bucket(self):
+        """TokenBucket allows bursts up to its capacity and then limits the rate"""
+
+        now = [0.0]
+        bucket = TokenBucket(2, capacity=2, clock=lambda: now[0])
+
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+
+        now[0] = 0.5
+        self.assertEqual(bucket.try_acquire(), 0)
+
+
+class BotUserCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.now = [0.0]
+        self.cache = UserCache(ttl=10, clock=lambda: self.now[0])
+        self.user = User.objects.create(username='u1', telegram_id=1111)
+
+    def test_cache_hits(self):
+        """UserCache queries each Telegram id once until it expires"""
+
+        with self.assertNumQueries(2):
+            self.assertEqual(self.cache.get(1111), self.user)
+            self.assertIsNone(self.cache.get(2222))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get(1111), self.user)
+            self.assertIsNone(self.cache.get(2222))
+
+        self.assertEqual(self.cache.stats(), {'size': 2, 'hits': 2, 'misses': 2})
+
+        self.now[0] = 11
+
+        with self.assertNumQueries(1):
+            self.cache.get(1111)
+
+    def test_cache_invalidation(self):
+        """User and permission changes discard the cached users"""
+
+        self.cache.get(1111)
+
+        self.user.user_permissions.add(Permission.objects.get(codename='can_change_room_state'))
+
+        cached = self.cache.get(1111)
+
+        self.assertEqual(self.cache.stats()['misses'], 2, 'permission change does not invalidate the cache')
+        self.assertTrue(cached.has_perm('bot.can_change_room_state'))
+
+        self.user.telegram_id = None
+        self.user.save()
+
+        self.assertIsNone(self.cache.get(1111), 'unlinked user still cached')
+
+    def test_cache_invalidation_from_other_process(self):
+        """Users changed by other processes are discarded after VERSIONS_TTL"""
+
+        self.cache.get(1111)
+
+        # Bumped by a web process, without the signals of this one
+        CacheVersion.objects.filter(key=USERS_VERSION_KEY).update(version='other')
+        User.objects.filter(pk=self.user.pk).update(telegram_id=None)
+
+        with mock.patch('main.utils.time.monotonic', return_value=time.monotonic() + VERSIONS_TTL):
+            self.assertIsNone(self.cache.get(1111), 'user changed by other process still cached')
+
+
+class BotChatAdminsTests(TestCase):
+    def test_admin_status(self):
+        """ChatAdminCache only asks Telegram for chats without a known status"""
+
+        class MemberBot:
+            id = 1
+            requests = 0
+
+            def get_chat_member(self, chat_id, user_id):
+                self.requests += 1
+                return ChatMember(TelegramUser(user_id, 'bot', True), ChatMember.MEMBER)
+
+        bot = MemberBot()
+        admins = ChatAdminCache()
+
+        self.assertFalse(admins.is_admin(bot, -100))
+        self.assertFalse(admins.is_admin(bot, -100))
+        self.assertEqual(bot.requests, 1, 'known chat status requested again')
+
+        # Promotions arrive as my_chat_member updates
+        admins.update(-100, ChatMember.ADMINISTRATOR)
+
+        self.assertTrue(admins.is_admin(bot, -100))
+        self.assertEqual(bot.requests, 1)
+
+        # Removals forget the chat, demotions keep it as not administrator
+        for status, known in [(ChatMember.MEMBER, True), (ChatMember.KICKED, False), (ChatMember.ADMINISTRATOR, True), (ChatMember.LEFT, False)]:
+            update = mock.Mock()
+            update.my_chat_member.chat.id = -100
+            update.my_chat_member.new_chat_member.status = status
+
+            with mock.patch('bot.handlers.basic.chat_admins', admins):
+                status_my_chat_member(update, mock.Mock())
+
+            self.assertEqual(-100 in admins._admin, known, f'wrong status kept for {status}')
+
+        self.assertFalse(admins.is_admin(bot, -100))
+        self.assertEqual(bot.requests, 2)
+
+
+class BotBroadcastDeliveryTests(TestCase):
+    def test_delivery(self):
+        """BroadcastDelivery sends to every chat, retrying flood control and migrations"""
+
+        club = Club.objects.create(name='Club', slug='club', description='Club', telegram_group='-2')
+
+        class BroadcastBot:
+            def __init__(self):
+                self.sent = []
+                self.flooded = False
+
+            def send_message(self, chat_id, text, parse_mode=None):
+                if chat_id == '-2':
+                    raise ChatMigrated(-1002)
+                elif chat_id == '-3' and not self.flooded:
+                    self.flooded = True
+                    raise RetryAfter(0.01)
+                elif chat_id == '-4':
+                    raise BadRequest('Chat not found')
+
+                self.sent.append(chat_id)
+
+        bot = BroadcastBot()
+        progress = []
+
+        delivery = BroadcastDelivery(
+            bot, 'Hi', [('A', '-1'), ('B', '-2'), ('C', '-3'), ('D', '-4')], bucket=TokenBucket(1000),
+        )
+
+        with mock.patch('bot.delivery.PROGRESS_INTERVAL', 0):
+            delivery.run(on_progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(sorted(bot.sent), ['-1', '-1002', '-3'])
+        self.assertEqual(sorted(delivery.sent), ['A', 'B', 'C'])
+        self.assertEqual(delivery.errors, ['D'])
+        self.assertEqual(progress, [(1, 4), (2, 4), (3, 4)])
+
+        club.refresh_from_db()
+
+        self.assertEqual(club.telegram_group, '-1002', 'migrated chat not updated')
+
+    def test_handlers_in_order(self):
+        """Broadcast handlers change the bot data from the dispatcher thread"""
+
+        dispatcher = mock.Mock()
+        load_all(dispatcher, mock.Mock())
+
+        handlers = [
+            handler for (handler, *_), _ in dispatcher.add_handler.call_args_list
+            if getattr(handler, 'command', None) == ['broadcast']
+            or getattr(getattr(handler, 'pattern', None), 'pattern', None) == 'broadcast'
+        ]
+
+        self.assertEqual(len(handlers), 2)
+        self.assertFalse(any(handler.run_async for handler in handlers), 'broadcast handlers run in the worker pool')
+
+    def test_token_bucket_pause(self):
+        """TokenBucket.pause makes every caller wait"""
+
+        now = [0.0]
+        bucket = TokenBucket(10, clock=lambda: now[0])
+
+        bucket.pause(2)
+
+        self.assertAlmostEqual(bucket.try_acquire(), 2.1)
+
+        now[0] = 2.1
+        self.assertEqual(bucket.try_acquire(), 0)
+
+    def test_shared_rate_limit(self):
+        """Broadcasts and notifications share the rate limiter of the process"""
+
+        delivery = BroadcastDelivery(FakeBot(), 'Hi', [])
+        dispatcher = OutboxDispatcher(FakeBot())
+
+        self.assertIs(delivery.bucket, dispatcher.bucket)
+
+    def test_delivery_once_per_chat(self):
+        """BroadcastDelivery sends a single message to every chat"""
+
+        bot = mock.Mock()
+        delivery = BroadcastDelivery(bot, 'Hi', [('Group', '-1'), ('Club', '-1'), ('Other', '-2')], bucket=TokenBucket(1000))
+
+        delivery.run()
+
+        self.assertEqual(sorted(c.args[0] for c in bot.send_message.call_args_list), ['-1', '-2'])
+
+
+class BotPersistenceTests(TestCase):
+    def test_bot_data(self):
+        """Only the changed keys of the bot data are written"""
+
+        persistence = DjangoPersistence()
+
+        data = persistence.get_bot_data()
+        self.assertEqual(data, {})
+
+        data['elections'] = True
+        data['room_members'] = ['1111']
+
+        persistence.update_bot_data(data)
+
+        data['room_members'].append('2222')
+
+        # A single update_or_create, with its savepoints, and the room
+        # status version bumped by the signal
+        with self.assertNumQueries(7):
+            persistence.update_bot_data(data)
+
+        with self.assertNumQueries(0):
+            persistence.update_bot_data(data)
+
+        del data['elections']
+        persistence.update_bot_data(data)
+
+        self.assertEqual(DjangoPersistence().get_bot_data(), {'room_members': ['1111', '2222']})
+        self.assertEqual(BotData.get_value('room_members'), ['1111', '2222'])
+        self.assertIsNone(BotData.get_value('elections'))
+
+    def test_user_data_and_conversations(self):
+        persistence = DjangoPersistence()
+
+        persistence.update_user_data(1111, {'step': 1})
+        persistence.update_conversation('link', (1111, 1111), 2)
+
+        loaded = DjangoPersistence()
+
+        self.assertEqual(loaded.get_user_data()[1111], {'step': 1})
+        self.assertEqual(loaded.get_conversations('link'), {(1111, 1111): 2})
+
+        loaded.update_conversation('link', (1111, 1111), None)
+
+        self.assertEqual(DjangoPersistence().get_conversations('link'), {})
+
+    def test_broadcast_message(self):
+        """Pending broadcasts can be stored as JSON"""
+
+        bcast = BroadcastMessage('Hi')
+        bcast.add_chat('A', '-1')
+        bcast.add_chat('B', '-2')
+
+        persistence = DjangoPersistence()
+        persistence.update_bot_data({'broadcast1': bcast.to_dict()})
+
+        loaded = BroadcastMessage.from_dict(DjangoPersistence().get_bot_data()['broadcast1'])
+
+        self.assertEqual(loaded.text, 'Hi')
+        self.assertEqual(loaded.chats, {('A', '-1'), ('B', '-2')})
+
+
+class BotGroupsListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.degree = Degree.objects.create(id='GII', name='Grado en Ingeniería Informática')
+        self.year = Year.objects.create(year=1, degree=self.degree, telegram_group_link='https://t.me/y1')
+        self.delegate = User.objects.create(username='d1', first_name='Delegado', telegram_user='d1', telegram_id=1111)
+        self.group = Group.objects.create(
+            name='Grupo 1', number=1, year=self.year, subgroups=2,
+            delegate=self.delegate, telegram_group_link='https://t.me/g1',
+        )
+
+    def test_groups_message(self):
+        """The groups message is rendered once until the directory changes"""
+
+        msg = get_groups_message()
+
+        self.assertIn('📚 Grado en Ingeniería Informática 📚', msg)
+        self.assertIn('[1º General](https://t.me/y1)', msg)
+        self.assertIn('[1º Grupo 1](https://t.me/g1)', msg)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_groups_message(), msg)
+
+        Config.objects.create(key='current_school_year', value='2021-22')
+        self.assertIn('Grupos de Telegram 2021-22', get_groups_message())
+
+        self.group.telegram_group_link = 'https://t.me/g2'
+        self.group.save()
+        self.assertIn('[1º Grupo 1](https://t.me/g2)', get_groups_message())
+
+    def test_students_view(self):
+        """The students page shares the cached directory"""
+
+        response = self.client.get(reverse('heart:students'))
+        self.assertContains(response, 'Grupo 1')
+        self.assertContains(response, '@d1')
+
+        self.delegate.first_name = 'Delegada'
+        self.delegate.save()
+
+        response = self.client.get(reverse('heart:students'))
+        self.assertContains(response, 'Delegada')
+
+        # Logins do not invalidate the directory
+        with self.assertNumQueries(1):
+            self.delegate.save(update_fields=['last_login'])
+
+
+class BotRoomPresenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_presence(self):
+        """Members leave on their own when the faculty closes"""
+
+        now = [TIMEZONE.localize(datetime(2021, 11, 10, 14, 0)).timestamp()]
+
+        bot_data = {'room_members': [1111]}
+        presence = RoomPresence(bot_data, clock=lambda: now[0])
+
+        self.assertIn(1111, presence)
+        self.assertFalse(presence.join(1111))
+        self.assertTrue(presence.join(2222))
+        self.assertEqual(presence.get_members(), [1111, 2222])
+
+        self.assertTrue(presence.leave(1111))
+        self.assertFalse(presence.leave(1111))
+        self.assertEqual(bot_data['room_members'], {'2222': now[0]})
+
+        presence.wait(3333)
+        presence.wait(3333)
+        self.assertEqual(presence.pop_queue(), [3333])
+        self.assertEqual(bot_data['room_queue'], [])
+
+        now[0] = TIMEZONE.localize(datetime(2021, 11, 10, 21, 0)).timestamp()
+        presence.join(1111)
+        self.assertEqual(presence.expire(), [])
+
+        now[0] = TIMEZONE.localize(datetime(2021, 11, 10, 21, 10)).timestamp()
+        self.assertEqual(sorted(presence.expire()), [1111, 2222])
+        self.assertEqual(len(presence), 0)
+
+        # Joined after the closing time, so the stay is limited
+        presence.join(1111)
+        now[0] += 9 * 60 * 60
+        self.assertEqual(presence.expire(), [1111])
+
+    def test_sweep_job(self):
+        """The sweeping job saves the bot data when members leave"""
+
+        context = mock.Mock()
+        context.bot_data = {'room_members': {'1111': time.time()}}
+
+        job_dafi(context)
+
+        context.dispatcher.update_persistence.assert_not_called()
+
+        context.bot_data['room_members']['2222'] = time.time() - MAX_STAY.total_seconds()
+
+        job_dafi(context)
+
+        self.assertEqual(list(context.bot_data['room_members']), ['1111'])
+        context.dispatcher.update_persistence.assert_called_once_with()
+        context.bot.send_message.assert_called_once()
+
+    def test_room_status(self):
+        """The room status is cached until the members change"""
+
+        user = User.objects.create(username='u1', first_name='Uno', telegram_id=1111)
+        url = reverse('bot:room_status')
+
+        persistence = DjangoPersistence()
+        bot_data = persistence.get_bot_data()
+
+        self.assertEqual(self.client.get(url).json(), {'count': 0})
+
+        RoomPresence(bot_data).join(1111)
+        persistence.update_bot_data(bot_data)
+
+        self.assertEqual(self.client.get(url).json(), {'count': 1}, 'members shown to anonymous users')
+
+        self.client.force_login(user)
+
+        status = self.client.get(url).json()
+        self.assertEqual(status['count'], 1)
+        self.assertEqual(status['members'][0]['name'], 'Uno')
+
+        with self.assertNumQueries(2):
+            # Only the session and the user of the request
+            self.client.get(url)
+
+        RoomPresence(bot_data).leave(1111)
+        persistence.update_bot_data(bot_data)
+
+        self.assertEqual(self.client.get(url).json()['count'], 0)
+
+        # Not swept yet by the bot
+        RoomPresence(bot_data, clock=lambda: time.time() - MAX_STAY.total_seconds()).join(1111)
+        persistence.update_bot_data(bot_data)
+
+        self.assertEqual(self.client.get(url).json()['count'], 0, 'expired member shown')
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+
+app_name = 'bot'
+
+urlpatterns = [
+    path('dafi/', views.RoomStatusView.as_view(), name='room_status'),
+]
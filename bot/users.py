@@ -0,0 +1,93 @@
+"""Cache of the users linked to Telegram accounts.
+
+Most bot handlers look up the web user of the Telegram user sending the
+update, so the users are kept in memory for a while. Any change of the
+users or their permissions bumps a shared version, discarding the cached
+users of every process.
+"""
+
+import threading
+import time
+from typing import Callable
+
+from main.utils import (
+    bump_cache_version,
+    get_cache_version,
+)
+from users.models import User
+
+
+USERS_VERSION_KEY = 'bot_users_version'
+
+USERS_TTL = 300
+
+
+class UserCache:
+    """Telegram id to user cache with expiration.
+
+    Unlinked Telegram users are cached as None too, as they may keep
+    sending commands.
+
+    The version is read from the database, so changes made by the web
+    processes, like revoked permissions or unlinked accounts, reach the bot
+    process too. Every process remembers the version for VERSIONS_TTL
+    seconds, so the bot may still use a changed user for that long, and
+    never for more than the ttl.
+    """
+
+    def __init__(self, ttl: float = USERS_TTL, clock: Callable[[], float] = time.monotonic) -> None:
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+
+        self._users: dict[int, tuple[float, 'User | None']] = {}
+        self._version: 'str | None' = None
+        self._lock = threading.Lock()
+
+    def get(self, telegram_id: int) -> 'User | None':
+        """Gets the user linked to a Telegram account, if any.
+        """
+        version = get_cache_version(USERS_VERSION_KEY)
+        now = self.clock()
+
+        with self._lock:
+            if self._version != version:
+                self._users.clear()
+                self._version = version
+
+            entry = self._users.get(telegram_id)
+
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+
+        user = User.objects.filter(telegram_id=telegram_id).first()
+
+        with self._lock:
+            # The users may have changed during the query
+            if self._version == version:
+                self._users[telegram_id] = (now + self.ttl, user)
+
+        return user
+
+    def invalidate(self) -> None:
+        """Discards the cached users of every process.
+        """
+        bump_cache_version(USERS_VERSION_KEY)
+
+        with self._lock:
+            self._users.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'size': len(self._users),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+user_cache = UserCache()
@@ -0,0 +1,20 @@
+from django.http import JsonResponse
+from django.views import View
+
+from . import presence
+
+
+class RoomStatusView(View):
+    """Members in the DAFI room, as registered with /dafi.
+
+    Anonymous users only get the number of members, their names are only
+    shown to the users of the web.
+    """
+
+    def get(self, request, *args, **kwargs):
+        status = presence.get_status()
+
+        if not request.user.is_authenticated:
+            status = {'count': status['count']}
+
+        return JsonResponse(status)
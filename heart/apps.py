@@ -5,3 +5,6 @@ class HeartConfig(AppConfig):
 
     name = 'heart'
     verbose_name = 'El Corazón'
+
+    def ready(self):
+        from . import signals  # noqa: F401
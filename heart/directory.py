@@ -0,0 +1,114 @@
+"""Directory of the student groups.
+
+The degrees, years and groups with their delegates and Telegram links are
+shown by the web and listed by the bot, but they only change a few times
+a year, so the directory is built once and kept in the cache until any of
+them changes. The version is shared by every process through the database,
+and the TTL bounds the changes made without signals, like bulk updates.
+"""
+
+from typing import Any
+
+from django.core.cache import cache
+
+from main.models import Config
+from main.utils import (
+    bump_cache_version,
+    get_cache_version,
+)
+from users.models import User
+
+from .models import (
+    Degree,
+    Group,
+    Year,
+)
+
+
+DIRECTORY_VERSION_KEY = 'heart_directory_version'
+
+# Key of the school year in the configuration
+SCHOOL_YEAR_KEY = 'current_school_year'
+
+# Bounds the life of the directories left by old versions, and of those
+# missing changes made without signals
+DIRECTORY_TTL = 60 * 10
+
+
+def _delegate(user: 'User | None') -> 'dict[str, Any] | None':
+    if user is None:
+        return None
+
+    return {
+        'name': user.get_full_name() or user.username,
+        'telegram_user': user.telegram_user if user.telegram_id else None,
+    }
+
+
+def build_directory() -> dict[str, Any]:
+    """Builds the directory from the database.
+
+    Only the years with groups or a Telegram group, and their degrees,
+    are included.
+    """
+    groups = (
+        Group
+        .objects
+        .select_related('year', 'delegate', 'subdelegate')
+        .order_by('year__year', 'number', 'id')
+    )
+
+    years: dict[int, list[dict[str, Any]]] = {}
+
+    for group in groups:
+        years.setdefault(group.year_id, []).append({
+            'id': group.id,
+            'name': group.name,
+            'telegram_group_link': group.telegram_group_link,
+            'delegate': _delegate(group.delegate),
+            'subdelegate': _delegate(group.subdelegate),
+        })
+
+    degrees: dict[str, list[dict[str, Any]]] = {}
+
+    linked_years = Year.objects.filter(id__in=years.keys()) | Year.objects.filter(telegram_group_link__gt='')
+
+    for year in linked_years.order_by('year'):
+        degrees.setdefault(year.degree_id, []).append({
+            'year': year.year,
+            'telegram_group_link': year.telegram_group_link,
+            'groups': years.get(year.id, []),
+        })
+
+    return {
+        'school_year': Config.get(SCHOOL_YEAR_KEY),
+        'degrees': [
+            {
+                'id': degree.id,
+                'name': degree.name,
+                'is_master': degree.is_master,
+                'years': degrees[degree.id],
+                'has_groups': any(year['groups'] for year in degrees[degree.id]),
+            }
+            for degree in Degree.objects.filter(id__in=degrees.keys())
+        ],
+    }
+
+
+def get_cache_key(name: str) -> str:
+    """Gets a cache key that changes with the directory, so data derived
+    from it can be cached too.
+    """
+    return f'heart_{name}:{get_cache_version(DIRECTORY_VERSION_KEY)}'
+
+
+def get_directory() -> dict[str, Any]:
+    """Gets the directory, building it if it is not cached.
+    """
+    return cache.get_or_set(get_cache_key('directory'), build_directory, DIRECTORY_TTL)
+
+
+def invalidate() -> None:
+    """Discards the cached directory of every process.
+    """
+    bump_cache_version(DIRECTORY_VERSION_KEY)
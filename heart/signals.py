@@ -0,0 +1,39 @@
+from django.db.models import Q
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+
+from main.models import Config
+from users.models import User
+
+from . import directory
+from .models import (
+    Degree,
+    Group,
+    Year,
+)
+
+
+@receiver([post_save, post_delete], sender=Degree)
+@receiver([post_save, post_delete], sender=Year)
+@receiver([post_save, post_delete], sender=Group)
+def directory_changed(sender, **kwargs) -> None:
+    directory.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Config)
+def config_changed(sender, instance: Config, **kwargs) -> None:
+    if instance.key == directory.SCHOOL_YEAR_KEY:
+        directory.invalidate()
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance: User, created: bool, update_fields=None, **kwargs) -> None:
+    # Logins only update the last login, which is not in the directory
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+
+    if Group.objects.filter(Q(delegate=instance) | Q(subdelegate=instance)).exists():
+        directory.invalidate()
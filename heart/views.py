@@ -22,6 +22,7 @@ from meta.views import MetadataMixin
 
 from main.models import Config
 
+from . import directory
 from .forms import FiumcraftWhitelistForm
 from .models import (
     Committee,
@@ -225,9 +226,7 @@ class MeetingsDeleteView(PermissionRequiredMixin, MetadataMixin, DeleteView):
     title = 'Eliminar Asamblea de Alumnos'
 
 
-class StudentsView(MetadataMixin, ListView):
-
-    model = Group
+class StudentsView(MetadataMixin, TemplateView):
 
     template_name = 'heart/students.html'
 
@@ -235,8 +234,10 @@ class StudentsView(MetadataMixin, ListView):
     description = 'Grupos de Estudiantes y Asambleas de Alumnos de la Facultad de Informática'
     image = 'images/favicon.png'
 
-    def get_queryset(self):
-        return super().get_queryset().prefetch_related('year__degree')
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['directory'] = directory.get_directory()
+        return context
 
 
 class FiumcraftWhitelistView(MetadataMixin, FormView):
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_menuentry_visible'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('key', models.CharField(max_length=128, primary_key=True, serialize=False, verbose_name='clave')),
+                ('version', models.CharField(max_length=32, verbose_name='versión')),
+            ],
+            options={
+                'verbose_name': 'versión de caché',
+                'verbose_name_plural': 'versiones de caché',
+            },
+        ),
+    ]
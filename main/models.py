@@ -91,3 +91,28 @@ class MenuEntry(models.Model):
 
     def __str__(self) -> str:
         return f'Entrada #{self.id}'
+
+
+class CacheVersion(models.Model):
+    """Version of cached data.
+
+    Stored in the database, so every process, including the bot, sees the
+    changes made by the others.
+    """
+
+    objects: 'models.Manager[CacheVersion]'
+
+    key: 'models.CharField[str, str]' = models.CharField(
+        'clave', max_length=128, primary_key=True
+    )
+
+    version: 'models.CharField[str, str]' = models.CharField(
+        'versión', max_length=32
+    )
+
+    class Meta:
+        verbose_name = 'versión de caché'
+        verbose_name_plural = 'versiones de caché'
+
+    def __str__(self) -> str:
+        return f'{self.key}: {self.version}'
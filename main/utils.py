@@ -1,7 +1,13 @@
+import threading
+import time
+from uuid import uuid4
+
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.cache import cache
 from django.urls import reverse
 
+from .models import CacheVersion
+
 
 def get_domain() -> str:
     site_url = cache.get('main_domain')
@@ -15,3 +21,60 @@ def get_domain() -> str:
 
 def get_url(*args, **kwargs) -> str:
     return get_domain() + reverse(*args, **kwargs)
+
+
+# Seconds a process trusts the versions it has read, so the cached data
+# is not checked against the database on every access
+VERSIONS_TTL = 2
+
+_versions: dict[str, tuple[float, str]] = {}
+_versions_lock = threading.Lock()
+
+
+def _remember_version(key: str, version: str) -> str:
+    with _versions_lock:
+        _versions[key] = (time.monotonic() + VERSIONS_TTL, version)
+
+    return version
+
+
+def get_cache_version(key: str) -> str:
+    """Gets a version shared by every process, used to invalidate cached
+    data across processes.
+
+    The versions live in the database, so the changes made by any process
+    are seen by the rest in at most VERSIONS_TTL seconds.
+    """
+    entry = _versions.get(key)
+
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+
+    version, _ = CacheVersion.objects.get_or_create(key=key, defaults={'version': uuid4().hex})
+
+    return _remember_version(key, version.version)
+
+
+def bump_cache_version(key: str, expected: 'str | None' = None) -> 'str | None':
+    """Replaces a shared version with a new one and returns it.
+
+    Versions are random, so they are never reused. If expected is given,
+    the version is only replaced if it is still the expected one, returning
+    None otherwise.
+    """
+    version = uuid4().hex
+
+    if expected is None:
+        if not CacheVersion.objects.filter(key=key).update(version=version):
+            CacheVersion.objects.get_or_create(key=key, defaults={'version': version})
+    elif not CacheVersion.objects.filter(key=key, version=expected).update(version=version):
+        return None
+
+    return _remember_version(key, version)
+
+
+def reset_cache_versions() -> None:
+    """Forgets the versions read by this process.
+    """
+    with _versions_lock:
+        _versions.clear()
@@ -11,7 +11,8 @@ class SubjectAdmin(admin.ModelAdmin):
 
 @admin.register(models.TradePeriod)
 class TradePeriodAdmin(admin.ModelAdmin):
-    list_display = ('name', 'start', 'end')
+    list_display = ('name', 'start', 'end', 'archived')
+    readonly_fields = ('archived', 'summary')
 
 
 class TradeOfferLineInline(admin.TabularInline):
@@ -30,3 +31,10 @@ class TradeOfferAdmin(admin.ModelAdmin):
 class TradeOfferAnswerAdmin(admin.ModelAdmin):
     list_display = ('offer', 'user', 'creation_date', 'is_completed')
     list_filter = ['offer', 'user', 'is_completed']
+
+
+@admin.register(models.ArchivedTradeOffer)
+class ArchivedTradeOfferAdmin(admin.ModelAdmin):
+    list_display = ('offer_id', 'period', 'user')
+    list_filter = ['period']
+    raw_id_fields = ('user',)
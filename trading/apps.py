@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TradingConfig(AppConfig):
     name = 'trading'
     verbose_name = 'Intercambios'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,177 @@
+"""Trading periods archive.
+
+Moves the offers of the closed periods out of the trading tables into one
+JSON document per offer, and keeps the statistics of the period, so the
+live trading queries only have to deal with the current data.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (
+    Count,
+    Exists,
+    OuterRef,
+)
+from django.utils import timezone
+
+from . import matching
+from .models import (
+    ArchivedTradeOffer,
+    TradeOffer,
+    TradeOfferAnswer,
+    TradeOfferEvent,
+    TradeOfferLine,
+    TradePeriod,
+)
+
+
+CHUNK_SIZE = 200
+
+# Time the periods with exchanges still in process are kept after their end
+PENDING_GRACE = timedelta(days=30)
+
+
+def get_archivable_periods():
+    """
+    Returns the periods that have ended and are not archived yet
+
+    The periods with accepted offers not completed yet are left until
+    PENDING_GRACE after their end, so the users can finish the exchanges.
+    """
+
+    now = timezone.now()
+
+    pending = TradeOffer.objects.filter(period=OuterRef('pk'), is_completed=False).exclude(answer=None)
+
+    return (
+        TradePeriod.objects
+        .filter(end__lt=now, archived=None)
+        .exclude(Exists(pending), end__gte=now - PENDING_GRACE)
+        .order_by('start')
+    )
+
+
+def get_summary(period):
+    """Computes the statistics of a period from its trading data"""
+
+    offers = TradeOffer.objects.filter(period=period)
+    lines = TradeOfferLine.objects.filter(offer__period=period)
+
+    return {
+        'offers': offers.count(),
+        'visible': offers.filter(is_visible=True).count(),
+        'accepted': offers.exclude(answer=None).count(),
+        'completed': offers.filter(is_completed=True).exclude(answer=None).count(),
+        'answers': TradeOfferAnswer.objects.filter(offer__period=period).count(),
+        'lines': lines.count(),
+        'years': {
+            str(year): count
+            for year, count in lines.order_by().values_list('year').annotate(Count('id'))
+        },
+    }
+
+
+def _user_data(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'name': user.get_full_name(),
+        'email': user.email,
+    }
+
+
+def offer_to_archive(offer):
+    """Serializes an offer with its lines and answers"""
+
+    return {
+        'id': offer.id,
+        'user': _user_data(offer.user),
+        'creation_date': offer.creation_date.isoformat(),
+        'description': offer.description,
+        'is_visible': offer.is_visible,
+        'is_completed': offer.is_completed,
+        'answer': offer.answer_id,
+        'lines': [
+            {
+                'year': line.year,
+                'subjects': line.get_subjects_list(),
+                'started': line.get_started_list(),
+                'completed': line.get_completed_list(),
+                'curr_group': line.curr_group,
+                'curr_subgroup': line.curr_subgroup,
+                'wanted_groups': line.get_wanted_groups(),
+                'is_completed': line.is_completed,
+            }
+            for line in offer.lines.all()
+        ],
+        'answers': [
+            {
+                'id': answer.id,
+                'user': _user_data(answer.user),
+                'groups': answer.get_groups(),
+                'creation_date': answer.creation_date.isoformat(),
+                'is_visible': answer.is_visible,
+                'is_completed': answer.is_completed,
+            }
+            for answer in offer.answers.all()
+        ],
+    }
+
+
+def archive_period(period, chunk_size=CHUNK_SIZE):
+    """
+    Archives the offers of a period and deletes them from the trading tables
+
+    The statistics of the period are stored in its summary. Everything runs in
+    a single transaction, so a failure leaves the period untouched. Returns the
+    number of archived offers.
+    """
+
+    queryset = (
+        TradeOffer.objects
+        .filter(period=period)
+        .select_related('user')
+        .prefetch_related('lines', 'answers__user')
+        .order_by('id')
+    )
+
+    count = 0
+
+    with transaction.atomic():
+        summary = get_summary(period)
+
+        while True:
+            # Deleted offers leave the queryset, so every chunk is the first one
+            chunk = list(queryset[:chunk_size])
+
+            if not chunk:
+                break
+
+            ArchivedTradeOffer.objects.bulk_create(
+                ArchivedTradeOffer(
+                    period=period,
+                    offer_id=offer.id,
+                    user_id=offer.user_id,
+                    data=offer_to_archive(offer),
+                )
+                for offer in chunk
+            )
+
+            ids = [offer.id for offer in chunk]
+
+            # The accepted answer is protected while the offer points to it
+            TradeOffer.objects.filter(id__in=ids).update(answer=None)
+            TradeOffer.objects.filter(id__in=ids).delete()
+
+            count += len(chunk)
+
+        TradeOfferEvent.objects.filter(period=period).delete()
+
+        period.archived = timezone.now()
+        period.summary = summary
+        period.save(update_fields=('archived', 'summary'))
+
+    matching.invalidate(period.id)
+
+    return count
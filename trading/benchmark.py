@@ -0,0 +1,345 @@
+"""Trading load benchmark.
+
+Generates synthetic trading periods with realistic volumes and measures
+the time and queries of the main trading views against them. The synthetic
+periods, users and subjects are marked, so they can be deleted afterwards.
+"""
+
+import platform
+import random
+import statistics
+import time
+from datetime import timedelta
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import (
+    connection,
+    transaction,
+)
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Subject,
+    TradeOffer,
+    TradeOfferAnswer,
+    TradeOfferLine,
+    TradeOfferLineSubject,
+    TradeOfferLineWantedGroup,
+    TradePeriod,
+    get_years,
+    subjects_registry,
+)
+
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+SYNTHETIC_SUBJECTS = 10
+
+# Marks of the synthetic rows, used to delete them
+SYNTHETIC_PREFIX = '[Sintético] '
+SYNTHETIC_DOMAIN = 'benchmark.invalid'
+SYNTHETIC_SUBJECT_NAME = 'Asignatura sintética'
+
+
+def _get_subjects():
+    """Gets the subject codes of every year, creating synthetic subjects
+    for the years without any.
+    """
+    years = get_years()
+    grouped = Subject.get_grouped()
+    missing = [year for year in years if not grouped.get(year)]
+
+    if missing:
+        Subject.objects.bulk_create(
+            Subject(
+                code=90000 + year * 100 + i,
+                name='{} {}.{}'.format(SYNTHETIC_SUBJECT_NAME, year, i),
+                acronym='AS{}{}'.format(year, i),
+                year=year,
+            )
+            for year in missing
+            for i in range(1, SYNTHETIC_SUBJECTS + 1)
+        )
+
+        # bulk_create does not send the signals that invalidate the caches
+        subjects_registry.invalidate()
+        grouped = Subject.get_grouped()
+
+    return {year: [s.code for s in grouped[year]] for year in years}
+
+
+def _random_line(rng, offer, year, subjects):
+    groups = get_years()[year].groups
+
+    curr_group = rng.choice(list(groups))
+    others = [g for g in groups if g != curr_group]
+    wanted = rng.sample(others, rng.randint(1, len(others)))
+
+    return TradeOfferLine(
+        offer=offer,
+        year=year,
+        subjects=','.join(str(s) for s in sorted(rng.sample(subjects, rng.randint(1, len(subjects))))),
+        curr_group=curr_group,
+        curr_subgroup=rng.randint(1, groups[curr_group]),
+        wanted_groups=','.join(str(g) for g in sorted(wanted)),
+    )
+
+
+def generate_period(users=1000, offers=None, answers=2, seed=0, name=None):
+    """
+    Creates a current trading period filled with synthetic data
+
+    Every offer belongs to a different user and has between one and three
+    lines following the trading academic structure, and receives up to the given
+    number of answers from other users. The period name starts with
+    SYNTHETIC_PREFIX and the users emails are in SYNTHETIC_DOMAIN, so
+    delete_synthetic_data() can remove them. Returns the period and the number
+    of rows created of every kind.
+    """
+
+    rng = random.Random(seed)
+    years = get_years()
+
+    if offers is None:
+        offers = users // 2
+
+    offers = min(offers, users)
+    subjects = _get_subjects()
+    now = timezone.now()
+
+    with transaction.atomic():
+        period = TradePeriod.objects.create(
+            name=SYNTHETIC_PREFIX + (name or 'Periodo {}'.format(now.strftime('%Y%m%d%H%M%S'))),
+            start=now - timedelta(days=1),
+            end=now + timedelta(days=7),
+        )
+
+        prefix = 'bench{}_'.format(period.id)
+
+        User.objects.bulk_create(
+            (
+                User(
+                    username='{}{}'.format(prefix, i),
+                    email='{}{}@{}'.format(prefix, i, SYNTHETIC_DOMAIN),
+                    password='!',
+                )
+                for i in range(users)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        # SQLite does not return the ids of bulk created rows, so they are
+        # read back in insertion order
+        user_ids = list(
+            User.objects.filter(username__startswith=prefix).order_by('id').values_list('id', flat=True)
+        )
+
+        TradeOffer.objects.bulk_create(
+            (TradeOffer(user_id=user_id, period=period) for user_id in user_ids[:offers]),
+            batch_size=BATCH_SIZE,
+        )
+
+        offer_list = list(TradeOffer.objects.filter(period=period).order_by('id'))
+
+        TradeOfferLine.objects.bulk_create(
+            (
+                _random_line(rng, offer, year, subjects[year])
+                for offer in offer_list
+                for year in sorted(rng.sample(list(years), rng.randint(1, len(years))))
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        lines = list(TradeOfferLine.objects.filter(offer__period=period).order_by('id'))
+
+        # bulk_create skips save(), so the normalized relations are built here
+        TradeOfferLineSubject.objects.bulk_create(
+            (
+                TradeOfferLineSubject(line=line, subject_id=code)
+                for line in lines
+                for code in line.get_subjects_list()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        TradeOfferLineWantedGroup.objects.bulk_create(
+            (
+                TradeOfferLineWantedGroup(line=line, group=group)
+                for line in lines
+                for group in line.get_wanted_groups()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        offer_lines = {}
+
+        for line in lines:
+            offer_lines.setdefault(line.offer_id, []).append(line)
+
+        answer_list = []
+
+        for offer in offer_list:
+            candidates = [u for u in rng.sample(user_ids, min(len(user_ids), answers + 1)) if u != offer.user_id]
+
+            for user_id in candidates[:answers]:
+                groups = {}
+
+                for line in offer_lines[offer.id]:
+                    group = rng.choice(line.get_wanted_groups())
+                    groups[str(line.year)] = [group, rng.randint(1, years[line.year].groups[group])]
+
+                answer = TradeOfferAnswer(offer=offer, user_id=user_id)
+                answer.set_groups(groups)
+                answer_list.append(answer)
+
+        TradeOfferAnswer.objects.bulk_create(answer_list, batch_size=BATCH_SIZE)
+
+    # bulk_create does not send the signals that invalidate the caches
+    TradePeriod.invalidate_cache()
+
+    return period, {
+        'users': len(user_ids),
+        'offers': len(offer_list),
+        'lines': len(lines),
+        'answers': len(answer_list),
+    }
+
+
+def delete_synthetic_data():
+    """
+    Deletes the periods, users and subjects created by generate_period
+
+    Returns the number of periods, users and subjects deleted.
+    """
+
+    periods = TradePeriod.objects.filter(name__startswith=SYNTHETIC_PREFIX)
+
+    with transaction.atomic():
+        # The accepted answers are protected while the offers point to them
+        TradeOffer.objects.filter(period__in=periods).update(answer=None)
+
+        # Deleted offers publish their removal in the feed of their period,
+        # so they go before the periods
+        TradeOffer.objects.filter(period__in=periods).delete()
+
+        counts = {
+            'periods': periods.delete()[1].get(TradePeriod._meta.label, 0),
+            'users': User.objects.filter(email__endswith='@' + SYNTHETIC_DOMAIN).delete()[1].get(User._meta.label, 0),
+            'subjects': Subject.objects.filter(name__startswith=SYNTHETIC_SUBJECT_NAME).delete()[1].get(Subject._meta.label, 0),
+        }
+
+    # Bulk deletes do not send the signals that invalidate the caches
+    TradePeriod.invalidate_cache()
+    subjects_registry.invalidate()
+
+    return counts
+
+
+def _timed(request):
+    """Runs a request, returning its response, time and number of queries"""
+
+    with CaptureQueriesContext(connection) as ctx:
+        start = time.perf_counter()
+        response = request()
+        elapsed = (time.perf_counter() - start) * 1000
+
+    return response, elapsed, len(ctx.captured_queries)
+
+
+def _in_rollback(run):
+    """Runs a measurement inside a transaction that is rolled back"""
+
+    def wrapper():
+        with transaction.atomic():
+            result = run()
+            transaction.set_rollback(True)
+
+        return result
+
+    return wrapper
+
+
+def _measure(run, repeat):
+    """Repeats a measurement after a warm up run and summarizes it"""
+
+    run()
+
+    results = [run() for _ in range(repeat)]
+    times = [elapsed for _, elapsed, _ in results]
+
+    return {
+        'status': results[-1][0].status_code,
+        'queries': max(queries for _, _, queries in results),
+        'time_ms': {
+            'min': round(min(times), 2),
+            'median': round(statistics.median(times), 2),
+            'max': round(max(times), 2),
+        },
+    }
+
+
+def run_benchmark(period, repeat=5):
+    """
+    Measures the main trading views with the data of a period
+
+    Answer acceptance and the change process run inside rolled back
+    transactions, so the period data is not modified. Must be called with
+    the test environment set up, as the views are requested through the
+    test client.
+    """
+
+    offer = (
+        TradeOffer.objects
+        .filter(period=period, answer=None, answers__isnull=False)
+        .order_by('id')
+        .first()
+    )
+
+    if offer is None:
+        raise ValueError('El periodo no tiene ofertas con respuestas')
+
+    answer = offer.answers.order_by('id').first()
+
+    owner = Client()
+    owner.force_login(offer.user)
+
+    other = Client()
+    other.force_login(answer.user)
+
+    accept_url = reverse('trading:answer_accept', args=[answer.id])
+    process_url = reverse('trading:change_process', args=[offer.id])
+
+    def change_process():
+        owner.post(accept_url)
+        return _timed(lambda: owner.get(process_url))
+
+    results = {
+        'index': _measure(lambda: _timed(lambda: other.get(reverse('trading:list'))), repeat),
+        'index_last_page': _measure(lambda: _timed(lambda: other.get(reverse('trading:list'), {'page': 'last'})), repeat),
+        'offer_detail': _measure(lambda: _timed(lambda: owner.get(offer.get_absolute_url())), repeat),
+        'answer_accept': _measure(_in_rollback(lambda: _timed(lambda: owner.post(accept_url))), repeat),
+        # The change process needs an accepted answer, so only the request
+        # made after accepting it is measured
+        'change_process': _measure(_in_rollback(change_process), repeat),
+    }
+
+    return {
+        'date': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'period': period.id,
+        'data': {
+            'offers': TradeOffer.objects.filter(period=period).count(),
+            'lines': TradeOfferLine.objects.filter(offer__period=period).count(),
+            'answers': TradeOfferAnswer.objects.filter(offer__period=period).count(),
+        },
+        'repeat': repeat,
+        'results': results,
+    }
@@ -0,0 +1,136 @@
+"""Multi-party swaps solver.
+
+Models the open offers of a trading period as a graph for each year and
+subject, where every line adds an edge from its current group to each
+of its wanted groups, and finds the short cycles of that graph: rings
+of offers where everyone gets a wanted group by passing theirs on.
+"""
+
+from collections import defaultdict
+from typing import NamedTuple
+
+from .matching import get_index
+
+
+class SwapCycle(NamedTuple):
+
+    year: int
+    subject: int
+    groups: tuple[int, ...]
+    offers: tuple[int, ...]
+
+    def steps(self) -> list[tuple[int, int, int]]:
+        """Gets the offer, current group and new group of every step.
+        """
+        return list(zip(self.offers, self.groups, self.groups[1:] + self.groups[:1]))
+
+
+Graph = dict[int, dict[int, set[int]]]
+
+
+def _prune(graph: Graph) -> Graph:
+    """Removes the groups that cannot be part of any cycle.
+
+    A group without incoming or outgoing edges is never in a cycle, and
+    removing it may leave other groups in the same situation.
+    """
+    nodes = set(graph)
+
+    for edges in graph.values():
+        nodes.update(edges)
+
+    while True:
+        targets = {t for n in nodes for t in graph.get(n, {}) if t in nodes}
+        sources = {n for n in nodes if any(t in nodes for t in graph.get(n, {}))}
+        alive = targets & sources
+
+        if alive == nodes:
+            break
+
+        nodes = alive
+
+    return {
+        n: {t: offers for t, offers in graph[n].items() if t in nodes}
+        for n in nodes
+    }
+
+
+def _assign_offers(graph: Graph, groups: tuple[int, ...]) -> 'tuple[int, ...] | None':
+    """Picks a different offer for every edge of a cycle.
+
+    Returns None when the same offers are needed in several edges.
+    """
+    edges = [
+        sorted(graph[a][b])
+        for a, b in zip(groups, groups[1:] + groups[:1])
+    ]
+
+    chosen: list[int] = []
+
+    def backtrack(i: int) -> bool:
+        if i == len(edges):
+            return True
+
+        for offer_id in edges[i]:
+            if offer_id in chosen:
+                continue
+
+            chosen.append(offer_id)
+
+            if backtrack(i + 1):
+                return True
+
+            chosen.pop()
+
+        return False
+
+    return tuple(chosen) if backtrack(0) else None
+
+
+def _find_graph_cycles(graph: Graph, min_length: int, max_length: int) -> list[tuple[int, ...]]:
+    """Enumerates the simple cycles of a graph up to a maximum length.
+
+    Each cycle is only generated once, starting from its lowest group:
+    the search from a group never visits groups lower than it.
+    """
+    cycles: list[tuple[int, ...]] = []
+
+    def visit(start: int, path: list[int]) -> None:
+        for target in graph[path[-1]]:
+            if target == start:
+                if len(path) >= min_length:
+                    cycles.append(tuple(path))
+            elif target > start and target not in path and len(path) < max_length:
+                path.append(target)
+                visit(start, path)
+                path.pop()
+
+    for start in sorted(graph):
+        visit(start, [start])
+
+    return cycles
+
+
+def find_cycles(period_id: int, min_length: int = 3, max_length: int = 4) -> list[SwapCycle]:
+    """Finds the multi-party swaps available in a trading period.
+
+    Cycles of two groups are direct swaps, already covered by the offers
+    answers, so only longer cycles are returned by default.
+    """
+    graphs: dict[tuple[int, int], Graph] = defaultdict(lambda: defaultdict(dict))
+
+    for key, offers in get_index(period_id).items():
+        graphs[key.year, key.subject][key.curr_group][key.wanted_group] = offers
+
+    result: list[SwapCycle] = []
+
+    for (year, subject), graph in sorted(graphs.items()):
+        graph = _prune(graph)
+
+        for groups in _find_graph_cycles(graph, min_length, max_length):
+            offers = _assign_offers(graph, groups)
+
+            if offers:
+                result.append(SwapCycle(year, subject, groups, offers))
+
+    return result
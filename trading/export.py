@@ -0,0 +1,202 @@
+"""Trading period results export.
+
+Streams the completed offers of a period as CSV or JSON, reading them in
+chunks so a whole period is never loaded in memory at once. The offers of
+archived periods are read from their archived documents.
+"""
+
+import csv
+import json
+
+from .models import (
+    ArchivedTradeOffer,
+    TradeOffer,
+    subjects_registry,
+)
+
+
+CHUNK_SIZE = 200
+
+CSV_HEADER = [
+    'oferta', 'respuesta', 'año',
+    'ofertante', 'nombre ofertante', 'email ofertante', 'grupo ofertante',
+    'respondedor', 'nombre respondedor', 'email respondedor', 'grupo respondedor',
+    'asignaturas', 'códigos asignaturas',
+]
+
+
+def iter_completed_offers(period, chunk_size=CHUNK_SIZE):
+    """
+    Iterates over the completed offers of a period
+
+    QuerySet.iterator() ignores prefetch_related, so the offers are read in
+    chunks of increasing ids, each one with its own prefetch of the lines.
+    """
+
+    queryset = (
+        TradeOffer.objects
+        .filter(period=period, is_completed=True)
+        .exclude(answer=None)
+        .select_related('user', 'answer__user')
+        .prefetch_related('lines')
+        .order_by('id')
+    )
+
+    last_id = 0
+
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+
+        yield from chunk
+
+        if len(chunk) < chunk_size:
+            break
+
+        last_id = chunk[-1].id
+
+
+def iter_archived_offers(period, chunk_size=CHUNK_SIZE):
+    """Iterates over the archived documents of the completed offers of a period"""
+
+    queryset = ArchivedTradeOffer.objects.filter(period=period).order_by('offer_id')
+
+    for archived in queryset.iterator(chunk_size):
+        if archived.data['is_completed'] and archived.data['answer']:
+            yield archived.data
+
+
+def iter_results(period):
+    """
+    Iterates over the completed offers of a period as dictionaries
+
+    Archived periods have no offers left, so their archived documents are
+    exported instead.
+    """
+
+    if period.archived:
+        return map(archived_to_dict, iter_archived_offers(period))
+
+    return map(offer_to_dict, iter_completed_offers(period))
+
+
+def _user_data(user):
+    return {
+        'username': user.username,
+        'name': user.get_full_name(),
+        'email': user.email,
+    }
+
+
+def _archived_user_data(user):
+    return {
+        'username': user['username'],
+        'name': user['name'],
+        'email': user['email'],
+    }
+
+
+def offer_to_dict(offer):
+    answer = offer.answer
+    groups = answer.get_groups()
+
+    lines = []
+
+    for line in offer.lines.all():
+        group, subgroup = groups.get(str(line.year), (None, None))
+
+        lines.append({
+            'year': line.year,
+            'subjects': [
+                {'code': s.code, 'name': s.name}
+                for s in subjects_registry.get_many(line.get_subjects_list())
+            ],
+            'offer_group': '{}.{}'.format(line.curr_group, line.curr_subgroup),
+            'answer_group': '{}.{}'.format(group, subgroup) if group else '',
+        })
+
+    return {
+        'id': offer.id,
+        'creation_date': offer.creation_date.isoformat(),
+        'user': _user_data(offer.user),
+        'answer': {
+            'id': answer.id,
+            'creation_date': answer.creation_date.isoformat(),
+            'user': _user_data(answer.user),
+        },
+        'lines': lines,
+    }
+
+
+def archived_to_dict(data):
+    """Converts an archived offer into the same dictionary as offer_to_dict"""
+
+    answer = next(a for a in data['answers'] if a['id'] == data['answer'])
+
+    lines = []
+
+    for line in data['lines']:
+        group, subgroup = answer['groups'].get(str(line['year']), (None, None))
+
+        lines.append({
+            'year': line['year'],
+            'subjects': [
+                {'code': s.code, 'name': s.name}
+                for s in subjects_registry.get_many(line['subjects'])
+            ],
+            'offer_group': '{}.{}'.format(line['curr_group'], line['curr_subgroup']),
+            'answer_group': '{}.{}'.format(group, subgroup) if group else '',
+        })
+
+    return {
+        'id': data['id'],
+        'creation_date': data['creation_date'],
+        'user': _archived_user_data(data['user']),
+        'answer': {
+            'id': answer['id'],
+            'creation_date': answer['creation_date'],
+            'user': _archived_user_data(answer['user']),
+        },
+        'lines': lines,
+    }
+
+
+def offer_to_rows(data):
+    offer_user = data['user']
+    answer_user = data['answer']['user']
+
+    for line in data['lines']:
+        yield [
+            data['id'], data['answer']['id'], line['year'],
+            offer_user['username'], offer_user['name'], offer_user['email'], line['offer_group'],
+            answer_user['username'], answer_user['name'], answer_user['email'], line['answer_group'],
+            ', '.join(s['name'] for s in line['subjects']),
+            ','.join(str(s['code']) for s in line['subjects']),
+        ]
+
+
+class _Echo:
+    """File-like object that returns what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(results):
+    writer = csv.writer(_Echo())
+
+    # Byte order mark, so spreadsheets detect the encoding
+    yield '\ufeff'
+    yield writer.writerow(CSV_HEADER)
+
+    for data in results:
+        for row in offer_to_rows(data):
+            yield writer.writerow(row)
+
+
+def stream_json(results):
+    yield '['
+
+    for i, data in enumerate(results):
+        yield (',\n' if i else '\n') + json.dumps(data, ensure_ascii=False)
+
+    yield '\n]\n'
@@ -0,0 +1,62 @@
+"""Trading offers feed.
+
+The changes of the offers are stored as events by the model signals, and
+clients poll for the new ones every POLL_INTERVAL seconds. Every response
+carries the last event id as its ETag, so a poll without changes gets an
+empty 304 answer after a single indexed query, and the events are shared
+by every process through the database.
+"""
+
+from django.utils.http import quote_etag
+
+from .models import TradeOfferEvent
+
+
+MAX_EVENTS = 100
+
+# Seconds between polls of the clients
+POLL_INTERVAL = 30
+IDLE_POLL_INTERVAL = 5 * 60
+
+
+def get_last_id(period):
+    """Gets the id of the last event of a period, 0 if there are none"""
+
+    if not period:
+        return 0
+
+    return (
+        TradeOfferEvent.objects
+        .filter(period=period)
+        .order_by('-id')
+        .values_list('id', flat=True)
+        .first()
+    ) or 0
+
+
+def get_events(period, last_id, limit=MAX_EVENTS):
+    return list(TradeOfferEvent.objects.filter(period=period, id__gt=last_id)[:limit])
+
+
+def get_etag(period, last_id):
+    """Gets the ETag of the feed of a period up to the given event"""
+
+    return quote_etag('{}-{}'.format(period.id if period else 0, last_id))
+
+
+def format_events(events, last_id, interval=POLL_INTERVAL):
+    """
+    Formats the events for the clients
+
+    The client polls again from the returned last id after the given
+    interval, at once if the batch was full and more events are waiting.
+    """
+
+    return {
+        'last_id': events[-1].id if events else last_id,
+        'interval': 0 if len(events) >= MAX_EVENTS else interval,
+        'events': [
+            {'id': event.id, 'kind': event.kind, 'offer': event.offer_id}
+            for event in events
+        ],
+    }
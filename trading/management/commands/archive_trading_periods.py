@@ -0,0 +1,55 @@
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.utils import timezone
+
+from ...archive import (
+    archive_period,
+    get_archivable_periods,
+    get_summary,
+)
+from ...models import TradePeriod
+
+
+class Command(BaseCommand):
+
+    help = 'Moves the offers of the ended trading periods to the archive, keeping their statistics.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', type=int, help='Period to archive (every ended period without exchanges in process by default)')
+        parser.add_argument('--dry-run', action='store_true', help='Only show what would be archived')
+        parser.add_argument('--force', action='store_true', help='Archive the given period even with exchanges in process')
+
+    def handle(self, *args, **options):
+        if options['period']:
+            # Open periods are never archived, as their offers are still in use
+            if options['force']:
+                periods = TradePeriod.objects.filter(end__lt=timezone.now(), archived=None)
+            else:
+                periods = get_archivable_periods()
+
+            periods = periods.filter(pk=options['period'])
+
+            if not periods:
+                raise CommandError(
+                    'Period {} does not exist, has not ended, is already archived or has exchanges in process '
+                    '(use --force to archive it anyway)'.format(options['period'])
+                )
+        else:
+            periods = get_archivable_periods()
+
+        for period in periods:
+            if options['dry_run']:
+                summary = get_summary(period)
+
+                self.stdout.write('Would archive period {} ({}) with {offers} offers, {lines} lines and {answers} answers'.format(
+                    period.id, period.name, **summary
+                ))
+                continue
+
+            count = archive_period(period)
+
+            self.stdout.write(self.style.SUCCESS(
+                'Archived period {} ({}) with {} offers'.format(period.id, period.name, count)
+            ))
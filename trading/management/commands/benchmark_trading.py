@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from ...benchmark import run_benchmark
+from ...models import TradePeriod
+
+
+class Command(BaseCommand):
+
+    help = 'Measures the time and queries of the main trading views and prints a JSON report.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', type=int, help='Period to use (the current one by default)')
+        parser.add_argument('--repeat', type=int, default=5, help='Measured runs of every view')
+        parser.add_argument('--output', help='File to write the report to')
+
+    def handle(self, *args, **options):
+        if options['period']:
+            period = TradePeriod.objects.filter(pk=options['period']).first()
+        else:
+            period = TradePeriod.get_current()
+
+        if not period:
+            raise CommandError('There is no trading period to benchmark')
+
+        setup_test_environment()
+
+        try:
+            report = run_benchmark(period, repeat=options['repeat'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            teardown_test_environment()
+
+        data = json.dumps(report, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(data + '\n')
+        else:
+            self.stdout.write(data)
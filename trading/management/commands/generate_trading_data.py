@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from ...benchmark import (
+    delete_synthetic_data,
+    generate_period,
+)
+
+
+class Command(BaseCommand):
+
+    help = 'Creates a current trading period filled with synthetic users, offers and answers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users')
+        parser.add_argument('--offers', type=int, help='Number of offers (half the users by default)')
+        parser.add_argument('--answers', type=int, default=2, help='Answers per offer')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+        parser.add_argument('--name', help='Name of the period')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the synthetic data instead of creating it')
+        parser.add_argument('--force', action='store_true', help='Run even without DEBUG, the period becomes the current one')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            counts = delete_synthetic_data()
+
+            self.stdout.write(self.style.SUCCESS(
+                'Deleted {periods} periods, {users} users and {subjects} subjects'.format(**counts)
+            ))
+            return
+
+        # The generated period replaces the current one for every user
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusing to create synthetic data without DEBUG, use --force to do it anyway')
+
+        period, counts = generate_period(
+            users=options['users'],
+            offers=options['offers'],
+            answers=options['answers'],
+            seed=options['seed'],
+            name=options['name'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            'Created period {} ({}) with {users} users, {offers} offers, {lines} lines and {answers} answers'.format(
+                period.id, period.name, **counts
+            )
+        ))
@@ -0,0 +1,250 @@
+"""Trading offers matching engine.
+
+Keeps an in-memory index of the open offers of a trading period so the
+offers that can be swapped with a given offer are found with a few
+dictionary lookups instead of scanning every offer of the period.
+"""
+
+import threading
+from collections import defaultdict
+from typing import (
+    Iterable,
+    NamedTuple,
+)
+
+from main.utils import (
+    bump_cache_version,
+    get_cache_version,
+)
+
+from .models import (
+    TradeOffer,
+    TradeOfferLine,
+    TradeOfferLineSubject,
+)
+
+
+VERSION_KEY = 'trading_matching_version_{}'
+
+
+class IndexKey(NamedTuple):
+
+    year: int
+    subject: int
+    curr_group: int
+    wanted_group: int
+
+
+class Match(NamedTuple):
+
+    offer_id: int
+    score: int
+
+
+def _load_keys(**filters) -> dict[int, set[IndexKey]]:
+    """Loads the index keys of the offers lines matching the filters.
+
+    Reads the normalized subjects and wanted groups of the lines, so all
+    the keys are obtained with a single query.
+    """
+    rows = (
+        TradeOfferLineSubject.objects
+        .filter(line__is_completed=False, **filters)
+        .values_list(
+            'line__offer_id', 'line__year', 'subject_id',
+            'line__curr_group', 'line__line_wanted_groups__group',
+        )
+    )
+
+    keys: dict[int, set[IndexKey]] = defaultdict(set)
+
+    for offer_id, year, subject, curr_group, wanted_group in rows:
+        if wanted_group is not None:
+            keys[offer_id].add(IndexKey(year, subject, curr_group, wanted_group))
+
+    return keys
+
+
+def get_matching_keys(line: TradeOfferLine) -> set[IndexKey]:
+    """Gets the index keys of the lines that can swap with the given one.
+
+    A line matches another one of the same year and subject when each
+    one is in a group wanted by the other.
+    """
+    return {
+        IndexKey(line.year, subject, group, line.curr_group)
+        for subject in line.get_subjects_list()
+        for group in line.get_wanted_groups()
+    }
+
+
+class MatchingIndex:
+    """Open offers index for a trading period.
+
+    Maps every (year, subject, current group, wanted group) tuple to the
+    offers with a line for it. Only visible offers without an accepted
+    answer are indexed.
+    """
+
+    def __init__(self, period_id: int):
+        self.period_id = period_id
+        self.version: 'str | None' = None
+
+        self._offers: dict[IndexKey, set[int]] = defaultdict(set)
+        self._keys: dict[int, set[IndexKey]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def build(self) -> None:
+        """Builds the index from scratch with the open offers.
+        """
+        keys = _load_keys(
+            line__offer__period_id=self.period_id,
+            line__offer__is_visible=True,
+            line__offer__answer=None,
+        )
+
+        with self._lock:
+            self._offers.clear()
+            self._keys.clear()
+
+            for offer_id, offer_keys in keys.items():
+                self._add(offer_id, offer_keys)
+
+    def update(self, offer: TradeOffer) -> None:
+        """Updates the entries of the given offer.
+        """
+        keys: set[IndexKey] = set()
+
+        if offer.is_visible and not offer.answer_id:
+            keys = _load_keys(line__offer=offer).get(offer.id, set())
+
+        with self._lock:
+            self._remove(offer.id)
+            self._add(offer.id, keys)
+
+    def remove(self, offer_id: int) -> None:
+        """Removes the entries of the given offer.
+        """
+        with self._lock:
+            self._remove(offer_id)
+
+    def find(self, lines: Iterable[TradeOfferLine], exclude: 'int | None' = None) -> list[Match]:
+        """Finds the offers compatible with the given lines.
+
+        Every offer is scored with the number of subjects that could be
+        swapped, and the results are sorted by descending score.
+        """
+        scores: dict[int, int] = defaultdict(int)
+
+        with self._lock:
+            for line in lines:
+                for key in get_matching_keys(line):
+                    for offer_id in self._offers.get(key, ()):
+                        scores[offer_id] += 1
+
+        scores.pop(exclude, None)
+
+        return sorted(
+            (Match(offer_id, score) for offer_id, score in scores.items()),
+            key=lambda m: (-m.score, m.offer_id)
+        )
+
+    def items(self) -> list[tuple[IndexKey, set[int]]]:
+        """Gets a snapshot of the index entries.
+        """
+        with self._lock:
+            return [(key, set(offers)) for key, offers in self._offers.items()]
+
+    def _add(self, offer_id: int, keys: set[IndexKey]) -> None:
+        if not keys:
+            return
+
+        self._keys[offer_id] = keys
+
+        for key in keys:
+            self._offers[key].add(offer_id)
+
+    def _remove(self, offer_id: int) -> None:
+        for key in self._keys.pop(offer_id, ()):
+            offers = self._offers[key]
+            offers.discard(offer_id)
+
+            if not offers:
+                del self._offers[key]
+
+
+_indexes: dict[int, MatchingIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(period_id: int) -> MatchingIndex:
+    """Gets the matching index of a trading period.
+
+    Each process keeps its own index, which is rebuilt whenever another
+    process reports a change through the shared cache version, so the
+    changes of other processes are seen within VERSIONS_TTL seconds.
+    """
+    with _indexes_lock:
+        index = _indexes.get(period_id)
+
+        if index is None:
+            index = _indexes[period_id] = MatchingIndex(period_id)
+
+    version = get_cache_version(VERSION_KEY.format(period_id))
+
+    with index._lock:
+        if index.version != version:
+            index.build()
+            index.version = version
+
+    return index
+
+
+def update_offer(offer: TradeOffer) -> None:
+    """Updates an offer in the matching index after it was saved.
+    """
+    get_index(offer.period_id).update(offer)
+    _sync_version(offer.period_id)
+
+
+def remove_offer(offer: TradeOffer) -> None:
+    """Removes an offer from the matching index before or after it is
+    deleted.
+    """
+    get_index(offer.period_id).remove(offer.id)
+    _sync_version(offer.period_id)
+
+
+def invalidate(period_id: int) -> None:
+    """Forces every process to rebuild the index of a trading period.
+    """
+    bump_cache_version(VERSION_KEY.format(period_id))
+
+
+def _sync_version(period_id: int) -> None:
+    # Our own index is already up to date, so only the other processes
+    # have to rebuild theirs, unless another process changed the offers
+    # since ours was built
+    key = VERSION_KEY.format(period_id)
+    index = _indexes.get(period_id)
+
+    if index is not None and index.version is not None:
+        with index._lock:
+            version = bump_cache_version(key, expected=index.version)
+
+            if version is not None:
+                index.version = version
+                return
+
+    bump_cache_version(key)
+
+
+def find_matches(offer: TradeOffer) -> list[Match]:
+    """Finds the open offers that can swap with the given one.
+    """
+    lines = [line for line in offer.lines.all() if not line.is_completed]
+
+    return get_index(offer.period_id).find(lines, exclude=offer.id)
@@ -0,0 +1,109 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def parse_list(value):
+    try:
+        return [int(x) for x in value.split(',')]
+    except ValueError:
+        return []
+
+
+def populate_normalized_lines(apps, schema_editor):
+    Subject = apps.get_model('trading', 'Subject')
+    TradeOfferLine = apps.get_model('trading', 'TradeOfferLine')
+    TradeOfferLineSubject = apps.get_model('trading', 'TradeOfferLineSubject')
+    TradeOfferLineWantedGroup = apps.get_model('trading', 'TradeOfferLineWantedGroup')
+
+    codes = set(Subject.objects.values_list('pk', flat=True))
+
+    subjects = []
+    groups = []
+
+    for line in TradeOfferLine.objects.iterator():
+        started = parse_list(line.started)
+        completed = parse_list(line.completed)
+
+        for code in set(parse_list(line.subjects)):
+            if code not in codes:
+                continue
+
+            state = 2 if code in completed else 1 if code in started else 0
+
+            subjects.append(TradeOfferLineSubject(line=line, subject_id=code, state=state))
+
+        for group in set(parse_list(line.wanted_groups)):
+            groups.append(TradeOfferLineWantedGroup(line=line, group=group))
+
+    TradeOfferLineSubject.objects.bulk_create(subjects, batch_size=500)
+    TradeOfferLineWantedGroup.objects.bulk_create(groups, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0003_updated_django_validators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TradeOfferLineSubject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.IntegerField(choices=[(0, 'Pendiente'), (1, 'Iniciado'), (2, 'Completado')], default=0, verbose_name='estado')),
+            ],
+            options={
+                'verbose_name': 'asignatura de línea de oferta',
+                'verbose_name_plural': 'asignaturas de líneas de oferta',
+            },
+        ),
+        migrations.CreateModel(
+            name='TradeOfferLineWantedGroup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group', models.IntegerField(verbose_name='grupo buscado')),
+            ],
+            options={
+                'verbose_name': 'grupo buscado de línea de oferta',
+                'verbose_name_plural': 'grupos buscados de líneas de oferta',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tradeofferline',
+            index=models.Index(fields=['year', 'curr_group'], name='trading_tra_year_89f42f_idx'),
+        ),
+        migrations.AddField(
+            model_name='tradeofferlinewantedgroup',
+            name='line',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_wanted_groups', to='trading.tradeofferline', verbose_name='línea'),
+        ),
+        migrations.AddField(
+            model_name='tradeofferlinesubject',
+            name='line',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_subjects', to='trading.tradeofferline', verbose_name='línea'),
+        ),
+        migrations.AddField(
+            model_name='tradeofferlinesubject',
+            name='subject',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offer_lines', to='trading.subject', verbose_name='asignatura'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeofferlinewantedgroup',
+            index=models.Index(fields=['group'], name='trading_tra_group_fa1cb5_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tradeofferlinewantedgroup',
+            constraint=models.UniqueConstraint(fields=('line', 'group'), name='trading_line_group_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeofferlinesubject',
+            index=models.Index(fields=['subject', 'state'], name='trading_tra_subject_17d31b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tradeofferlinesubject',
+            constraint=models.UniqueConstraint(fields=('line', 'subject'), name='trading_line_subject_unique'),
+        ),
+        migrations.RunPython(populate_normalized_lines, migrations.RunPython.noop),
+    ]
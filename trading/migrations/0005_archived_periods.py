@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trading', '0004_normalized_lines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradeperiod',
+            name='archived',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='fecha de archivado'),
+        ),
+        migrations.AddField(
+            model_name='tradeperiod',
+            name='summary',
+            field=models.JSONField(blank=True, default=dict, help_text='Estadísticas del periodo guardadas al archivarlo', verbose_name='resumen'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTradeOffer',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('offer_id', models.IntegerField(verbose_name='ID de la oferta')),
+                ('data', models.JSONField(verbose_name='datos')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_offers', to='trading.tradeperiod', verbose_name='periodo')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='usuario')),
+            ],
+            options={
+                'verbose_name': 'oferta de permuta archivada',
+                'verbose_name_plural': 'ofertas de permuta archivadas',
+                'ordering': ['offer_id'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:31
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def remove_duplicated_answers(apps, schema_editor):
+    TradeOffer = apps.get_model('trading', 'TradeOffer')
+    TradeOfferAnswer = apps.get_model('trading', 'TradeOfferAnswer')
+
+    duplicated = (
+        TradeOfferAnswer.objects
+        .values('offer', 'user')
+        .annotate(count=Count('id'), first=Min('id'))
+        .filter(count__gt=1)
+    )
+
+    for row in duplicated:
+        answers = TradeOfferAnswer.objects.filter(offer=row['offer'], user=row['user'])
+
+        # Keep the accepted answer, or the first one if none was accepted
+        accepted = TradeOffer.objects.filter(answer__in=answers).values_list('answer', flat=True).first()
+
+        answers.exclude(id=accepted or row['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0005_archived_periods'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicated_answers, migrations.RunPython.noop),
+    ]
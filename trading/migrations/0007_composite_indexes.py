@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0006_remove_duplicated_answers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tradeoffer',
+            index=models.Index(fields=['period', 'user'], name='trading_tra_period__33dd4c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeoffer',
+            index=models.Index(fields=['user', 'is_visible'], name='trading_tra_user_id_faeb59_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeoffer',
+            index=models.Index(condition=models.Q(('answer', None), ('is_visible', True)), fields=['period', 'id'], name='trading_offer_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeofferanswer',
+            index=models.Index(fields=['user', 'is_visible'], name='trading_tra_user_id_cbd2aa_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tradeofferanswer',
+            constraint=models.UniqueConstraint(fields=('offer', 'user'), name='trading_answer_unique'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0007_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TradeOfferEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('offer_id', models.IntegerField(verbose_name='ID de la oferta')),
+                ('kind', models.CharField(choices=[('created', 'Creada'), ('updated', 'Modificada'), ('removed', 'Retirada')], max_length=8, verbose_name='tipo')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='fecha')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offer_events', to='trading.tradeperiod', verbose_name='periodo')),
+            ],
+            options={
+                'verbose_name': 'evento de oferta de permuta',
+                'verbose_name_plural': 'eventos de ofertas de permuta',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tradeofferevent',
+            index=models.Index(fields=['period', 'id'], name='trading_tra_period__e7dcd2_idx'),
+        ),
+    ]
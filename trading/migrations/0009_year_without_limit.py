@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:19
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0008_offer_events'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subject',
+            name='year',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='año'),
+        ),
+        migrations.AlterField(
+            model_name='tradeofferline',
+            name='year',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='año'),
+        ),
+    ]
@@ -1,18 +1,47 @@
 import json
+import math
+import threading
+from typing import NamedTuple
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import (
-    MaxValueValidator,
     MinValueValidator,
     int_list_validator,
 )
-from django.db import models
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    models,
+    transaction,
+)
+from django.db.models import Q
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.functional import cached_property
 
+from heart.models import Group as StudentGroup
+from main.utils import (
+    bump_cache_version,
+    get_cache_version,
+)
+
+
+SUBJECTS_VERSION_KEY = 'trading_subjects_version'
+
+GROUPED_SUBJECTS_KEY = 'grouped_subjects'
+
+# Bounds the life of the entries left by old versions
+SUBJECTS_TTL = 60 * 60
+
+
+class SubjectInfo(NamedTuple):
+    code: int
+    name: str
+    acronym: str
+    quarter: int
+
 
 class Subject(models.Model):
     """
@@ -34,9 +63,8 @@ class Subject(models.Model):
 
     quarter = models.IntegerField('cuatrimestre', choices=QUARTERS, default=1)
 
-    year = models.IntegerField('año', validators=[
-        MinValueValidator(1), MaxValueValidator(3)
-    ])
+    # Degrees in heart may have any number of years
+    year = models.IntegerField('año', validators=[MinValueValidator(1)])
 
     class Meta:
         verbose_name = 'asignatura'
@@ -46,20 +74,84 @@ class Subject(models.Model):
 
     @classmethod
     def get_grouped(cls):
-        d = cache.get('grouped_subjects')
+        """Returns the subjects info grouped by year
+
+        The cache entry only holds plain tuples and is keyed by the
+        subjects version, so any change in the subjects discards it in
+        every process.
+        """
+
+        version = get_cache_version(SUBJECTS_VERSION_KEY)
+        data = cache.get(GROUPED_SUBJECTS_KEY, version=version)
+
+        if data is None:
+            data = {}
+
+            fields = SubjectInfo._fields + ('year',)
+
+            for *info, year in cls.objects.order_by('code').values_list(*fields):
+                data.setdefault(year, []).append(tuple(info))
+
+            cache.set(GROUPED_SUBJECTS_KEY, data, SUBJECTS_TTL, version=version)
+
+        return {
+            year: [SubjectInfo(*info) for info in subjects]
+            for year, subjects in data.items()
+        }
+
+    @classmethod
+    def warm_cache(cls):
+        """Loads the subjects caches, so the first request does not have to"""
+
+        cls.get_grouped()
+        subjects_registry.all()
+
+
+class SubjectRegistry:
+    """
+    Process-wide registry of academic subjects
+
+    Subjects are a small and nearly static catalogue, so they are loaded
+    once and resolved from memory until the subjects version changes.
+    """
+
+    def __init__(self):
+        self._subjects = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def all(self):
+        version = get_cache_version(SUBJECTS_VERSION_KEY)
+        subjects = self._subjects
+
+        if subjects is None or self._version != version:
+            with self._lock:
+                if self._subjects is None or self._version != version:
+                    self._subjects = {s.code: s for s in Subject.objects.all()}
+                    self._version = version
+
+                subjects = self._subjects
+
+        return subjects
 
-        if not d:
-            d = {}
+    def get(self, code):
+        return self.all().get(code)
 
-            for s in cls.objects.all():
-                if s.year not in d:
-                    d[s.year] = []
+    def get_many(self, codes):
+        """Returns the existing subjects for the given codes sorted by code"""
 
-                d[s.year].append(s)
+        subjects = self.all()
 
-            cache.set('grouped_subjects', d)
+        return [subjects[code] for code in sorted(set(codes)) if code in subjects]
 
-        return d
+    def invalidate(self):
+        """Discards the subjects of every process"""
+
+        bump_cache_version(SUBJECTS_VERSION_KEY)
+        self._subjects = None
+
+
+subjects_registry = SubjectRegistry()
 
 
 class Year:
@@ -69,20 +161,20 @@ class Year:
         self.id = id
         self.groups = groups
         self.groups_len = len(groups)
-        self.groups_range = range(1, self.groups_len + 1)
+        self.groups_range = sorted(groups)
         self.subgroups_range = range(1, max_subgroups + 1)
 
     def invalid_group(self, group):
-        return group < 1 or group > self.groups_len
+        return group not in self.groups
 
     def invalid_subgroup(self, group, subgroup):
-        return subgroup < 1 or subgroup > self.groups[group]
+        return group not in self.groups or subgroup < 1 or subgroup > self.groups[group]
 
     def subjects(self):
-        return Subject.objects.filter(year=self.id)
+        return Subject.get_grouped().get(self.id, [])
 
 
-YEARS = {
+DEFAULT_YEARS = {
     1: Year(1, 3, {
         1: 3,
         2: 3,
@@ -104,6 +196,89 @@ YEARS = {
 }
 
 
+STRUCTURE_VERSION_KEY = 'trading_structure_version'
+
+
+class AcademicStructure:
+    """
+    Years, groups and subgroups available for trading
+
+    Built from the years and groups of the trading degree in heart, falling
+    back to DEFAULT_YEARS when it has none. Every process keeps it in memory,
+    along with its JSON representation for the forms, until the structure
+    version changes.
+    """
+
+    def __init__(self):
+        self._years = None
+        self._json = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        version = get_cache_version(STRUCTURE_VERSION_KEY)
+
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    years = self._build()
+
+                    self._json = json.dumps({y - 1: years[y].groups for y in years})
+                    self._years = years
+                    self._version = version
+
+    def _build(self):
+        groups = {}
+
+        rows = (
+            StudentGroup.objects
+            .filter(year__degree_id=settings.TRADING_DEGREE, number__isnull=False)
+            .order_by('year__year', 'number')
+            .values_list('year__year', 'number', 'subgroups')
+        )
+
+        for year, number, subgroups in rows:
+            groups.setdefault(year, {})[number] = subgroups
+
+        if not groups:
+            return DEFAULT_YEARS
+
+        return {
+            year: Year(year, max(year_groups.values()), year_groups)
+            for year, year_groups in groups.items()
+        }
+
+    def get_years(self):
+        self._load()
+        return self._years
+
+    def get_json(self):
+        """Returns the groups of every year as JSON, indexed from zero"""
+
+        self._load()
+        return self._json
+
+    def invalidate(self):
+        """Discards the structure of every process"""
+
+        bump_cache_version(STRUCTURE_VERSION_KEY)
+
+
+academic_structure = AcademicStructure()
+
+
+def get_years():
+    return academic_structure.get_years()
+
+
+PERIODS_VERSION_KEY = 'trading_periods_version'
+
+PERIODS_KEY = 'trading_periods'
+
+# Longest time the periods are cached, even without any boundary ahead
+PERIODS_TTL = 60 * 60
+
+
 class TradePeriod(models.Model):
     """
     Trading allowed Period
@@ -114,6 +289,8 @@ class TradePeriod(models.Model):
     name = models.CharField('nombre', max_length=120)
     start = models.DateTimeField('fecha de inicio')
     end = models.DateTimeField('fecha de fin')
+    archived = models.DateTimeField('fecha de archivado', blank=True, null=True)
+    summary = models.JSONField('resumen', default=dict, blank=True, help_text='Estadísticas del periodo guardadas al archivarlo')
 
     class Meta:
         verbose_name = 'periodo de intercambio'
@@ -124,12 +301,53 @@ class TradePeriod(models.Model):
 
     @classmethod
     def get_current(cls):
-        now = timezone.now()
-        return cls.objects.filter(start__lt=now, end__gt=now).first()
+        return cls.get_periods()[0]
 
     @classmethod
     def get_next(cls):
-        return cls.objects.order_by('start').first()
+        return cls.get_periods()[1]
+
+    @classmethod
+    def get_periods(cls):
+        """
+        Returns the current and the next periods
+
+        They are cached until the first of them starts or ends, until any
+        period is changed in any process, or for PERIODS_TTL at most, so most
+        requests do not query the periods.
+        """
+
+        version = get_cache_version(PERIODS_VERSION_KEY)
+        data = cache.get(PERIODS_KEY, version=version)
+        now = timezone.now()
+
+        fields = ('id', 'name', 'start', 'end')
+
+        if data is None or (data[2] is not None and data[2] <= now):
+            current = cls.objects.filter(start__lt=now, end__gt=now).values_list(*fields).first()
+            upcoming = cls.objects.filter(start__gt=now).order_by('start').values_list(*fields).first()
+
+            boundary = current[3] if current else None
+
+            if upcoming and (boundary is None or upcoming[2] < boundary):
+                boundary = upcoming[2]
+
+            data = (current, upcoming, boundary)
+            timeout = PERIODS_TTL
+
+            if boundary is not None:
+                timeout = min(timeout, max(1, math.ceil((boundary - now).total_seconds())))
+
+            cache.set(PERIODS_KEY, data, timeout, version=version)
+
+        return tuple(
+            cls.from_db(DEFAULT_DB_ALIAS, fields, p) if p else None
+            for p in data[:2]
+        )
+
+    @classmethod
+    def invalidate_cache(cls):
+        bump_cache_version(PERIODS_VERSION_KEY)
 
 
 class TradeOffer(models.Model):
@@ -157,12 +375,84 @@ class TradeOffer(models.Model):
             ('is_manager', 'Puede ver cualquier oferta y acceder a las vistas de gestión de ofertas'),
         ]
 
+        indexes = [
+            models.Index(fields=['period', 'user']),
+            models.Index(fields=['user', 'is_visible']),
+            # Offers that can receive answers, listed by the index view
+            models.Index(
+                fields=['period', 'id'], condition=Q(is_visible=True, answer=None),
+                name='trading_offer_open_idx',
+            ),
+        ]
+
     def __str__(self):
         return 'Oferta {}: {} en {}'.format(self.id, self.user, self.period.name)
 
     def get_absolute_url(self):
         return reverse('trading:offer_detail', kwargs={'pk': self.pk})
 
+    def accept_answer(self, answer):
+        """
+        Accepts an answer and hides the rest of offers and answers of both users
+
+        Every offer and answer changed is locked while accepting, so two
+        answers cannot be accepted at the same time, nor an answer hidden
+        meanwhile by another acceptance. The rows are locked by table and id,
+        so acceptances involving the same users cannot deadlock. Returns the
+        number of offers and answers hidden, or None if the offer already had
+        an accepted answer or the answer is no longer visible.
+        """
+
+        if answer.offer_id != self.pk:
+            raise ValueError('Answer {} does not belong to offer {}'.format(answer.pk, self.pk))
+
+        users = Q(user=self.user_id) | Q(user=answer.user_id)
+
+        with transaction.atomic():
+            offers = {
+                offer.pk: offer for offer in
+                TradeOffer.objects
+                .select_for_update()
+                .filter(users & Q(is_visible=True) | Q(pk=self.pk))
+                .order_by('pk')
+            }
+
+            answers = {
+                x.pk: x for x in
+                TradeOfferAnswer.objects
+                .select_for_update()
+                .filter(users & Q(is_visible=True) | Q(pk=answer.pk))
+                .order_by('pk')
+            }
+
+            if offers[self.pk].answer_id:
+                return None
+
+            answer = answers.get(answer.pk)
+
+            if answer is None or not answer.is_visible:
+                return None
+
+            TradeOffer.objects.filter(pk=self.pk).update(answer=answer, is_visible=False)
+
+            # The ids are needed for the offers feed, as updates send no signals
+            hidden_offers = [pk for pk, offer in offers.items() if pk != self.pk and offer.is_visible]
+
+            hidden = TradeOffer.objects.filter(pk__in=hidden_offers).update(is_visible=False)
+
+            hidden += (
+                TradeOfferAnswer.objects
+                .filter(pk__in=[pk for pk in answers if pk != answer.pk])
+                .update(is_visible=False)
+            )
+
+            TradeOfferEvent.publish(self.period_id, [self.pk, *hidden_offers], TradeOfferEvent.REMOVED)
+
+        self.answer = answer
+        self.is_visible = False
+
+        return hidden
+
 
 class TradeOfferLine(models.Model):
     """
@@ -175,9 +465,8 @@ class TradeOfferLine(models.Model):
         TradeOffer, on_delete=models.CASCADE, related_name='lines', verbose_name='oferta'
     )
 
-    year = models.IntegerField('año', validators=[
-        MinValueValidator(1), MaxValueValidator(3)
-    ])
+    # The years come from the academic structure, checked by validate()
+    year = models.IntegerField('año', validators=[MinValueValidator(1)])
 
     subjects = models.CharField('asignaturas', max_length=64)
 
@@ -208,19 +497,46 @@ class TradeOfferLine(models.Model):
         verbose_name = 'línea de oferta de permuta'
         verbose_name_plural = 'líneas de oferta de permuta'
 
+        indexes = [
+            models.Index(fields=['year', 'curr_group']),
+        ]
+
     def __str__(self):
         return 'Línea oferta {}: {} (grupo {}.{} a grupo(s) {})'.format(self.offer.id, self.subjects, self.curr_group, self.curr_subgroup, self.wanted_groups)
 
     def clean(self):
+        errors = self.validate(get_years(), subjects_registry.all())
+
+        if errors:
+            raise ValidationError(errors)
+
+        return super().clean()
+
+    def validate(self, years, subjects, exclude=()):
+        """
+        Validates the line against the academic structure and subjects
+
+        Returns a dictionary with the errors of every field, so several
+        lines can be validated with the same structure and subjects. The
+        checks of the year and groups in exclude are skipped, as they may not
+        even be numbers after failing clean_fields().
+        """
+
         errors = {}
 
-        y = YEARS[self.year]
+        y = None if 'year' in exclude else years.get(self.year)
 
-        if y.invalid_group(self.curr_group):
+        if 'year' in exclude:
+            pass
+        elif y is None:
+            errors['year'] = 'El año {} no existe'.format(self.year)
+        elif 'curr_group' in exclude:
+            pass
+        elif y.invalid_group(self.curr_group):
             errors['curr_group'] = 'El grupo {} no existe en Año {}'.format(
                 self.curr_group, self.year
             )
-        elif y.invalid_subgroup(self.curr_group, self.curr_subgroup):
+        elif 'curr_subgroup' not in exclude and y.invalid_subgroup(self.curr_group, self.curr_subgroup):
             errors['curr_subgroup'] = 'El subgrupo {}.{} no existe en Año {}'.format(
                 self.curr_group, self.curr_subgroup, self.year
             )
@@ -232,7 +548,7 @@ class TradeOfferLine(models.Model):
                 errors['wanted_groups'] = 'Valor de grupos buscados inválido'
             elif self.curr_group in l:
                 errors['wanted_groups'] = 'El grupo actual no puede estar en los grupos buscados'
-            else:
+            elif y is not None:
                 for g in l:
                     if y.invalid_group(g):
                         errors['curr_group'] = 'El grupo {} no existe en Año {}'.format(g, self.year)
@@ -240,12 +556,12 @@ class TradeOfferLine(models.Model):
         subjects_list = self.get_subjects_list()
 
         if subjects_list:
-            subjects = self.get_subjects()
+            line_subjects = [subjects[code] for code in sorted(set(subjects_list)) if code in subjects]
 
-            if len(subjects) != len(subjects_list):
+            if len(line_subjects) != len(subjects_list):
                 errors['subjects'] = 'Código de asignatura incorrecto'
             else:
-                for s in subjects:
+                for s in line_subjects:
                     if s.year != self.year:
                         errors['subjects'] = 'La asignatura {} es de un año distinto'.format(s.code)
         elif self.subjects:
@@ -269,10 +585,120 @@ class TradeOfferLine(models.Model):
         if self.completed and not completed_list:
             errors['completed'] = 'Valor de intercambios completados inválido'
 
-        if errors:
-            raise ValidationError(errors)
+        return errors
 
-        return super().clean()
+    @classmethod
+    def validate_lines(cls, lines, exclude=None):
+        """
+        Validates several lines together
+
+        Works like full_clean() on every line, merging the errors of the
+        fields with those of the structure and subjects, but these are loaded
+        once for all of them. Lines have no unique fields or constraints, so
+        validate_unique() is not called. Returns the validation error of every
+        line, or None for the valid ones.
+        """
+
+        years = get_years()
+        subjects = subjects_registry.all()
+
+        results = []
+
+        for line in lines:
+            errors = {}
+
+            try:
+                line.clean_fields(exclude)
+            except ValidationError as e:
+                errors = e.update_error_dict(errors)
+
+            line_errors = line.validate(years, subjects, exclude=set(errors))
+
+            if line_errors:
+                errors = ValidationError(line_errors).update_error_dict(errors)
+
+            results.append(ValidationError(errors) if errors else None)
+
+        return results
+
+    # Comma separated fields the normalized relations are built from
+    RELATION_FIELDS = ('subjects', 'started', 'completed', 'wanted_groups')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        line = super().from_db(db, field_names, values)
+
+        # The saved relations match the loaded fields, unless they were
+        # changed with QuerySet.update() without calling sync_relations()
+        if all(f in field_names for f in cls.RELATION_FIELDS):
+            line._synced = line._get_relation_values()
+
+        return line
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        # Most saves only change the groups or the completion, so the
+        # relations are not read again when their fields are unchanged
+        if getattr(self, '_synced', None) != self._get_relation_values():
+            self.sync_relations()
+
+    def _get_relation_values(self):
+        return tuple(getattr(self, f) for f in self.RELATION_FIELDS)
+
+    def sync_relations(self):
+        """Updates the normalized subjects and wanted groups of the line.
+
+        The comma separated fields are the source of truth, so this has
+        to be called after changing them with ``QuerySet.update()``.
+        """
+        started = self.get_started_list()
+        completed = self.get_completed_list()
+
+        states = {}
+
+        for code in self.get_subjects_list():
+            if code in completed:
+                states[code] = TradeOfferLineSubject.COMPLETED
+            elif code in started:
+                states[code] = TradeOfferLineSubject.STARTED
+            else:
+                states[code] = TradeOfferLineSubject.PENDING
+
+        current = {x.subject_id: x for x in TradeOfferLineSubject.objects.filter(line=self)}
+
+        removed = [x.id for code, x in current.items() if code not in states]
+
+        if removed:
+            TradeOfferLineSubject.objects.filter(pk__in=removed).delete()
+
+        for code, state in states.items():
+            if code in current and current[code].state != state:
+                TradeOfferLineSubject.objects.filter(pk=current[code].id).update(state=state)
+
+        added = [code for code in states if code not in current]
+
+        if added:
+            TradeOfferLineSubject.objects.bulk_create(
+                TradeOfferLineSubject(line=self, subject=subject, state=states[subject.code])
+                for subject in subjects_registry.get_many(added)
+            )
+
+        wanted = set(self.get_wanted_groups())
+        current_groups = set(
+            TradeOfferLineWantedGroup.objects.filter(line=self).values_list('group', flat=True)
+        )
+
+        if current_groups - wanted:
+            TradeOfferLineWantedGroup.objects.filter(line=self, group__in=current_groups - wanted).delete()
+
+        if wanted - current_groups:
+            TradeOfferLineWantedGroup.objects.bulk_create(
+                TradeOfferLineWantedGroup(line=self, group=group)
+                for group in wanted - current_groups
+            )
+
+        self._synced = self._get_relation_values()
 
     def _get_list_from_str(self, field):
         try:
@@ -284,13 +710,13 @@ class TradeOfferLine(models.Model):
         return self._get_list_from_str('subjects')
 
     def get_subjects(self):
-        return Subject.objects.filter(pk__in=self.get_subjects_list())
+        return subjects_registry.get_many(self.get_subjects_list())
 
     def get_started_list(self):
         return self._get_list_from_str('started')
 
     def get_started(self):
-        return Subject.objects.filter(pk__in=self.get_started_list())
+        return subjects_registry.get_many(self.get_started_list())
 
     def get_completed_list(self):
         return self._get_list_from_str('completed')
@@ -303,12 +729,86 @@ class TradeOfferLine(models.Model):
 
     @cached_property
     def year_obj(self):
-        return YEARS[self.year]
+        return get_years().get(self.year)
 
     @cached_property
     def i(self):
         return self.year - 1
 
+
+class TradeOfferLineSubject(models.Model):
+    """
+    Normalized subject of a Trading Offer Line, kept in sync with the
+    line subjects, started and completed lists
+    """
+
+    id: 'models.AutoField[int, int]'
+
+    PENDING = 0
+    STARTED = 1
+    COMPLETED = 2
+
+    STATES = [
+        (PENDING, 'Pendiente'),
+        (STARTED, 'Iniciado'),
+        (COMPLETED, 'Completado'),
+    ]
+
+    line = models.ForeignKey(
+        TradeOfferLine, models.CASCADE, 'line_subjects', verbose_name='línea'
+    )
+
+    subject = models.ForeignKey(
+        Subject, models.CASCADE, 'offer_lines', verbose_name='asignatura'
+    )
+
+    state = models.IntegerField('estado', choices=STATES, default=PENDING)
+
+    class Meta:
+        verbose_name = 'asignatura de línea de oferta'
+        verbose_name_plural = 'asignaturas de líneas de oferta'
+
+        constraints = [
+            models.UniqueConstraint(fields=['line', 'subject'], name='trading_line_subject_unique'),
+        ]
+
+        indexes = [
+            models.Index(fields=['subject', 'state']),
+        ]
+
+    def __str__(self):
+        return 'Asignatura {} en línea {}'.format(self.subject_id, self.line_id)
+
+
+class TradeOfferLineWantedGroup(models.Model):
+    """
+    Normalized wanted group of a Trading Offer Line
+    """
+
+    id: 'models.AutoField[int, int]'
+
+    line = models.ForeignKey(
+        TradeOfferLine, models.CASCADE, 'line_wanted_groups', verbose_name='línea'
+    )
+
+    group = models.IntegerField('grupo buscado')
+
+    class Meta:
+        verbose_name = 'grupo buscado de línea de oferta'
+        verbose_name_plural = 'grupos buscados de líneas de oferta'
+
+        constraints = [
+            models.UniqueConstraint(fields=['line', 'group'], name='trading_line_group_unique'),
+        ]
+
+        indexes = [
+            models.Index(fields=['group']),
+        ]
+
+    def __str__(self):
+        return 'Grupo {} en línea {}'.format(self.group, self.line_id)
+
+
 class TradeOfferAnswer(models.Model):
     """
     Trade Offer Answer
@@ -349,6 +849,14 @@ class TradeOfferAnswer(models.Model):
         verbose_name = 'respuesta de oferta de permuta'
         verbose_name_plural = 'respuestas de oferta de permuta'
 
+        constraints = [
+            models.UniqueConstraint(fields=['offer', 'user'], name='trading_answer_unique'),
+        ]
+
+        indexes = [
+            models.Index(fields=['user', 'is_visible']),
+        ]
+
     def __str__(self):
         return 'Respuesta de {} para Oferta #{}'.format(self.user, self.offer.id)
 
@@ -380,7 +888,12 @@ class TradeOfferAnswer(models.Model):
             if group not in line.get_wanted_groups():
                 raise ValidationError({'groups': 'El grupo {} no es un grupo buscado'.format(group)})
 
-            if YEARS[line.year].invalid_subgroup(group, subgroup):
+            year = get_years().get(line.year)
+
+            if year is None:
+                raise ValidationError({'groups': 'El año {} ya no existe'.format(line.year)})
+
+            if year.invalid_subgroup(group, subgroup):
                 raise ValidationError({
                     'groups': 'El subgrupo {}.{} no existe en Año {}'.format(
                         group, subgroup, line.year
@@ -398,3 +911,70 @@ class TradeOfferAnswer(models.Model):
             self._groups = json.loads(self.groups)
 
         return self._groups
+
+
+class ArchivedTradeOffer(models.Model):
+    """
+    Trading Offer of an archived period
+
+    Keeps the offer with its lines and answers as a single JSON document, so
+    the closed periods do not stay in the trading tables.
+    """
+
+    id: 'models.AutoField[int, int]'
+
+    period = models.ForeignKey(TradePeriod, models.CASCADE, 'archived_offers', verbose_name='periodo')
+    offer_id = models.IntegerField('ID de la oferta')
+    user = models.ForeignKey(get_user_model(), models.SET_NULL, blank=True, null=True, verbose_name='usuario')
+    data = models.JSONField('datos')
+
+    class Meta:
+        verbose_name = 'oferta de permuta archivada'
+        verbose_name_plural = 'ofertas de permuta archivadas'
+
+        ordering = ['offer_id']
+
+    def __str__(self):
+        return 'Oferta archivada {} en {}'.format(self.offer_id, self.period.name)
+
+
+class TradeOfferEvent(models.Model):
+    """
+    Change of a Trading Offer, published in the offers feed of its period
+    """
+
+    id: 'models.AutoField[int, int]'
+
+    CREATED = 'created'
+    UPDATED = 'updated'
+    REMOVED = 'removed'
+
+    KINDS = [
+        (CREATED, 'Creada'),
+        (UPDATED, 'Modificada'),
+        (REMOVED, 'Retirada'),
+    ]
+
+    period = models.ForeignKey(TradePeriod, models.CASCADE, 'offer_events', verbose_name='periodo')
+    offer_id = models.IntegerField('ID de la oferta')
+    kind = models.CharField('tipo', max_length=8, choices=KINDS)
+    created = models.DateTimeField('fecha', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'evento de oferta de permuta'
+        verbose_name_plural = 'eventos de ofertas de permuta'
+
+        ordering = ['id']
+
+        indexes = [
+            models.Index(fields=['period', 'id']),
+        ]
+
+    def __str__(self):
+        return 'Oferta {} {}'.format(self.offer_id, self.get_kind_display().lower())
+
+    @classmethod
+    def publish(cls, period_id, offer_ids, kind):
+        cls.objects.bulk_create(
+            cls(period_id=period_id, offer_id=offer_id, kind=kind) for offer_id in offer_ids
+        )
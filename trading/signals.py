@@ -0,0 +1,66 @@
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+
+from heart.models import (
+    Degree,
+    Group,
+    Year,
+)
+
+from .models import (
+    Subject,
+    TradeOffer,
+    TradeOfferEvent,
+    TradePeriod,
+    academic_structure,
+    subjects_registry,
+)
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def subject_changed(sender, **kwargs):
+    subjects_registry.invalidate()
+
+
+@receiver([post_save, post_delete], sender=TradePeriod)
+def period_changed(sender, **kwargs):
+    TradePeriod.invalidate_cache()
+
+
+def _in_feed(offer):
+    """Only the offers of the current period are published in the feed"""
+
+    period = TradePeriod.get_current()
+
+    return period is not None and period.id == offer.period_id
+
+
+@receiver(post_save, sender=TradeOffer)
+def offer_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not _in_feed(instance):
+        return
+
+    if created:
+        kind = TradeOfferEvent.CREATED
+    elif instance.is_visible and not instance.answer_id:
+        kind = TradeOfferEvent.UPDATED
+    else:
+        kind = TradeOfferEvent.REMOVED
+
+    TradeOfferEvent.publish(instance.period_id, [instance.id], kind)
+
+
+@receiver(post_delete, sender=TradeOffer)
+def offer_deleted(sender, instance, **kwargs):
+    if _in_feed(instance):
+        TradeOfferEvent.publish(instance.period_id, [instance.id], TradeOfferEvent.REMOVED)
+
+
+@receiver([post_save, post_delete], sender=Degree)
+@receiver([post_save, post_delete], sender=Year)
+@receiver([post_save, post_delete], sender=Group)
+def structure_changed(sender, **kwargs):
+    academic_structure.invalidate()
@@ -0,0 +1,58 @@
+(function($) {
+
+    const $feed = $('#offers-feed');
+
+    if (!$feed.length || !window.fetch) {
+        return;
+    }
+
+    const changed = new Set();
+
+    let lastId = $feed.data('last');
+    let interval = $feed.data('interval');
+    let etag = null;
+
+    const onChange = (offer) => {
+        changed.add(offer);
+
+        $feed.find('.feed-count').text(changed.size);
+        $feed.show();
+    }
+
+    const onEvent = (event) => {
+        if (event.kind === 'removed') {
+            $('[data-offer="' + event.offer + '"]').fadeOut();
+        } else {
+            onChange(event.offer);
+        }
+    }
+
+    // Polls without changes are answered with an empty 304 response
+    const poll = () => {
+        const headers = etag ? {'If-None-Match': etag} : {};
+
+        fetch($feed.data('url') + '?last_id=' + lastId, {headers: headers, cache: 'no-store', credentials: 'same-origin'})
+            .then((res) => {
+                if (res.status === 304 || !res.ok) {
+                    return null;
+                }
+
+                etag = res.headers.get('ETag');
+
+                return res.json();
+            })
+            .then((data) => {
+                if (data) {
+                    data.events.forEach(onEvent);
+
+                    lastId = data.last_id;
+                    interval = data.interval;
+                }
+            })
+            .catch(() => null)
+            .then(() => setTimeout(poll, interval * 1000));
+    }
+
+    setTimeout(poll, interval * 1000);
+
+})(jQuery);
@@ -4,9 +4,18 @@ register = template.Library()
 
 @register.filter
 def get_answer(offer, user):
-    """Returns an user answer for the given offer"""
+    """Returns an user answer for the given offer
+
+    Uses the `user_answers` attribute when the user answers were already
+    prefetched for the offers list.
+    """
 
     if not user.is_authenticated:
         return None
 
+    answers = getattr(offer, 'user_answers', None)
+
+    if answers is not None:
+        return answers[0] if answers else None
+
     return offer.answers.filter(user=user).first()
@@ -1,29 +1,75 @@
+import json
 from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import (
     AnonymousUser,
     Permission,
 )
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import (
+    IntegrityError,
+    connection,
+    transaction,
+)
 from django.template import (
     Context,
     Template,
 )
 from django.test import (
     Client,
+    RequestFactory,
     TestCase,
+    override_settings,
 )
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
+from heart.models import (
+    Degree,
+    Group as HeartGroup,
+    Year as HeartYear,
+)
+from main.models import CacheVersion
+from main.utils import reset_cache_versions
+
+from . import (
+    archive,
+    export,
+    feed,
+    matching,
+)
+from .benchmark import (
+    SYNTHETIC_DOMAIN,
+    SYNTHETIC_PREFIX,
+    generate_period,
+    run_benchmark,
+)
+from .cycles import find_cycles
 from .models import (
+    DEFAULT_YEARS,
+    PERIODS_TTL,
+    SUBJECTS_VERSION_KEY,
+    ArchivedTradeOffer,
     Subject,
+    SubjectInfo,
     TradeOffer,
     TradeOfferAnswer,
+    TradeOfferEvent,
     TradeOfferLine,
+    TradeOfferLineSubject,
     TradePeriod,
+    academic_structure,
+    get_years,
+    subjects_registry,
 )
+from .views import IndexView
 
 
 User = get_user_model()
@@ -48,23 +94,190 @@ class TradingModelsTests(TestCase):
 
         line.subjects = ''
         self.assertEquals(line.get_subjects_list(), [])
-        self.assertEquals(line.get_subjects().count(), 0)
+        self.assertEquals(len(line.get_subjects()), 0)
 
         line.subjects = '1'
         self.assertEquals(line.get_subjects_list(), [1])
-        self.assertEquals(line.get_subjects().count(), 1)
+        self.assertEquals(len(line.get_subjects()), 1)
 
         line.subjects = '1,2'
         self.assertEquals(line.get_subjects_list(), [1,2])
-        self.assertEquals(line.get_subjects().count(), 2)
+        self.assertEquals(len(line.get_subjects()), 2)
 
         line.subjects = '1,a'
         self.assertEquals(line.get_subjects_list(), [])
-        self.assertEquals(line.get_subjects().count(), 0)
+        self.assertEquals(len(line.get_subjects()), 0)
 
         line.subjects = 'not_valid'
         self.assertEquals(line.get_subjects_list(), [])
-        self.assertEquals(line.get_subjects().count(), 0)
+        self.assertEquals(len(line.get_subjects()), 0)
+
+    def test_tradeofferline_getters_registry(self):
+        """TradeOfferLine subject getters resolve codes without queries"""
+
+        line = TradeOfferLine(subjects='1,2', started='2')
+        line.get_subjects()
+
+        with self.assertNumQueries(0):
+            self.assertListEqual([s.code for s in line.get_subjects()], [1, 2])
+            self.assertListEqual([s.code for s in line.get_started()], [2])
+
+        Subject.objects.filter(code=2).get().delete()
+
+        self.assertListEqual([s.code for s in line.get_subjects()], [1], 'deleted subject is still resolved')
+
+    def test_subject_get_grouped(self):
+        """Subject.get_grouped is cached and invalidated on changes"""
+
+        grouped = Subject.get_grouped()
+
+        self.assertEqual(grouped[1], [SubjectInfo(1, 'Subject 1', 'S1', 1)])
+        self.assertEqual(grouped[2][0].name, 'Subject 2')
+
+        with self.assertNumQueries(0):
+            Subject.get_grouped()
+
+        subject = Subject.objects.get(code=2)
+        subject.name = 'Renamed'
+        subject.save()
+
+        self.assertEqual(Subject.get_grouped()[2][0].name, 'Renamed', 'cache not invalidated on save')
+
+        subject.delete()
+
+        self.assertNotIn(2, Subject.get_grouped(), 'cache not invalidated on delete')
+
+    def test_subject_changes_from_other_process(self):
+        """Subject changes made by another process are seen through the shared version"""
+
+        Subject.get_grouped()
+
+        # Another process renames a subject and bumps the version in the database
+        Subject.objects.filter(code=2).update(name='Renamed')
+        CacheVersion.objects.filter(key=SUBJECTS_VERSION_KEY).update(version='other')
+
+        self.assertEqual(Subject.get_grouped()[2][0].name, 'Subject 2', 'version read again before VERSIONS_TTL')
+
+        reset_cache_versions()
+
+        self.assertEqual(Subject.get_grouped()[2][0].name, 'Renamed', 'version of other process ignored')
+        self.assertEqual(subjects_registry.get(2).name, 'Renamed')
+
+    def test_tradeperiod_cached_periods(self):
+        """TradePeriod current and next periods are cached until they change"""
+
+        now = timezone.now()
+        upcoming = TradePeriod.objects.create(name='Period 2', start=now + timedelta(days=2), end=now + timedelta(days=3))
+        TradePeriod.objects.create(name='Period 3', start=now + timedelta(days=5), end=now + timedelta(days=6))
+        TradePeriod.objects.create(name='Old period', start=now - timedelta(days=6), end=now - timedelta(days=5))
+
+        self.assertEqual(TradePeriod.get_current(), self.period)
+        self.assertEqual(TradePeriod.get_next(), upcoming, 'next period is not the upcoming one')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(TradePeriod.get_current(), self.period)
+            self.assertEqual(TradePeriod.get_next(), upcoming)
+
+        self.period.end = now - timedelta(minutes=1)
+        self.period.save()
+
+        self.assertIsNone(TradePeriod.get_current(), 'cache not invalidated on save')
+
+        # The cached periods expire when the next period starts
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(days=2, hours=1)):
+            self.assertEqual(TradePeriod.get_current(), upcoming, 'cache not expired at the period start')
+
+    def test_tradeperiod_cache_timeout(self):
+        """TradePeriod periods are not cached forever without boundaries"""
+
+        TradePeriod.objects.all().delete()
+
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.assertIsNone(TradePeriod.get_current())
+
+        self.assertEqual(cache_set.call_args[0][2], PERIODS_TTL)
+
+    def test_academic_structure(self):
+        """Trading years and groups are read from heart and rebuilt on changes"""
+
+        self.assertEqual(get_years(), DEFAULT_YEARS, 'default years not used without heart data')
+
+        # The heart rows are rolled back without signals after the test
+        self.addCleanup(academic_structure.invalidate)
+
+        degree = Degree.objects.create(id='GII', name='Grado')
+        year = HeartYear.objects.create(year=1, degree=degree)
+        HeartGroup.objects.create(name='1.1', number=1, year=year, subgroups=2)
+        group = HeartGroup.objects.create(name='1.2', number=2, year=year, subgroups=3)
+
+        years = get_years()
+
+        self.assertListEqual(list(years), [1])
+        self.assertDictEqual(years[1].groups, {1: 2, 2: 3})
+        self.assertEqual(academic_structure.get_json(), '{"0": {"1": 2, "2": 3}}')
+
+        with self.assertNumQueries(0):
+            get_years()
+            academic_structure.get_json()
+
+        group.subgroups = 1
+        group.save()
+
+        self.assertDictEqual(get_years()[1].groups, {1: 2, 2: 1}, 'structure not rebuilt on group change')
+        self.assertTrue(get_years()[1].invalid_subgroup(2, 2))
+        self.assertTrue(get_years()[1].invalid_group(3))
+
+        # Lines of the years no longer in the structure are errors, not crashes
+        line = TradeOfferLine(year=2, curr_group=1, curr_subgroup=1, wanted_groups='2')
+
+        self.assertEqual(line.validate(get_years(), subjects_registry.all()), {'year': 'El año 2 no existe'})
+        self.assertIsNone(line.year_obj)
+
+        offer = TradeOffer.objects.create(user=self.user, period=self.period)
+        TradeOfferLine.objects.create(offer=offer, year=2, curr_group=1, curr_subgroup=1, wanted_groups='2', subjects='2')
+
+        answer = TradeOfferAnswer(offer=offer)
+        answer.set_groups({'2': [2, 1]})
+
+        with self.assertRaisesMessage(ValidationError, 'El año 2 ya no existe'):
+            answer.clean()
+
+    def test_academic_structure_four_years(self):
+        """Degrees with more than three years can be traded"""
+
+        self.addCleanup(academic_structure.invalidate)
+
+        degree = Degree.objects.create(id='GII', name='Grado')
+
+        for number in range(1, 5):
+            year = HeartYear.objects.create(year=number, degree=degree)
+            HeartGroup.objects.create(name='{}.1'.format(number), number=1, year=year, subgroups=1)
+            HeartGroup.objects.create(name='{}.2'.format(number), number=2, year=year, subgroups=1)
+
+        self.assertListEqual(list(get_years()), [1, 2, 3, 4])
+
+        subject = Subject(code=4, name='Subject 4', acronym='S4', quarter=1, year=4)
+        subject.full_clean()
+        subject.save()
+
+        line = TradeOfferLine(year=4, curr_group=1, curr_subgroup=1, wanted_groups='2', subjects='4')
+
+        self.assertEqual(TradeOfferLine.validate_lines([line], exclude=['offer']), [None], 'fourth year line is not valid')
+
+        c = Client()
+        c.force_login(self.user)
+
+        res = c.get(reverse('trading:offer_create'))
+
+        self.assertContains(res, 'name="3-curr_group"')
+        self.assertContains(res, 'value="4"')
+
+        res = c.post(reverse('trading:offer_create'), {
+            '3-curr_group': '1', '3-curr_subgroup': '1', '3-wanted_groups': '2', '3-subjects': '4',
+        })
+
+        self.assertEqual(res.status_code, 302, 'fourth year offer not created')
+        self.assertTrue(TradeOfferLine.objects.filter(offer__user=self.user, year=4).exists())
 
     def test_tradeofferline_validate_subjects(self):
         """TradeOfferLine validates subjects properly"""
@@ -142,6 +355,68 @@ class TradingModelsTests(TestCase):
         except ValidationError:
             self.fail('Current subgroup is valid but validation failed')
 
+    def test_tradeofferline_validate_lines(self):
+        """TradeOfferLine.validate_lines validates several lines without queries"""
+
+        lines = [
+            TradeOfferLine(year=1, curr_group=1, curr_subgroup=1, wanted_groups='2', subjects='1'),
+            TradeOfferLine(year=2, curr_group=1, curr_subgroup=1, wanted_groups='2', subjects='1'),
+            TradeOfferLine(year=3, curr_group=1, curr_subgroup=1, wanted_groups='2', subjects=''),
+            TradeOfferLine(year=1, curr_group='a', curr_subgroup=1, wanted_groups='2', subjects='1'),
+            TradeOfferLine(year=1, curr_group=1, curr_subgroup='a', wanted_groups='1', subjects='9'),
+        ]
+
+        TradeOfferLine.validate_lines(lines[:1], exclude=['offer'])
+
+        with self.assertNumQueries(0):
+            errors = TradeOfferLine.validate_lines(lines, exclude=['offer'])
+
+        self.assertIsNone(errors[0], 'valid line has errors')
+        self.assertIn('La asignatura 1 es de un año distinto', errors[1].message_dict['subjects'])
+        self.assertIn('subjects', errors[2].message_dict, 'blank subjects are valid')
+        self.assertIn('curr_group', errors[3].message_dict, 'invalid field value is valid')
+
+        # Field errors do not hide the rest, like in full_clean()
+        self.assertSetEqual(set(errors[4].message_dict), {'curr_subgroup', 'wanted_groups', 'subjects'})
+
+    def test_tradeofferline_normalized_relations(self):
+        """TradeOfferLine keeps its normalized subjects and wanted groups in sync"""
+
+        Subject.objects.create(code=3, name='Subject 3', acronym='S3', quarter=1, year=1)
+
+        offer = TradeOffer.objects.create(user=self.user, period=self.period)
+        line = TradeOfferLine.objects.create(offer=offer, year=1, curr_group=1, curr_subgroup=1, wanted_groups='2,3', subjects='1,3')
+
+        self.assertSetEqual(set(line.line_subjects.values_list('subject', 'state')), {(1, 0), (3, 0)})
+        self.assertSetEqual(set(line.line_wanted_groups.values_list('group', flat=True)), {2, 3})
+
+        line.subjects = '1'
+        line.started = '1'
+        line.wanted_groups = '3'
+        line.save()
+
+        self.assertSetEqual(set(line.line_subjects.values_list('subject', 'state')), {(1, TradeOfferLineSubject.STARTED)})
+        self.assertSetEqual(set(line.line_wanted_groups.values_list('group', flat=True)), {3})
+
+        line.completed = '1'
+        line.save()
+
+        self.assertSetEqual(set(line.line_subjects.values_list('subject', 'state')), {(1, TradeOfferLineSubject.COMPLETED)})
+
+        # Saves that do not change the subjects or groups leave the relations alone
+        line = TradeOfferLine.objects.get(pk=line.pk)
+        line.curr_subgroup = 2
+
+        with self.assertNumQueries(1):
+            line.save()
+
+        line.wanted_groups = '2'
+
+        with self.assertNumQueries(5):
+            line.save()
+
+        self.assertSetEqual(set(line.line_wanted_groups.values_list('group', flat=True)), {2})
+
     def test_tradeofferanswer_getter_setter_groups(self):
         """TradeOfferAnswer groups getter and setter works properly"""
 
@@ -678,6 +953,252 @@ class TradingProcessTests(TestCase):
         self.answer2.is_visible = True
         self.answer2.save()
 
+    def test_accept_answer(self):
+        """TradeOffer.accept_answer hides the rest of offers and answers of both users in bulk"""
+
+        offer3 = TradeOffer.objects.create(user=self.user2, period=self.period)
+
+        # The hidden offers are read to publish them in the offers feed
+        # Every changed row is locked with two queries, by table and id
+        with self.assertNumQueries(8):
+            hidden = self.offer1.accept_answer(self.answer)
+
+        self.assertEqual(hidden, 2, 'wrong number of hidden offers and answers')
+
+        self.offer1.refresh_from_db()
+        self.assertEqual(self.offer1.answer, self.answer, 'accepted answer is not saved in the offer')
+        self.assertFalse(self.offer1.is_visible, 'answered offer is still visible')
+        self.assertFalse(TradeOffer.objects.get(pk=offer3.id).is_visible, 'offer from answer creator is not hidden')
+        self.assertFalse(TradeOfferAnswer.objects.get(pk=self.answer2.id).is_visible, 'answer from offer creator is not hidden')
+        self.assertTrue(TradeOffer.objects.get(pk=self.offer2.id).is_visible, 'random offer is affected by another offer process')
+
+        other = TradeOfferAnswer(user=self.user3, offer=self.offer1)
+        other.set_groups({'1': [3, 1]})
+        other.save()
+
+        self.assertIsNone(self.offer1.accept_answer(other), 'a second answer can be accepted')
+
+        with self.assertRaises(ValueError):
+            self.offer2.accept_answer(other)
+
+    def test_accept_hidden_answer(self):
+        """TradeOffer.accept_answer does not accept an answer hidden after it was loaded"""
+
+        answer = TradeOfferAnswer.objects.get(pk=self.answer.id)
+
+        # Hidden meanwhile by the acceptance of another offer
+        TradeOfferAnswer.objects.filter(pk=answer.id).update(is_visible=False)
+
+        self.assertIsNone(self.offer1.accept_answer(answer), 'a hidden answer can be accepted')
+
+        self.offer1.refresh_from_db()
+        self.assertIsNone(self.offer1.answer, 'hidden answer is saved in the offer')
+        self.assertTrue(self.offer1.is_visible, 'offer is hidden by a hidden answer')
+
+    def test_offers_feed(self):
+        """The offers feed sends the changes of the offers, answering polls without changes with a 304"""
+
+        url = reverse('trading:feed')
+        last_id = feed.get_last_id(self.period)
+
+        c = Client()
+
+        res = c.get(url)
+
+        self.assertEqual(res.json(), {'last_id': last_id, 'interval': feed.POLL_INTERVAL, 'events': []})
+        self.assertEqual(res['ETag'], feed.get_etag(self.period, last_id))
+
+        # Unchanged feeds are answered with a single query
+        with self.assertNumQueries(1):
+            res = c.get(url, {'last_id': last_id}, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, 304)
+
+        offer2_id = self.offer2.id
+
+        offer3 = TradeOffer.objects.create(user=self.user3, period=self.period)
+        self.offer1.accept_answer(self.answer)
+        self.offer2.delete()
+
+        events = [
+            (e.offer_id, e.kind) for e in feed.get_events(self.period, last_id)
+        ]
+
+        self.assertEqual(events, [
+            (offer3.id, TradeOfferEvent.CREATED),
+            (self.offer1.id, TradeOfferEvent.REMOVED),
+            (offer2_id, TradeOfferEvent.REMOVED),
+        ])
+
+        res = c.get(url, {'last_id': last_id}, HTTP_IF_NONE_MATCH=feed.get_etag(self.period, last_id))
+        data = res.json()
+
+        self.assertEqual(res.status_code, 200, 'changed feed not sent')
+        self.assertEqual(data['events'][0], {'id': data['events'][0]['id'], 'kind': 'created', 'offer': offer3.id})
+        self.assertEqual([e['kind'] for e in data['events']].count('removed'), 2)
+        self.assertEqual(data['last_id'], feed.get_last_id(self.period))
+
+        res = c.get(url, {'last_id': data['last_id']}, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, 304, 'feed sent again without changes')
+
+    def test_answer_unique(self):
+        """A user can only answer an offer once"""
+
+        duplicated = TradeOfferAnswer(user=self.user2, offer=self.offer1)
+        duplicated.set_groups({'1': [3, 1]})
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            duplicated.save()
+
+        self.assertEqual(TradeOfferAnswer.objects.filter(offer=self.offer1, user=self.user2).count(), 1)
+
+    def test_query_plans(self):
+        """The hot trading queries use the composite indexes"""
+
+        if connection.vendor == 'postgresql':
+            # The test tables are too small for the planner to prefer an index
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        elif connection.vendor != 'sqlite':
+            self.skipTest('query plans only checked on PostgreSQL and SQLite')
+
+        # SQLite creates unique constraints as automatic indexes of the table
+        answer_index = 'trading_answer_unique' if connection.vendor == 'postgresql' else 'sqlite_autoindex_trading_tradeofferanswer'
+
+        plans = [(answer_index, TradeOfferAnswer.objects.filter(offer=self.offer1, user=self.user2))]
+
+        # The offers listed by the index view, with and without the own
+        # offers and answers of the user
+        for user in [AnonymousUser(), self.user1]:
+            request = RequestFactory().get(reverse('trading:list'))
+            request.user = user
+
+            view = IndexView()
+            view.setup(request)
+
+            plans.append(('trading_offer_open_idx', view.get_queryset()))
+
+        for index, queryset in plans:
+            self.assertIn(index, queryset.explain(), 'query does not use {}'.format(index))
+
+    def test_export_completed(self):
+        """Managers can export the completed offers of a period"""
+
+        self.offer1.accept_answer(self.answer)
+        TradeOffer.objects.filter(pk=self.offer1.id).update(is_completed=True)
+
+        url = reverse('trading:management_export', args=[self.period.id])
+
+        c = Client()
+        c.force_login(self.user1)
+
+        self.assertEqual(c.get(url).status_code, 403, 'non manager can export offers')
+
+        self.user1.user_permissions.add(Permission.objects.get(codename='is_manager'))
+
+        res = c.get(url)
+        content = b''.join(res.streaming_content).decode()
+        rows = content.lstrip('\ufeff').splitlines()
+
+        self.assertEqual(len(rows), 2, 'wrong number of exported rows')
+        self.assertTrue(rows[1].startswith('{},{},1,tester_1,'.format(self.offer1.id, self.answer.id)))
+        self.assertIn('2.1', rows[1], 'answer group not exported')
+
+        data = json.loads(b''.join(c.get(url, {'format': 'json'}).streaming_content))
+
+        self.assertEqual([x['id'] for x in data], [self.offer1.id])
+        self.assertEqual(data[0]['answer']['user']['username'], 'tester_2')
+        self.assertEqual(data[0]['lines'][0]['subjects'], [{'code': 1, 'name': 'Subject 1'}])
+
+        self.assertEqual(c.get(url, {'format': 'xml'}).status_code, 404)
+
+    def test_export_chunks(self):
+        """Completed offers are read in chunks"""
+
+        for offer, answer in [(self.offer1, self.answer), (self.offer2, self.answer2)]:
+            TradeOffer.objects.filter(pk=offer.id).update(answer=answer, is_completed=True)
+
+        offers = export.iter_completed_offers(self.period, chunk_size=1)
+
+        # Two chunks with their lines, and an empty one
+        with self.assertNumQueries(5):
+            self.assertEqual([o.id for o in offers], [self.offer1.id, self.offer2.id])
+
+    def test_archive_period(self):
+        """Archived periods keep their offers as JSON and their statistics"""
+
+        self.offer1.accept_answer(self.answer)
+
+        self.assertFalse(archive.get_archivable_periods().exists(), 'current period is archivable')
+
+        for options in [{}, {'force': True}]:
+            with self.assertRaises(CommandError):
+                call_command('archive_trading_periods', period=self.period.id, stdout=StringIO(), **options)
+
+        self.assertTrue(TradeOffer.objects.filter(period=self.period).exists(), 'open period archived')
+
+        TradePeriod.objects.filter(pk=self.period.id).update(end=timezone.now() - timedelta(minutes=1))
+
+        self.assertFalse(archive.get_archivable_periods().exists(), 'period with exchanges in process is archivable')
+
+        with self.assertRaises(CommandError):
+            call_command('archive_trading_periods', period=self.period.id, stdout=StringIO())
+
+        call_command('archive_trading_periods', period=self.period.id, dry_run=True, force=True, stdout=StringIO())
+
+        TradePeriod.objects.filter(pk=self.period.id).update(end=timezone.now() - archive.PENDING_GRACE - timedelta(minutes=1))
+
+        self.assertEqual(list(archive.get_archivable_periods()), [self.period], 'abandoned exchanges keep the period')
+
+        TradePeriod.objects.filter(pk=self.period.id).update(end=timezone.now() - timedelta(minutes=1))
+        TradeOffer.objects.filter(pk=self.offer1.id).update(is_completed=True)
+
+        self.assertEqual(list(archive.get_archivable_periods()), [self.period])
+        self.assertEqual(archive.archive_period(self.period, chunk_size=1), 2)
+
+        self.assertFalse(TradeOffer.objects.filter(period=self.period).exists(), 'offers not deleted')
+        self.assertFalse(TradeOfferLine.objects.exists(), 'lines not deleted')
+        self.assertFalse(TradeOfferAnswer.objects.exists(), 'answers not deleted')
+
+        self.period.refresh_from_db()
+
+        self.assertIsNotNone(self.period.archived)
+        self.assertEqual(self.period.summary, {
+            'offers': 2, 'visible': 1, 'accepted': 1, 'completed': 1,
+            'answers': 2, 'lines': 2, 'years': {'1': 1, '2': 1},
+        })
+
+        archived = list(ArchivedTradeOffer.objects.filter(period=self.period))
+
+        self.assertEqual([a.offer_id for a in archived], [self.offer1.id, self.offer2.id])
+        self.assertEqual(archived[0].user, self.user1)
+        self.assertEqual(archived[0].data['answer'], self.answer.id)
+        self.assertEqual(archived[0].data['lines'][0]['wanted_groups'], [2, 3])
+        self.assertEqual(archived[0].data['answers'][0]['groups'], {'1': [2, 1]})
+
+        self.assertFalse(archive.get_archivable_periods().exists(), 'period archived twice')
+
+        # The results of archived periods are exported from the archive
+        self.user1.user_permissions.add(Permission.objects.get(codename='is_manager'))
+
+        c = Client()
+        c.force_login(self.user1)
+
+        url = reverse('trading:management_export', args=[self.period.id])
+
+        rows = b''.join(c.get(url).streaming_content).decode().lstrip('\ufeff').splitlines()
+
+        self.assertEqual(len(rows), 2, 'wrong number of exported rows')
+        self.assertTrue(rows[1].startswith('{},{},1,tester_1,'.format(self.offer1.id, self.answer.id)))
+        self.assertIn('2.1', rows[1], 'answer group not exported')
+
+        data = json.loads(b''.join(c.get(url, {'format': 'json'}).streaming_content))
+
+        self.assertEqual([x['id'] for x in data], [self.offer1.id])
+        self.assertEqual(data[0]['answer']['user']['username'], 'tester_2')
+        self.assertEqual(data[0]['lines'][0]['subjects'], [{'code': 1, 'name': 'Subject 1'}])
+
 
 class TradingAuxiliarToolsTests(TestCase):
     def setUp(self):
@@ -711,3 +1232,314 @@ class TradingAuxiliarToolsTests(TestCase):
         self.assertEquals(self.render_get_answer(self.offer, AnonymousUser()), 'None')
         self.assertEquals(self.render_get_answer(self.offer, self.user1), 'None')
         self.assertEquals(self.render_get_answer(self.offer, self.user2), 'Respuesta de {} para Oferta #1'.format(str(self.user2)))
+
+    def test_list_view_constant_queries(self):
+        """Trading list view runs the same queries regardless of the number of offers"""
+
+        c = Client()
+        c.force_login(self.user2)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                res = c.get(reverse('trading:list'))
+
+            self.assertEqual(res.status_code, 200)
+            return len(ctx.captured_queries)
+
+        count_queries()
+        queries = count_queries()
+
+        for i in range(5):
+            user = User.objects.create(username='other_{}'.format(i), email='other{}@test.com'.format(i))
+            offer = TradeOffer.objects.create(user=user, period=self.offer.period)
+
+            TradeOfferLine.objects.create(
+                offer=offer, year=1, subjects='1',
+                curr_group=1, curr_subgroup=1, wanted_groups='2'
+            )
+
+            answer = TradeOfferAnswer(user=self.user2, offer=offer)
+            answer.set_groups({'1': [2, 1]})
+            answer.save()
+
+        self.assertEqual(count_queries(), queries, 'queries depend on the number of offers')
+
+
+class TradingQueryCountTests(TestCase):
+    """Upper bounds of the queries run by every trading view
+
+    A failure here usually means a view fetches the same object again or
+    queries inside a loop.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+        self.user1 = User.objects.create(username='tester_1', email='test@test.com', password='1234')
+        self.user2 = User.objects.create(username='tester_2', email='test2@test.com', password='1234')
+        self.user3 = User.objects.create(username='tester_3', email='test3@test.com', password='1234')
+        self.user4 = User.objects.create(username='tester_4', email='test4@test.com', password='1234')
+
+        matching._indexes.clear()
+
+        Subject.objects.create(code=1, name='Subject 1', acronym='S1', quarter=1, year=1)
+
+        now = timezone.now()
+        period = TradePeriod.objects.create(name='Period 1', start=now - timedelta(hours=2), end=now + timedelta(hours=1))
+
+        self.offer = TradeOffer.objects.create(user=self.user1, period=period)
+        self.accepted = TradeOffer.objects.create(user=self.user3, period=period)
+
+        for offer in [self.offer, self.accepted]:
+            TradeOfferLine.objects.create(
+                offer=offer, year=1, subjects='1',
+                curr_group=1, curr_subgroup=1, wanted_groups='2'
+            )
+
+        self.answer = TradeOfferAnswer(user=self.user2, offer=self.offer)
+        self.answer.set_groups({'1': [2, 1]})
+        self.answer.save()
+
+        answer = TradeOfferAnswer(user=self.user4, offer=self.accepted)
+        answer.set_groups({'1': [2, 1]})
+        answer.save()
+
+        self.accepted.accept_answer(answer)
+
+    def assertMaxQueries(self, limit, user, name, *args):
+        c = Client()
+        c.force_login(user)
+
+        # Warm up the caches shared between requests
+        c.get(reverse(name, args=args))
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = c.get(reverse(name, args=args))
+
+        self.assertEqual(res.status_code, 200, '{} is not accessible'.format(name))
+        self.assertLessEqual(
+            len(ctx.captured_queries), limit,
+            '{} runs too many queries:\n{}'.format(name, '\n'.join(q['sql'] for q in ctx.captured_queries))
+        )
+
+    def test_offer_views(self):
+        """Offer views do not repeat queries"""
+
+        self.assertMaxQueries(12, self.user2, 'trading:list')
+        self.assertMaxQueries(7, self.user2, 'trading:offer_detail', self.offer.id)
+        self.assertMaxQueries(6, self.user1, 'trading:offer_edit', self.offer.id)
+        self.assertMaxQueries(5, self.user1, 'trading:offer_delete', self.offer.id)
+        self.assertMaxQueries(7, self.user1, 'trading:offer_matches')
+
+    def test_answer_views(self):
+        """Answer views do not repeat queries"""
+
+        self.assertMaxQueries(7, self.user3, 'trading:answer_create', self.offer.id)
+        self.assertMaxQueries(7, self.user2, 'trading:answer_detail', self.answer.id)
+        self.assertMaxQueries(7, self.user2, 'trading:answer_edit', self.answer.id)
+        self.assertMaxQueries(6, self.user2, 'trading:answer_delete', self.answer.id)
+        self.assertMaxQueries(8, self.user1, 'trading:answer_accept', self.answer.id)
+
+    def test_change_views(self):
+        """Change process views do not repeat queries"""
+
+        self.assertMaxQueries(7, self.user3, 'trading:change_process', self.accepted.id)
+        self.assertMaxQueries(7, self.user4, 'trading:change_process', self.accepted.id)
+
+
+class TradingMatchingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        matching._indexes.clear()
+
+        self.user1 = User.objects.create(username='tester_1', email='test@test.com', password='1234')
+        self.user2 = User.objects.create(username='tester_2', email='test2@test.com', password='1234')
+        self.user3 = User.objects.create(username='tester_3', email='test3@test.com', password='1234')
+
+        Subject.objects.create(code=1, name='Subject 1', acronym='S1', quarter=1, year=1)
+        Subject.objects.create(code=2, name='Subject 2', acronym='S2', quarter=1, year=1)
+
+        now = timezone.now()
+        self.period = TradePeriod.objects.create(name='Period 1', start=now - timedelta(hours=2), end=now + timedelta(hours=1))
+
+        self.offer1 = TradeOffer.objects.create(user=self.user1, period=self.period)
+        self.offer2 = TradeOffer.objects.create(user=self.user2, period=self.period)
+        self.offer3 = TradeOffer.objects.create(user=self.user3, period=self.period)
+
+        TradeOfferLine.objects.create(
+            offer=self.offer1, year=1, subjects='1,2',
+            curr_group=1, curr_subgroup=1, wanted_groups='2'
+        )
+
+        TradeOfferLine.objects.create(
+            offer=self.offer2, year=1, subjects='1,2',
+            curr_group=2, curr_subgroup=1, wanted_groups='1,3'
+        )
+
+        TradeOfferLine.objects.create(
+            offer=self.offer3, year=1, subjects='2',
+            curr_group=2, curr_subgroup=1, wanted_groups='3'
+        )
+
+    def test_find_matches(self):
+        """Matching engine finds compatible offers sorted by score"""
+
+        self.assertListEqual(matching.find_matches(self.offer1), [(self.offer2.id, 2)])
+        self.assertListEqual(matching.find_matches(self.offer2), [(self.offer1.id, 2)])
+        self.assertListEqual(matching.find_matches(self.offer3), [])
+
+        self.offer2.is_visible = False
+        self.offer2.save()
+        matching.update_offer(self.offer2)
+
+        self.assertListEqual(matching.find_matches(self.offer1), [], 'hidden offer is still matched')
+
+    def test_index_changed_by_other_process(self):
+        """Matching index is rebuilt after other processes change the offers"""
+
+        reset_cache_versions()
+
+        self.assertListEqual(matching.find_matches(self.offer1), [(self.offer2.id, 2)])
+
+        key = matching.VERSION_KEY.format(self.period.id)
+        index = matching.get_index(self.period.id)
+
+        # Our own changes keep the index without rebuilding it
+        matching.update_offer(self.offer3)
+
+        self.assertEqual(index.version, CacheVersion.objects.get(key=key).version, 'own change forces a rebuild')
+
+        # Another process accepts an answer for the offer and bumps the version
+        TradeOffer.objects.filter(id=self.offer2.id).update(is_visible=False)
+        CacheVersion.objects.filter(key=key).update(version='other')
+        reset_cache_versions()
+
+        self.assertListEqual(matching.find_matches(self.offer1), [], 'offer changed by other process is still matched')
+
+        # A change of ours must not hide a concurrent change of another process
+        CacheVersion.objects.filter(key=key).update(version='another')
+        matching.update_offer(self.offer3)
+
+        self.assertNotEqual(index.version, CacheVersion.objects.get(key=key).version, 'index not rebuilt')
+
+    def test_index_updated_by_views(self):
+        """Matching index is updated when offers are edited or deleted"""
+
+        c = Client()
+        c.force_login(self.user3)
+
+        self.assertListEqual(matching.find_matches(self.offer1), [(self.offer2.id, 2)])
+
+        c.post(reverse('trading:offer_edit', args=[self.offer3.id]), {
+            '0-curr_group': 2,
+            '0-curr_subgroup': 1,
+            '0-wanted_groups': [1],
+            '0-subjects': [1],
+        })
+
+        self.assertListEqual(
+            matching.find_matches(self.offer1),
+            [(self.offer2.id, 2), (self.offer3.id, 1)],
+            'edited offer is not matched'
+        )
+
+        c.post(reverse('trading:offer_delete', args=[self.offer3.id]))
+
+        self.assertListEqual(matching.find_matches(self.offer1), [(self.offer2.id, 2)], 'deleted offer is still matched')
+
+    def test_matches_view(self):
+        """Matches view lists the compatible offers of the user"""
+
+        c = Client()
+        c.force_login(self.user1)
+
+        res = c.get(reverse('trading:offer_matches'))
+
+        self.assertContains(res, 'Oferta #{}'.format(self.offer2.id))
+        self.assertNotContains(res, 'Oferta #{}'.format(self.offer3.id))
+
+    def test_find_cycles(self):
+        """Cycles solver finds multi-party swaps between different offers"""
+
+        self.assertListEqual(find_cycles(self.period.id), [], 'direct swaps are reported as cycles')
+
+        user4 = User.objects.create(username='tester_4', email='test4@test.com', password='1234')
+        offer4 = TradeOffer.objects.create(user=user4, period=self.period)
+
+        TradeOfferLine.objects.create(
+            offer=offer4, year=1, subjects='2',
+            curr_group=3, curr_subgroup=1, wanted_groups='1'
+        )
+
+        matching.update_offer(offer4)
+
+        cycles = find_cycles(self.period.id)
+
+        self.assertEqual(len(cycles), 1)
+        self.assertEqual(cycles[0].subject, 2)
+        self.assertTupleEqual(cycles[0].groups, (1, 2, 3))
+        self.assertEqual(cycles[0].offers[0], self.offer1.id)
+        self.assertIn(cycles[0].offers[1], [self.offer2.id, self.offer3.id])
+        self.assertEqual(cycles[0].offers[2], offer4.id)
+
+        c = Client()
+        c.force_login(self.user1)
+        self.user1.user_permissions.add(Permission.objects.get(codename='is_manager'))
+
+        self.assertContains(c.get(reverse('trading:management_list')), 'Intercambios circulares')
+
+
+class TradingBenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        Subject.objects.create(code=1, name='Subject 1', acronym='S1', quarter=1, year=1)
+
+    def test_generate_period(self):
+        """generate_period creates consistent synthetic data"""
+
+        period, counts = generate_period(users=20, answers=2, seed=1)
+
+        self.assertEqual(TradePeriod.get_current(), period, 'generated period is not the current one')
+        self.assertEqual(counts['offers'], 10)
+        self.assertEqual(TradeOfferAnswer.objects.filter(offer__period=period).count(), counts['answers'])
+        self.assertEqual(TradeOfferLineSubject.objects.filter(line__offer__period=period).values('line').distinct().count(), counts['lines'])
+
+        for line in TradeOfferLine.objects.filter(offer__period=period):
+            try:
+                line.full_clean()
+            except ValidationError:
+                self.fail('generated line is not valid')
+
+    def test_run_benchmark(self):
+        """run_benchmark measures every view without changing the data"""
+
+        period, _ = generate_period(users=10, answers=1)
+
+        report = run_benchmark(period, repeat=1)
+
+        self.assertEqual(report['results']['index']['status'], 200)
+        self.assertEqual(report['results']['answer_accept']['status'], 302)
+        self.assertEqual(report['results']['change_process']['status'], 200)
+        self.assertFalse(TradeOffer.objects.filter(period=period).exclude(answer=None).exists(), 'accepted answer not rolled back')
+
+    def test_delete_synthetic_data(self):
+        """The synthetic data is refused without DEBUG and can be deleted"""
+
+        user = User.objects.create(username='real', email='real@example.com')
+
+        with override_settings(DEBUG=False), self.assertRaises(CommandError):
+            call_command('generate_trading_data', users=10, stdout=StringIO())
+
+        call_command('generate_trading_data', users=10, force=True, stdout=StringIO())
+
+        period = TradePeriod.objects.get(name__startswith=SYNTHETIC_PREFIX)
+        offer = TradeOffer.objects.filter(period=period, answers__isnull=False).first()
+        offer.accept_answer(offer.answers.first())
+
+        call_command('generate_trading_data', cleanup=True, stdout=StringIO())
+
+        self.assertFalse(TradePeriod.objects.filter(pk=period.pk).exists(), 'synthetic period not deleted')
+        self.assertFalse(User.objects.filter(email__endswith=SYNTHETIC_DOMAIN).exists(), 'synthetic users not deleted')
+        self.assertTrue(User.objects.filter(pk=user.pk).exists(), 'real user deleted')
+        self.assertTrue(Subject.objects.filter(code=1).exists(), 'real subject deleted')
@@ -10,6 +10,8 @@ urlpatterns = [
     path('condiciones/', flatpages_views.flatpage, {'url': '/condiciones-permutas/'}, name='conditions'),
 
     path('crear/', views.TradeOfferAddView.as_view(), name='offer_create'),
+    path('novedades/', views.TradeOfferFeedView.as_view(), name='feed'),
+    path('compatibles/', views.TradeOfferMatchesView.as_view(), name='offer_matches'),
     path('ofertas/<int:pk>/editar/', views.TradeOfferEditView.as_view(), name='offer_edit'),
     path('ofertas/<int:pk>/eliminar/', views.TradeOfferDeleteView.as_view(), name='offer_delete'),
     path('ofertas/<int:pk>/responder/', views.TradeOfferAnswerCreateView.as_view(), name='answer_create'),
@@ -24,4 +26,5 @@ urlpatterns = [
     path('intercambio/<int:pk>/', views.ChangeProcessView.as_view(), name='change_process'),
 
     path('gestion/', views.ManagementListView.as_view(), name='management_list'),
+    path('gestion/periodos/<int:pk>/exportar/', views.ManagementExportView.as_view(), name='management_export'),
 ]
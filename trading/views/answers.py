@@ -1,4 +1,4 @@
-import json
+import logging
 
 from django.contrib import messages
 from django.contrib.auth.mixins import (
@@ -6,7 +6,10 @@ from django.contrib.auth.mixins import (
     UserPassesTestMixin,
 )
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db import (
+    IntegrityError,
+    transaction,
+)
 from django.shortcuts import redirect
 from django.urls import (
     reverse,
@@ -17,19 +20,25 @@ from django.views.generic import (
     DetailView,
 )
 from django.views.generic.base import ContextMixin
-from django.views.generic.detail import SingleObjectMixin
 
 from bot.notifications import telegram_notify
 
+from .. import matching
 from ..models import (
-    YEARS,
     TradeOffer,
     TradeOfferAnswer,
+    academic_structure,
+)
+from .common import (
+    CachedObjectMixin,
+    TradingPeriodMixin,
 )
-from .common import TradingPeriodMixin
 
 
-class TradeOfferAnswerLinesMixin(SingleObjectMixin, ContextMixin):
+logger = logging.getLogger(__name__)
+
+
+class TradeOfferAnswerLinesMixin(CachedObjectMixin, ContextMixin):
     def get_context_data(self, **kwargs):
         lines = []
 
@@ -62,7 +71,7 @@ class TradeOfferAnswerDetailView(UserPassesTestMixin, TradeOfferAnswerLinesMixin
         )
 
     def get_queryset(self):
-        return super().get_queryset().select_related('offer')
+        return super().get_queryset().select_related('user', 'offer__user').prefetch_related('offer__lines')
 
 
 class TradeOfferAnswerEditMixin(TradingPeriodMixin):
@@ -70,7 +79,7 @@ class TradeOfferAnswerEditMixin(TradingPeriodMixin):
         lines = self.get_offer().lines.all()
 
         context = super().get_context_data(**kwargs)
-        context['years'] = json.dumps({y - 1: YEARS[y].groups for y in YEARS})
+        context['years'] = academic_structure.get_json()
         context['lines_range'] = range(len(lines))
         context['initial_groups'] = [line.get_wanted_groups()[0] for line in lines]
         return context
@@ -83,7 +92,8 @@ class TradeOfferAnswerEditMixin(TradingPeriodMixin):
 
         for line in offer.lines.all():
             try:
-                data[line.year] = [
+                # Same keys as the stored JSON, as the answer is reused after saving
+                data[str(line.year)] = [
                     int(request.POST.get('{}-group'.format(line.i))),
                     int(request.POST.get('{}-subgroup'.format(line.i))),
                 ]
@@ -93,14 +103,19 @@ class TradeOfferAnswerEditMixin(TradingPeriodMixin):
         answer.set_groups(data)
 
         try:
-            answer.save()
+            with transaction.atomic():
+                answer.save()
         except ValidationError:
             return super().get(request, **kwargs)
+        except IntegrityError:
+            # Another request of the same user answered the offer first
+            messages.error(request, 'Ya has respondido a esta oferta')
+            return redirect(offer)
 
         return self.on_success(request, **kwargs)
 
 
-class TradeOfferAnswerCreateView(LoginRequiredMixin, UserPassesTestMixin, TradeOfferAnswerEditMixin, DetailView):
+class TradeOfferAnswerCreateView(LoginRequiredMixin, UserPassesTestMixin, TradeOfferAnswerEditMixin, CachedObjectMixin, DetailView):
     model = TradeOffer
     template_name = 'trading/answer_form.html'
 
@@ -120,7 +135,7 @@ class TradeOfferAnswerCreateView(LoginRequiredMixin, UserPassesTestMixin, TradeO
             messages.error(self.request, 'No puedes responder a esta oferta porque ya está en proceso de intercambio')
             return False
 
-        if TradeOfferAnswer.objects.filter(offer=offer, user=user).count() != 0:
+        if TradeOfferAnswer.objects.filter(offer=offer, user=user).exists():
             messages.error(self.request, 'Ya has respondido a esta oferta')
             return False
 
@@ -172,7 +187,7 @@ class TradeOfferAnswerEditView(TradeOfferAnswerAccessMixin, TradeOfferAnswerLine
         return super().get(request, **kwargs)
 
 
-class TradeOfferAnswerDeleteView(TradeOfferAnswerAccessMixin, DeleteView):
+class TradeOfferAnswerDeleteView(TradeOfferAnswerAccessMixin, CachedObjectMixin, DeleteView):
     model = TradeOfferAnswer
     template_name = 'trading/answer_delete.html'
 
@@ -202,22 +217,15 @@ class TradeOfferAnswerAcceptView(UserPassesTestMixin, TradingPeriodMixin, TradeO
         answer = self.get_object()
         offer = answer.offer
 
-        offer.answer = answer
-        offer.is_visible = False
-        offer.save()
-
-        query = Q(user=offer.user) | Q(user=answer.user)
+        hidden = offer.accept_answer(answer)
 
-        offers = TradeOffer.objects.filter(query & ~Q(pk=offer.id))
-        answers = TradeOfferAnswer.objects.filter(query & ~Q(pk=answer.id))
+        if hidden is None:
+            messages.error(request, 'Esta oferta ya tiene una respuesta aceptada o la respuesta ya no está disponible')
+            return redirect(offer.get_absolute_url())
 
-        for offer in offers:
-            offer.is_visible = False
-            offer.save()
+        logger.info('Answer %s accepted for offer %s, %s offers and answers hidden', answer.id, offer.id, hidden)
 
-        for answer in answers:
-            answer.is_visible = False
-            answer.save()
+        matching.invalidate(offer.period_id)
 
         telegram_notify(answer.user, 'Tu respuesta a la oferta #{} ha sido aceptada y ha comenzado el proceso de intercambio.'.format(offer.id), url=reverse('trading:change_process', args=[offer.id]), url_button='Ver intercambio')
 
@@ -1,4 +1,5 @@
 from django.views.generic.base import ContextMixin
+from django.views.generic.detail import SingleObjectMixin
 
 from ..models import TradePeriod
 
@@ -28,3 +29,21 @@ class TradingPeriodMixin(ContextMixin):
             return ['trading/tradeperiod.html']
 
         return super().get_template_names()
+
+
+class CachedObjectMixin(SingleObjectMixin):
+    """
+    Fetches the object of the view only once per request
+
+    Access tests, dispatch, context and post handlers all call get_object, so
+    the object is kept after the first call.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+
+        if not hasattr(self, '_cached_object'):
+            self._cached_object = super().get_object()
+
+        return self._cached_object
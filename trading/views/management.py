@@ -1,9 +1,17 @@
 from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.http import (
+    Http404,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
 from django.views.generic import ListView
+from django.views.generic.base import View
 
 from meta.views import MetadataMixin
 
-from ..models import TradeOffer, TradePeriod
+from .. import export
+from ..cycles import find_cycles
+from ..models import Subject, TradeOffer, TradePeriod
 
 
 class ManagementListView(PermissionRequiredMixin, MetadataMixin, ListView):
@@ -19,7 +27,43 @@ class ManagementListView(PermissionRequiredMixin, MetadataMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['period'] = TradePeriod.get_current()
+
+        if context['period']:
+            cycles = find_cycles(context['period'].id)
+            subjects = Subject.objects.in_bulk({c.subject for c in cycles})
+
+            context['cycles'] = [(c, subjects.get(c.subject)) for c in cycles]
+
+        context['periods'] = TradePeriod.objects.order_by('-start')
+
         return context
 
     def get_queryset(self):
         return super().get_queryset().prefetch_related('lines')
+
+
+class ManagementExportView(PermissionRequiredMixin, View):
+    permission_required = 'trading.is_manager'
+
+    formats = {
+        'csv': (export.stream_csv, 'text/csv; charset=utf-8'),
+        'json': (export.stream_json, 'application/json'),
+    }
+
+    def get(self, request, pk, **kwargs):
+        period = get_object_or_404(TradePeriod, pk=pk)
+
+        format = request.GET.get('format', 'csv')
+
+        if format not in self.formats:
+            raise Http404
+
+        stream, content_type = self.formats[format]
+
+        response = StreamingHttpResponse(
+            stream(export.iter_results(period)), content_type=content_type
+        )
+
+        response['Content-Disposition'] = 'attachment; filename="permutas-{}.{}"'.format(period.id, format)
+
+        return response
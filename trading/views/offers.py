@@ -1,19 +1,18 @@
-import json
-
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import Prefetch, Q
+from django.http import HttpResponseNotModified, JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse
-from django.views.generic import DetailView, ListView, TemplateView
+from django.views.generic import DetailView, ListView, TemplateView, View
 
 from meta.views import MetadataMixin
 
 from bot.notifications import telegram_notify
 
-from ..models import TradeOffer, TradeOfferAnswer, TradeOfferLine, YEARS
+from .. import feed, matching
+from ..models import TradeOffer, TradeOfferAnswer, TradeOfferLine, academic_structure, get_years
 
-from .common import TradingPeriodMixin
+from .common import CachedObjectMixin, TradingPeriodMixin
 
 
 class IndexView(MetadataMixin, TradingPeriodMixin, ListView):
@@ -35,19 +34,67 @@ class IndexView(MetadataMixin, TradingPeriodMixin, ListView):
                 user=self.request.user, period=self.get_current_period()
             ).first()
 
+        context['feed_last_id'] = feed.get_last_id(self.get_current_period())
+        context['feed_interval'] = feed.POLL_INTERVAL
+
         return context
 
     def get_queryset(self):
         user = self.request.user
-        query = Q(is_visible=True, answer=None)
+        offers = TradeOffer.objects.filter(period=self.get_current_period())
+        query = Q(period=self.get_current_period(), is_visible=True, answer=None)
+
+        queryset = TradeOffer.objects.select_related('user', 'answer').prefetch_related('lines')
 
         if user.is_authenticated:
-            query = query | Q(user=user) | (~Q(answer=None) & Q(answer__user=user))
+            # Every condition goes in its own subquery, as an OR of them
+            # would keep the open offers from using their partial index
+            query = (
+                Q(pk__in=TradeOffer.objects.filter(query).values('pk'))
+                | Q(pk__in=offers.filter(user=user).values('pk'))
+                | Q(pk__in=offers.filter(answer__user=user).values('pk'))
+            )
+
+            queryset = queryset.prefetch_related(Prefetch(
+                'answers', queryset=TradeOfferAnswer.objects.filter(user=user), to_attr='user_answers'
+            ))
+
+        return queryset.filter(query)
+
+
+class TradeOfferFeedView(TradingPeriodMixin, View):
+    """Changes of the offers of the current period, polled by the offers list"""
+
+    def get(self, request, **kwargs):
+        period = self.get_current_period()
+
+        if period:
+            current_id = feed.get_last_id(period)
+
+            if request.headers.get('If-None-Match') == feed.get_etag(period, current_id):
+                response = HttpResponseNotModified()
+                response['ETag'] = feed.get_etag(period, current_id)
+                response['Cache-Control'] = 'no-cache'
+
+                return response
+
+            try:
+                last_id = int(request.GET['last_id'])
+            except (KeyError, ValueError):
+                last_id = current_id
+
+            data = feed.format_events(feed.get_events(period, last_id), last_id)
+        else:
+            data = feed.format_events([], 0, feed.IDLE_POLL_INTERVAL)
 
-        return TradeOffer.objects.prefetch_related('lines').filter(Q(period=self.get_current_period()) & query)
+        response = JsonResponse(data)
+        response['ETag'] = feed.get_etag(period, data['last_id'])
+        response['Cache-Control'] = 'no-cache'
 
+        return response
 
-class TradeOfferDetailView(MetadataMixin, TradingPeriodMixin, UserPassesTestMixin, DetailView):
+
+class TradeOfferDetailView(MetadataMixin, TradingPeriodMixin, UserPassesTestMixin, CachedObjectMixin, DetailView):
     model = TradeOffer
 
     title = 'Oferta de Permuta - DAFI'
@@ -81,6 +128,53 @@ class TradeOfferDetailView(MetadataMixin, TradingPeriodMixin, UserPassesTestMixi
         return super().get_queryset().prefetch_related('lines')
 
 
+class TradeOfferMatchesView(LoginRequiredMixin, MetadataMixin, TradingPeriodMixin, ListView):
+    template_name = 'trading/tradeoffer_matches.html'
+
+    title = 'Ofertas compatibles - Permutas - DAFI'
+    description = 'Sistema de Permutas de la Delegación de Alumnos de la Facultad de Informática'
+    image = 'images/favicon.png'
+
+    def __init__(self, *args, **kwargs):
+        self._offer = None
+        return super().__init__(*args, **kwargs)
+
+    def get_offer(self):
+        if not self._offer:
+            self._offer = TradeOffer.objects.filter(
+                user=self.request.user, period=self.get_current_period(), answer=None
+            ).prefetch_related('lines').first()
+
+        return self._offer
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['my_offer'] = self.get_offer()
+        return context
+
+    def get_queryset(self):
+        offer = self.get_offer()
+
+        if not offer:
+            return []
+
+        scores = dict(matching.find_matches(offer))
+
+        offers = list(
+            TradeOffer.objects
+            .filter(pk__in=scores.keys())
+            .select_related('user')
+            .prefetch_related('lines')
+        )
+
+        for match in offers:
+            match.match_score = scores[match.id]
+
+        offers.sort(key=lambda x: (-x.match_score, x.id))
+
+        return offers
+
+
 class TradeOfferEditMixin(MetadataMixin, TradingPeriodMixin):
     template_name = 'trading/tradeoffer_form.html'
 
@@ -96,8 +190,9 @@ class TradeOfferEditMixin(MetadataMixin, TradingPeriodMixin):
         context = super().get_context_data(**kwargs)
         context['offer'] = self.get_offer()
         context['lines'] = self.get_lines()
+        context['has_subjects'] = any(line.subjects for line in context['lines'])
         context['errors'] = self._errors
-        context['years'] = json.dumps({y - 1: YEARS[y].groups for y in YEARS})
+        context['years'] = academic_structure.get_json()
         return context
 
     def post(self, request, **kwargs):
@@ -105,22 +200,23 @@ class TradeOfferEditMixin(MetadataMixin, TradingPeriodMixin):
 
         deleted = 0
 
-        for line in self.get_lines():
+        lines = self.get_lines()
+
+        for line in lines:
             line.curr_group = request.POST.get('{}-curr_group'.format(line.i), 1)
             line.curr_subgroup = request.POST.get('{}-curr_subgroup'.format(line.i), 1)
 
             line.subjects = ','.join(request.POST.getlist('{}-subjects'.format(line.i)))
             line.wanted_groups = ','.join(request.POST.getlist('{}-wanted_groups'.format(line.i)))
 
-            try:
-                line.full_clean(exclude=['offer'])
+        for line, error in zip(lines, TradeOfferLine.validate_lines(lines, exclude=['offer'])):
+            if not error:
                 valid.append(line)
-            except ValidationError as e:
-                if line.get_subjects_list():
-                    self._errors.append(e)
-                elif line.id:
-                    line.delete()
-                    deleted += 1
+            elif line.get_subjects_list():
+                self._errors.append(error)
+            elif line.id:
+                line.delete()
+                deleted += 1
 
         offer = self.get_offer()
 
@@ -144,8 +240,11 @@ class TradeOfferEditMixin(MetadataMixin, TradingPeriodMixin):
                 line.offer = offer
                 line.save()
 
+            matching.update_offer(offer)
+
             return redirect(self.get_success_url(**kwargs))
         elif deleted:
+            matching.remove_offer(offer)
             offer.delete()
 
             return redirect('trading:list')
@@ -173,7 +272,7 @@ class TradeOfferAddView(LoginRequiredMixin, TradeOfferEditMixin, TemplateView):
         if not self._lines:
             self._lines = []
 
-            for year in YEARS:
+            for year in get_years():
                 self._lines.append(TradeOfferLine(offer=self.get_offer(), year=year))
 
         return self._lines
@@ -182,7 +281,7 @@ class TradeOfferAddView(LoginRequiredMixin, TradeOfferEditMixin, TemplateView):
         return reverse('trading:offer_detail', args=[self.get_offer().id])
 
 
-class TradeOfferEditView(UserPassesTestMixin, TradeOfferEditMixin, DetailView):
+class TradeOfferEditView(UserPassesTestMixin, TradeOfferEditMixin, CachedObjectMixin, DetailView):
     model = TradeOffer
 
     title = 'Editar una Oferta de Permuta'
@@ -210,7 +309,7 @@ class TradeOfferEditView(UserPassesTestMixin, TradeOfferEditMixin, DetailView):
 
             lines = {x.year: x for x in self.get_offer().lines.all()}
 
-            for year in YEARS:
+            for year in get_years():
                 if year in lines:
                     self._lines.append(lines[year])
                 else:
@@ -222,7 +321,7 @@ class TradeOfferEditView(UserPassesTestMixin, TradeOfferEditMixin, DetailView):
         return reverse('trading:offer_edit', args=[self.get_offer().id])
 
 
-class TradeOfferDeleteView(MetadataMixin, UserPassesTestMixin, TradingPeriodMixin, DetailView):
+class TradeOfferDeleteView(MetadataMixin, UserPassesTestMixin, TradingPeriodMixin, CachedObjectMixin, DetailView):
     template_name = 'trading/tradeoffer_delete.html'
 
     model = TradeOffer
@@ -239,6 +338,8 @@ class TradeOfferDeleteView(MetadataMixin, UserPassesTestMixin, TradingPeriodMixi
     def post(self, request, **kwargs):
         offer = self.get_object()
 
+        matching.remove_offer(offer)
+
         for answer in offer.answers.all():
             telegram_notify(answer.user, 'Se ha eliminado tu respuesta a la oferta #{} porque ha sido eliminada.'.format(offer.id))
             answer.delete()
@@ -257,7 +358,7 @@ class TradeOfferDeleteView(MetadataMixin, UserPassesTestMixin, TradingPeriodMixi
         return super().get(request, *args, **kwargs)
 
 
-class ChangeAccessMixin(UserPassesTestMixin):
+class ChangeAccessMixin(UserPassesTestMixin, CachedObjectMixin):
     def test_func(self):
         offer = self.get_object()
         user = self.request.user
@@ -304,7 +405,7 @@ class ChangeProcessView(ChangeAccessMixin, DetailView):
         completed = True
 
         if self.request.user == self.get_object().user:
-            for line, subjects, _ in self.get_lines_data():
+            for line, subjects, _ in lines_data:
                 if line.is_completed:
                     continue
                 elif len(line.get_started_list()) != len(subjects):
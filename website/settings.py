@@ -110,6 +110,13 @@ DATABASES = {
 }
 
 
+# Cache
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+
 # Logging
 
 LOGGING = {
@@ -210,6 +217,19 @@ DJOSER = {
 
 BOT_TOKEN = env.str('BOT_TOKEN', default='')
 
+BOT_WORKERS = env.int('BOT_WORKERS', default=4)
+
+BOT_WEBHOOK_URL = env.str('BOT_WEBHOOK_URL', default='')
+
+BOT_WEBHOOK_LISTEN = env.str('BOT_WEBHOOK_LISTEN', default='127.0.0.1')
+
+BOT_WEBHOOK_PORT = env.int('BOT_WEBHOOK_PORT', default=8443)
+
+
+# Trading
+
+TRADING_DEGREE = env.str('TRADING_DEGREE', default='GII')
+
 
 # Payments
 
@@ -17,6 +17,7 @@ urlpatterns = [
     path('', include('main.urls')),
     path('', include('heart.urls')),
     path('blog/', include('blog.urls')),
+    path('bot/', include('bot.urls')),
     path('clubs/', include('clubs.urls')),
     path('casas/', include('houses.urls')),
     path('feedback/', include('feedback.urls')),
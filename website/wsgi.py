@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'website.settings')
 
 application = get_wsgi_application()
+
+from django.db import DatabaseError  # noqa: E402
+
+from trading.models import Subject  # noqa: E402
+
+try:
+    Subject.warm_cache()
+except DatabaseError:
+    # The database may not be ready yet (e.g. before migrating)
+    pass